@@ -5,8 +5,6 @@ from flask_limiter.util import get_remote_address
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from redis import Redis
-from elasticsearch import Elasticsearch
-from prometheus_client import Counter, Histogram
 import os
 from dotenv import load_dotenv
 
@@ -35,9 +33,6 @@ jwt = JWTManager(app)
 # تنظیم Redis
 redis_client = Redis.from_url(os.getenv('REDIS_URL', 'redis://redis:6379/0'))
 
-# تنظیم Elasticsearch
-es = Elasticsearch([os.getenv('ELASTICSEARCH_URL', 'http://es:9200')])
-
 # تنظیم Rate Limiter
 limiter = Limiter(
     app=app,
@@ -45,12 +40,16 @@ limiter = Limiter(
     default_limits=["200 per day", "50 per hour"]
 )
 
-# تنظیم Prometheus metrics
-request_count = Counter('http_requests_total', 'Total HTTP requests')
-request_latency = Histogram('http_request_duration_seconds', 'HTTP request latency')
+# تنظیم Prometheus metrics (برچسب‌گذاری بر اساس route و سرو /metrics)
+from app.services.metrics import init_metrics
+init_metrics(app, db)
+
+# دستور flask sync-exercises برای بارگذاری داده در PostgreSQL
+from app.services.exercise_loader import sync_exercises_command
+app.cli.add_command(sync_exercises_command)
 
 # Import routes after all configurations
-from app.routes import exercise_routes, auth_routes, health_routes
+from app.routes import exercise_routes, image_routes
 
 # تنظیم API بعد از import کردن routes
 from flask_restx import Api
@@ -1,14 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, Text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
 from datetime import datetime
-import os
 from app import db
 
-Base = declarative_base()
-
 class Exercise(db.Model):
     __tablename__ = 'exercises'
+    __table_args__ = (
+        # ترتیب صفحه‌بندی keyset
+        db.Index('ix_exercises_name_id', 'name', 'id'),
+        db.Index('ix_exercises_equipment_level', 'equipment', 'level'),
+        db.Index('ix_exercises_category_level', 'category', 'level'),
+    )
 
     id = db.Column(db.String(100), primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -21,9 +21,21 @@ class Exercise(db.Model):
     secondary_muscles = db.Column(db.JSON, nullable=False)
     instructions = db.Column(db.JSON, nullable=False)
     images = db.Column(db.JSON, nullable=False)
+    # هش محتوای رکورد منبع؛ بارگذار فقط سطرهایی را که هش آن‌ها تغییر کرده بازنویسی می‌کند
+    content_hash = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # جداول نرمال شده که توسط بارگذار از ستون‌های JSON بالا پر می‌شوند
+    muscle_links = db.relationship('ExerciseMuscle', back_populates='exercise',
+                                   cascade='all, delete-orphan', passive_deletes=True)
+    instruction_rows = db.relationship('ExerciseInstruction', back_populates='exercise',
+                                       order_by='ExerciseInstruction.order_index',
+                                       cascade='all, delete-orphan', passive_deletes=True)
+    image_rows = db.relationship('ExerciseImage', back_populates='exercise',
+                                 order_by='ExerciseImage.order_index',
+                                 cascade='all, delete-orphan', passive_deletes=True)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -41,47 +53,46 @@ class Exercise(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
 
-class Muscle(Base):
+class Muscle(db.Model):
     __tablename__ = 'muscles'
-    
-    id = Column(Integer, primary_key=True)
-    name = Column(String(100), nullable=False)
-    type = Column(String(50), nullable=False)  # primary/secondary
-    
-    exercises = relationship('ExerciseMuscle', back_populates='muscle')
-
-class ExerciseMuscle(Base):
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+
+    exercises = db.relationship('ExerciseMuscle', back_populates='muscle')
+
+class ExerciseMuscle(db.Model):
     __tablename__ = 'exercise_muscles'
-    
-    exercise_id = Column(Integer, ForeignKey('exercises.id'), primary_key=True)
-    muscle_id = Column(Integer, ForeignKey('muscles.id'), primary_key=True)
-    
-    exercise = relationship('Exercise', back_populates='muscles')
-    muscle = relationship('Muscle', back_populates='exercises')
-
-class ExerciseInstruction(Base):
+    __table_args__ = (
+        # فیلتر بر اساس عضله: از muscle_id به exercise_id بدون اسکن جدول exercises
+        db.Index('ix_exercise_muscles_muscle_role_exercise', 'muscle_id', 'role', 'exercise_id'),
+    )
+
+    exercise_id = db.Column(db.String(100), db.ForeignKey('exercises.id', ondelete='CASCADE'), primary_key=True)
+    muscle_id = db.Column(db.Integer, db.ForeignKey('muscles.id'), primary_key=True)
+    role = db.Column(db.String(10), primary_key=True)  # primary/secondary
+
+    exercise = db.relationship('Exercise', back_populates='muscle_links')
+    muscle = db.relationship('Muscle', back_populates='exercises')
+
+class ExerciseInstruction(db.Model):
     __tablename__ = 'exercise_instructions'
-    
-    id = Column(Integer, primary_key=True)
-    exercise_id = Column(Integer, ForeignKey('exercises.id'))
-    instruction = Column(Text, nullable=False)
-    order_index = Column(Integer, nullable=False)
-    
-    exercise = relationship('Exercise', back_populates='instructions')
-
-class ExerciseImage(Base):
+
+    exercise_id = db.Column(db.String(100), db.ForeignKey('exercises.id', ondelete='CASCADE'), primary_key=True)
+    order_index = db.Column(db.Integer, primary_key=True)
+    instruction = db.Column(db.Text, nullable=False)
+
+    exercise = db.relationship('Exercise', back_populates='instruction_rows')
+
+class ExerciseImage(db.Model):
     __tablename__ = 'exercise_images'
-    
-    id = Column(Integer, primary_key=True)
-    exercise_id = Column(Integer, ForeignKey('exercises.id'))
-    image_url = Column(String(255), nullable=False)
-    order_index = Column(Integer, nullable=False)
-    
-    exercise = relationship('Exercise', back_populates='images')
 
-# ایجاد اتصال به پایگاه داده
-engine = create_engine(os.getenv('DATABASE_URL'))
+    exercise_id = db.Column(db.String(100), db.ForeignKey('exercises.id', ondelete='CASCADE'), primary_key=True)
+    order_index = db.Column(db.Integer, primary_key=True)
+    image_url = db.Column(db.String(255), nullable=False)
+
+    exercise = db.relationship('Exercise', back_populates='image_rows')
 
 # ایجاد جداول
 def init_db():
-    Base.metadata.create_all(engine) 
\ No newline at end of file
+    db.create_all()
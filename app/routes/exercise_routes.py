@@ -0,0 +1,168 @@
+import base64
+import json
+from flask import jsonify, request
+from app import app, limiter
+from exercise_data.serialize import RowSerializer
+from app.services.cache_service import cache_page
+from app.services.exercise_query import FIELD_COLUMNS, estimate_count, select_page
+from app.services.monitoring import log_request
+from app.services.search_service import autocomplete, search_exercises
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+# تکمیل خودکار با هر کلید زده شده درخواست می‌فرستد؛ سقف پیش‌فرض 50 در ساعت کافی نیست
+AUTOCOMPLETE_RATE_LIMIT = '60 per minute'
+
+# پارامترهای query string و آرگومان متناظر در exercise_filters()
+FILTER_PARAMS = {
+    'level': 'level',
+    'force': 'force',
+    'mechanic': 'mechanic',
+    'equipment': 'equipment',
+    'category': 'category',
+    'primaryMuscles': 'primary_muscles',
+    'secondaryMuscles': 'secondary_muscles',
+    'muscles': 'muscles',
+    'excludeMuscles': 'exclude_muscles',
+}
+
+class BadRequest(ValueError):
+    """پارامتر نامعتبر در درخواست"""
+
+def encode_cursor(name, exercise_id):
+    raw = json.dumps([name, exercise_id], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        name, exercise_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, TypeError, UnicodeError):
+        raise BadRequest("Invalid cursor")
+    if not isinstance(name, str) or not isinstance(exercise_id, str):
+        raise BadRequest("Invalid cursor")
+    return name, exercise_id
+
+def _parse_limit(default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    value = request.args.get('limit', default)
+    try:
+        limit = int(value)
+    except ValueError:
+        raise BadRequest("limit must be an integer")
+    if limit < 1:
+        raise BadRequest("limit must be positive")
+    return min(limit, maximum)
+
+def _parse_fields():
+    value = request.args.get('fields')
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in FIELD_COLUMNS]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def _parse_filters():
+    # هر فیلتر با تکرار پارامتر یا مقادیر جدا شده با کاما چند مقدار می‌گیرد
+    filters = {}
+    for param, argument in FILTER_PARAMS.items():
+        values = [v for item in request.args.getlist(param) for v in item.split(',') if v]
+        if values:
+            filters[argument] = values
+    return filters
+
+@app.route('/api/exercises', methods=['GET'])
+@log_request
+@cache_page(expire_time=300, tags=['exercises'])
+def list_exercises():
+    """
+    لیست تمرین‌ها با صفحه‌بندی keyset
+
+    پارامترها:
+        limit: تعداد تمرین‌های هر صفحه (حداکثر MAX_PAGE_SIZE)
+        cursor: مقدار next_cursor صفحه‌ی قبل
+        fields: فیلدهای مورد نیاز جدا شده با کاما (فقط همین ستون‌ها خوانده می‌شوند)
+        level، force، mechanic، equipment، category، primaryMuscles،
+        secondaryMuscles، muscles و excludeMuscles: فیلترها
+
+    total_estimate فقط در صفحه‌ی اول و از برنامه‌ی اجرای PostgreSQL محاسبه می‌شود.
+    """
+    try:
+        limit = _parse_limit()
+        fields = _parse_fields()
+        filters = _parse_filters()
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+        selected, rows, last = select_page(fields, after, limit, raw_json=True, **filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # سطرها بدون ساختن dict مستقیماً به بایت‌های JSON تبدیل می‌شوند
+    names = fields or list(FIELD_COLUMNS)
+    serializer = RowSerializer(names, [selected.index(name) for name in names])
+    meta = {'count': len(rows), 'next_cursor': encode_cursor(*last) if last else None}
+    if after is None:
+        meta['total_estimate'] = estimate_count(**filters)
+
+    body = b'{"exercises":' + serializer.dumps(rows) + b',' + json.dumps(meta)[1:].encode('utf-8')
+    return app.response_class(body, mimetype='application/json')
+
+def _search_index_missing():
+    return jsonify({'error': 'Search index not built; run `make dist/exercises.idx`'}), 503
+
+@app.route('/api/exercises/search', methods=['GET'])
+@log_request
+def search():
+    """
+    جستجوی متنی تمرین‌ها در نام و دستورالعمل‌ها با رتبه‌بندی BM25
+
+    جستجو روی ایندکس درون‌پردازشی (mmap شده از dist/exercises.idx) و بدون
+    درخواست شبکه انجام می‌شود.
+
+    پارامترها:
+        q: متن جستجو
+        prefix: اگر true باشد آخرین کلمه پیشوند در نظر گرفته می‌شود (جستجو هنگام تایپ)
+        limit: حداکثر تعداد نتایج (حداکثر MAX_SEARCH_LIMIT)
+        level، force، mechanic، equipment، category، primaryMuscles،
+        secondaryMuscles، muscles و excludeMuscles: فیلترها
+    """
+    query = request.args.get('q', '')
+    if not query.strip():
+        return jsonify({'error': 'q is required'}), 400
+    try:
+        limit = _parse_limit(DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT)
+        results = search_exercises(query, limit=limit, prefix=request.args.get('prefix') == 'true',
+                                   **_parse_filters())
+    except FileNotFoundError:
+        return _search_index_missing()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'results': results, 'count': len(results)})
+
+@app.route('/api/exercises/autocomplete', methods=['GET'])
+@limiter.limit(AUTOCOMPLETE_RATE_LIMIT)
+@log_request
+def autocomplete_exercises():
+    """
+    پیشنهاد نام تمرین‌ها برای متن تایپ شده
+
+    پارامترها:
+        q: متن وارد شده تا این لحظه؛ آخرین کلمه‌ی ناقص پیشوند است
+        limit: حداکثر تعداد پیشنهادها (حداکثر MAX_SEARCH_LIMIT)
+        و همان فیلترهای /api/exercises/search
+    """
+    prefix = request.args.get('q', '')
+    if not prefix.strip():
+        return jsonify({'suggestions': [], 'count': 0})
+    try:
+        limit = _parse_limit(DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT)
+        suggestions = autocomplete(prefix, limit=limit, **_parse_filters())
+    except FileNotFoundError:
+        return _search_index_missing()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'suggestions': suggestions, 'count': len(suggestions)})
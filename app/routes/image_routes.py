@@ -0,0 +1,58 @@
+from flask import jsonify, request, send_file
+from app import app, limiter
+from app.services.image_service import get_image_index
+
+# آدرس تصویر نسخه ندارد و با `make images` محتوای آن عوض می‌شود، پس کلاینت‌ها
+# و CDN هر بار با ETag قوی اعتبارسنجی می‌کنند؛ پاسخ 304 فایل را باز نمی‌کند
+CACHE_CONTROL = 'public, no-cache'
+
+def _accepted_mimetypes():
+    # فقط نوع‌هایی که صریحاً آمده‌اند؛ */* به تنهایی یعنی همان jpeg
+    return {value.lower() for value, quality in request.accept_mimetypes if quality > 0}
+
+def _parse_width():
+    value = request.args.get('w')
+    if value is None:
+        return None
+    try:
+        width = int(value)
+    except ValueError:
+        raise ValueError("w must be an integer")
+    if width < 1:
+        raise ValueError("w must be positive")
+    return width
+
+@app.route('/api/images/<path:image>', methods=['GET', 'HEAD'])
+@limiter.exempt
+def get_image(image):
+    """
+    سرو تصویر یک تمرین با انتخاب نسخه بر اساس Accept
+
+    پارامترها:
+        image: مسیر تصویر نسبت به exercises/ (مثل Ab_Roller/0.jpg)
+        w: عرض مورد نیاز به پیکسل؛ کوچک‌ترین نسخه‌ی هم‌عرض یا پهن‌تر برگردانده می‌شود
+
+    ETag قوی از ایندکس از پیش محاسبه شده (`make images`) خوانده می‌شود؛
+    If-None-Match بدون باز کردن فایل پاسخ 304 می‌گیرد، درخواست‌های Range
+    پاسخ 206 می‌گیرند و بدنه از طریق wsgi.file_wrapper (sendfile در gunicorn)
+    و بدون کپی در پردازش فرستاده می‌شود.
+    """
+    try:
+        width = _parse_width()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    selected = get_image_index().select(image, _accepted_mimetypes(), width)
+    if selected is None:
+        return jsonify({'error': 'Image not found'}), 404
+
+    if request.if_none_match.contains(selected.etag):
+        response = app.response_class(status=304)
+        response.set_etag(selected.etag)
+    else:
+        # conditional=True پاسخ Range و If-Range را هم مدیریت می‌کند
+        response = send_file(selected.path, mimetype=selected.mimetype, conditional=True,
+                             etag=selected.etag)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    response.vary.add('Accept')
+    return response
@@ -1,70 +1,620 @@
+from collections import OrderedDict, namedtuple
 from functools import wraps
+import gzip
+import hashlib
+import inspect
 import json
+import logging
+import os
+import struct
+import threading
+import time
+from redis.exceptions import RedisError
 from app import redis_client
+from app.services.metrics import CACHE_EVENTS
 
-def cache_response(expire_time=3600):
+logger = logging.getLogger(__name__)
+
+# کش درون‌پردازشی جلوی Redis
+LOCAL_CACHE_SIZE = int(os.getenv('CACHE_LOCAL_MAXSIZE', 1024))
+LOCAL_CACHE_TTL = float(os.getenv('CACHE_LOCAL_TTL', 5))
+
+# حداکثر زمان انتظار برای محاسبه‌ی یک کلید توسط درخواست/پردازش دیگر
+COMPUTE_TIMEOUT = float(os.getenv('CACHE_COMPUTE_TIMEOUT', 30))
+LOCK_POLL_INTERVAL = 0.05
+
+# مدت نگهداری شماره‌ی نسل namespaceها در هر پردازش (تأخیر اعمال invalidate در پردازش‌های دیگر)
+GENERATION_TTL = float(os.getenv('CACHE_GENERATION_TTL', 1))
+PURGE_BATCH_SIZE = 500
+
+# بدنه‌های کوچک‌تر از این اندازه فشرده نمی‌شوند
+GZIP_MIN_SIZE = 1024
+
+class LocalCache:
+    """کش LRU محدود و thread-safe درون هر پردازش"""
+
+    def __init__(self, maxsize=LOCAL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now=None):
+        """
+        دریافت ورودی (value, fresh_until, stale_until) یا None در صورت انقضا
+        """
+        now = now or time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            entry, local_until = item
+            if local_until <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, now=None):
+        now = now or time.time()
+        local_until = min(entry[2], now + LOCAL_CACHE_TTL)
+        with self._lock:
+            self._data[key] = (entry, local_until)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                _stats.incr('local_evictions')
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class CacheStats:
+    """شمارنده‌های کش (hit/miss/coalesce و ...)"""
+
+    FIELDS = (
+        'local_hits', 'redis_hits', 'misses', 'coalesced', 'stale_served',
+        'refreshes', 'local_evictions', 'errors'
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = dict.fromkeys(self.FIELDS, 0)
+        self._counters = {name: CACHE_EVENTS.labels(name) for name in self.FIELDS}
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._values[name] += amount
+        self._counters[name].inc(amount)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+class _Flight:
+    """محاسبه‌ی در حال انجام برای یک کلید"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class JsonCodec:
+    """ذخیره‌ی مقدار پایتونی به صورت JSON (برای cache_response)"""
+
+    @staticmethod
+    def dumps(entry):
+        value, fresh_until, stale_until = entry
+        return json.dumps({'v': value, 'f': fresh_until, 's': stale_until})
+
+    @staticmethod
+    def loads(raw):
+        data = json.loads(raw)
+        return data['v'], data['f'], data['s']
+
+# بدنه‌ی نهایی پاسخ HTTP همراه با نوع محتوا، ETag و Content-Encoding
+CachedBody = namedtuple('CachedBody', 'body content_type etag encoding')
+
+class BodyCodec:
+    """
+    ذخیره‌ی بدنه‌ی آماده‌ی پاسخ به صورت باینری (برای cache_page)
+
+    قالب: سرآیند ثابت struct، سپس نوع محتوا، ETag، encoding و بدنه؛ در
+    مسیر hit هیچ JSONی parse نمی‌شود.
+    """
+
+    HEADER = struct.Struct('<ddHHH')
+
+    @classmethod
+    def dumps(cls, entry):
+        page, fresh_until, stale_until = entry
+        content_type = page.content_type.encode('latin-1')
+        etag = page.etag.encode('ascii')
+        encoding = (page.encoding or '').encode('ascii')
+        return b''.join([
+            cls.HEADER.pack(fresh_until, stale_until, len(content_type), len(etag), len(encoding)),
+            content_type, etag, encoding, page.body
+        ])
+
+    @classmethod
+    def loads(cls, raw):
+        fresh_until, stale_until, ct_length, etag_length, enc_length = cls.HEADER.unpack_from(raw)
+        offset = cls.HEADER.size
+        content_type = raw[offset:offset + ct_length].decode('latin-1')
+        offset += ct_length
+        etag = raw[offset:offset + etag_length].decode('ascii')
+        offset += etag_length
+        encoding = raw[offset:offset + enc_length].decode('ascii') or None
+        offset += enc_length
+        return CachedBody(raw[offset:], content_type, etag, encoding), fresh_until, stale_until
+
+_stats = CacheStats()
+_local = LocalCache()
+_flights = {}
+_flights_lock = threading.Lock()
+_refreshing = set()
+_generations = {}
+_generations_lock = threading.Lock()
+
+def get_generations(namespaces):
+    """
+    دریافت شماره‌ی نسل فعلی namespaceها
+
+    مقادیر برای GENERATION_TTL ثانیه در پردازش نگه داشته می‌شوند و موارد
+    منقضی شده با یک MGET از Redis خوانده می‌شوند.
+
+    Args:
+        namespaces (list): نام namespaceها
+
+    Returns:
+        list: شماره‌ی نسل هر namespace به همان ترتیب
+    """
+    now = time.time()
+    with _generations_lock:
+        cached = [_generations.get(ns) for ns in namespaces]
+    missing = [ns for ns, item in zip(namespaces, cached) if item is None or item[1] <= now]
+    if not missing:
+        return [item[0] for item in cached]
+
+    try:
+        values = redis_client.mget([f"gen:{ns}" for ns in missing])
+    except RedisError as e:
+        _stats.incr('errors')
+        logger.warning(f"Redis mget failed for generations: {str(e)}")
+        values = [None] * len(missing)
+
+    with _generations_lock:
+        for ns, value in zip(missing, values):
+            # در صورت خطا آخرین مقدار شناخته شده حفظ می‌شود
+            previous = _generations.get(ns)
+            generation = int(value) if value is not None else (previous[0] if previous else 0)
+            _generations[ns] = (generation, now + GENERATION_TTL)
+        return [_generations[ns][0] for ns in namespaces]
+
+def make_cache_key(func, args, kwargs, signature=None, namespaces=None):
+    """
+    ساخت کلید کش canonical برای یک فراخوانی
+
+    آرگومان‌ها به پارامترهای تابع نگاشت می‌شوند (f(1) و f(x=1) یک کلید
+    دارند)، مقادیر پیش‌فرض اعمال می‌شوند و نتیجه به صورت JSON مرتب شده
+    hash می‌شود. شماره‌ی نسل namespaceها بخشی از کلید است، بنابراین پس
+    از invalidate_cache کلیدهای قبلی دیگر خوانده نمی‌شوند و با TTL حذف
+    می‌شوند.
+
+    Args:
+        func: تابع کش شده
+        args (tuple): آرگومان‌های موقعیتی
+        kwargs (dict): آرگومان‌های کلیدی
+        signature: امضای از پیش محاسبه شده‌ی تابع
+        namespaces (list): namespaceهایی که کلید به آن‌ها تعلق دارد
+
+    Returns:
+        str: کلید کش
+    """
+    try:
+        bound = (signature or inspect.signature(func)).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+    except (TypeError, ValueError):
+        arguments = [args, kwargs]
+    return build_cache_key(namespaces or [default_namespace(func)], arguments)
+
+def build_cache_key(namespaces, payload):
+    """
+    ساخت کلید کش از namespaceها و یک مقدار قابل تبدیل به JSON
+
+    Args:
+        namespaces (list): namespace اصلی و tagها
+        payload: داده‌ای که کلید را یکتا می‌کند
+
+    Returns:
+        str: کلید کش شامل شماره‌ی نسل namespaceها
+    """
+    payload = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=repr)
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+    generation = '.'.join(str(g) for g in get_generations(namespaces))
+    return f"cache:{namespaces[0]}:g{generation}:{digest}"
+
+def default_namespace(func):
+    """namespace پیش‌فرض یک تابع کش شده"""
+    return f"{func.__module__}.{func.__qualname__}"
+
+def _redis_get_entry(key, codec=JsonCodec):
+    try:
+        raw = redis_client.get(key)
+    except RedisError as e:
+        _stats.incr('errors')
+        logger.warning(f"Redis get failed for {key}: {str(e)}")
+        return None
+    if not raw:
+        return None
+    return codec.loads(raw)
+
+def _store(key, value, expire_time, stale_time, codec=JsonCodec):
+    now = time.time()
+    entry = (value, now + expire_time, now + expire_time + stale_time)
+    _local.set(key, entry, now)
+    try:
+        redis_client.setex(
+            name=key,
+            time=int(expire_time + stale_time),
+            value=codec.dumps(entry)
+        )
+    except RedisError as e:
+        _stats.incr('errors')
+        logger.warning(f"Redis set failed for {key}: {str(e)}")
+    return entry
+
+def _try_lock(key):
+    """قفل توزیع‌شده بین پردازش‌ها؛ در صورت در دسترس نبودن Redis قفل گرفته شده فرض می‌شود"""
+    try:
+        return bool(redis_client.set(f"lock:{key}", 1, nx=True, px=int(COMPUTE_TIMEOUT * 1000)))
+    except RedisError:
+        _stats.incr('errors')
+        return True
+
+def _unlock(key):
+    try:
+        redis_client.delete(f"lock:{key}")
+    except RedisError:
+        _stats.incr('errors')
+
+def _compute(key, compute, expire_time, stale_time, codec=JsonCodec):
+    """
+    محاسبه‌ی مقدار برای یک miss به گونه‌ای که فقط یک درخواست آن را انجام دهد
+
+    درخواست‌های هم‌زمان همین پردازش منتظر نتیجه‌ی درخواست اول می‌مانند و
+    پردازش‌های دیگر تا زمانی که قفل Redis برقرار است مقدار را از Redis
+    می‌خوانند.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        _stats.incr('coalesced')
+        if not flight.event.wait(COMPUTE_TIMEOUT):
+            raise TimeoutError(f"Timed out waiting for cache key {key}")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        locked = _try_lock(key)
+        if not locked:
+            deadline = time.time() + COMPUTE_TIMEOUT
+            while time.time() < deadline:
+                entry = _redis_get_entry(key, codec)
+                if entry is not None:
+                    _stats.incr('coalesced')
+                    _local.set(key, entry)
+                    flight.result = entry[0]
+                    return flight.result
+                time.sleep(LOCK_POLL_INTERVAL)
+
+        try:
+            _stats.incr('misses')
+            flight.result = _store(key, compute(), expire_time, stale_time, codec)[0]
+            return flight.result
+        finally:
+            if locked:
+                _unlock(key)
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        flight.event.set()
+        with _flights_lock:
+            _flights.pop(key, None)
+
+def _refresh_in_background(key, compute, expire_time, stale_time, codec=JsonCodec, context=None):
+    """
+    به‌روزرسانی مقدار stale در پس‌زمینه توسط فقط یک worker
+
+    Args:
+        context: تابعی که context مورد نیاز compute را می‌سازد
+            (پیش‌فرض: app context برنامه‌ی Flask فعلی)
+    """
+    with _flights_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    if not _try_lock(key):
+        with _flights_lock:
+            _refreshing.discard(key)
+        return
+
+    if context is None:
+        try:
+            from flask import current_app
+            context = current_app._get_current_object().app_context
+        except RuntimeError:
+            context = None
+
+    def run():
+        try:
+            if context is not None:
+                with context():
+                    value = compute()
+            else:
+                value = compute()
+            _store(key, value, expire_time, stale_time, codec)
+            _stats.incr('refreshes')
+        except Exception as e:
+            _stats.incr('errors')
+            logger.error(f"Background refresh failed for {key}: {str(e)}")
+        finally:
+            _unlock(key)
+            with _flights_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=run, name=f"cache-refresh:{key}", daemon=True).start()
+
+def cache_response(expire_time=3600, stale_time=60, tags=None):
     """
     دکوراتور برای کش کردن پاسخ‌های API
-    
+
+    نتیجه ابتدا در کش LRU درون‌پردازشی و سپس در Redis جستجو می‌شود.
+    درخواست‌های هم‌زمانِ یک کلید فقط یک بار محاسبه می‌شوند و پس از
+    انقضا، مقدار قبلی تا stale_time ثانیه برگردانده می‌شود در حالی که یک
+    worker آن را در پس‌زمینه به‌روز می‌کند.
+
     Args:
-        expire_time (int): زمان انقضا به ثانیه (پیش‌فرض: 1 ساعت)
+        expire_time (int): زمان تازه ماندن به ثانیه (پیش‌فرض: 1 ساعت)
+        stale_time (int): مدت مجاز برگرداندن مقدار منقضی شده به ثانیه
+        tags (list): namespaceهای اضافه (مثلاً ['exercises']) که
+            invalidate_cache روی آن‌ها این کش را هم باطل می‌کند
     """
     def decorator(func):
+        signature = inspect.signature(func)
+        namespaces = [default_namespace(func)] + list(tags or [])
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             # ساخت کلید کش
-            cache_key = f"{func.__name__}:{str(args)}:{str(kwargs)}"
-            
-            # بررسی وجود نتیجه در کش
-            cached_result = redis_client.get(cache_key)
-            if cached_result:
-                return json.loads(cached_result)
-            
-            # اجرای تابع و ذخیره نتیجه در کش
-            result = func(*args, **kwargs)
-            redis_client.setex(
-                name=cache_key,
-                time=expire_time,
-                value=json.dumps(result)
-            )
-            return result
+            cache_key = make_cache_key(func, args, kwargs, signature, namespaces)
+            compute = lambda: func(*args, **kwargs)
+            return _get_or_compute(cache_key, compute, expire_time, stale_time)[0]
         return wrapper
     return decorator
 
-def invalidate_cache(pattern):
+def _get_or_compute(key, compute, expire_time, stale_time, codec=JsonCodec, context=None):
     """
-    حذف کش‌های منطبق با الگوی مشخص شده
-    
+    جستجو در کش محلی و Redis و در صورت نیاز محاسبه‌ی مقدار
+
+    Returns:
+        tuple: (مقدار، وضعیت) که وضعیت یکی از 'HIT'، 'STALE' یا 'MISS' است
+    """
+    now = time.time()
+
+    # بررسی وجود نتیجه در کش محلی و سپس Redis
+    entry = _local.get(key, now)
+    if entry is not None:
+        _stats.incr('local_hits')
+    else:
+        entry = _redis_get_entry(key, codec)
+        if entry is not None:
+            _stats.incr('redis_hits')
+            _local.set(key, entry, now)
+
+    if entry is not None:
+        value, fresh_until, stale_until = entry
+        if now < fresh_until:
+            return value, 'HIT'
+        if now < stale_until:
+            _stats.incr('stale_served')
+            _refresh_in_background(key, compute, expire_time, stale_time, codec, context)
+            return value, 'STALE'
+
+    # اجرای تابع و ذخیره نتیجه در کش
+    return _compute(key, compute, expire_time, stale_time, codec), 'MISS'
+
+class _Uncacheable(Exception):
+    """پاسخی که نباید کش شود (وضعیت غیر از 200 یا بدنه‌ی streaming)"""
+
+    def __init__(self, response):
+        super().__init__(response.status)
+        self.response = response
+        self.thread = threading.get_ident()
+
+def _render_body(view, args, kwargs, compress):
+    """اجرای view و تبدیل پاسخ آن به CachedBody"""
+    from flask import make_response
+
+    response = make_response(view(*args, **kwargs))
+    if response.status_code != 200 or response.is_streamed:
+        raise _Uncacheable(response)
+
+    body = response.get_data()
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    encoding = None
+    if compress and len(body) >= GZIP_MIN_SIZE:
+        body = gzip.compress(body, compresslevel=6, mtime=0)
+        encoding = 'gzip'
+    return CachedBody(body, response.content_type, etag, encoding)
+
+def _body_response(page, state):
+    """ساخت پاسخ Flask مستقیماً از بایت‌های ذخیره شده"""
+    from flask import Response, request
+
+    # هر نمایش (فشرده یا نه) ETag قوی جداگانه‌ی خود را دارد
+    encoded = page.encoding is not None and page.encoding in request.accept_encodings
+    etag = f"{page.etag}-gz" if encoded else page.etag
+    headers = {'ETag': f'"{etag}"', 'Vary': 'Accept-Encoding', 'X-Cache': state}
+    if etag in request.if_none_match:
+        return Response(status=304, headers=headers)
+
+    body = page.body
+    if encoded:
+        headers['Content-Encoding'] = page.encoding
+    elif page.encoding:
+        body = gzip.decompress(body)
+    return Response(body, status=200, content_type=page.content_type, headers=headers)
+
+def cache_page(expire_time=300, stale_time=60, tags=None, compress=True):
+    """
+    دکوراتور برای کش کردن بدنه‌ی نهایی پاسخ‌های GET
+
+    به جای مقدار پایتونی، بایت‌های آماده‌ی پاسخ (در صورت امکان فشرده با
+    gzip) همراه با Content-Type و ETag ذخیره می‌شوند و در hit بدون
+    json.loads و serialize دوباره مستقیماً برگردانده می‌شوند. کلید از
+    مسیر و query string درخواست ساخته می‌شود. همان رفتار LRU محلی،
+    single-flight و stale-while-revalidate در cache_response برقرار است.
+
+    Args:
+        expire_time (int): زمان تازه ماندن به ثانیه
+        stale_time (int): مدت مجاز برگرداندن مقدار منقضی شده به ثانیه
+        tags (list): namespaceهای اضافه برای invalidate_cache
+        compress (bool): ذخیره‌ی بدنه به صورت gzip
+    """
+    def decorator(view):
+        namespaces = [default_namespace(view)] + list(tags or [])
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import current_app, request
+
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            cache_key = build_cache_key(namespaces, [request.path, sorted(request.args.items(multi=True))])
+            compute = lambda: _render_body(view, args, kwargs, compress)
+            app = current_app._get_current_object()
+            environ = dict(request.environ)
+            context = lambda: app.request_context(environ)
+
+            try:
+                page, state = _get_or_compute(cache_key, compute, expire_time, stale_time, BodyCodec, context)
+            except _Uncacheable as e:
+                if e.thread == threading.get_ident():
+                    return e.response
+                return view(*args, **kwargs)
+            return _body_response(page, state)
+        return wrapper
+    return decorator
+
+def get_cache_stats():
+    """
+    دریافت شمارنده‌های کش
+
+    Returns:
+        dict: تعداد hit محلی و Redis، miss، درخواست‌های ادغام شده و ...
+    """
+    stats = _stats.snapshot()
+    stats['local_size'] = len(_local)
+    return stats
+
+def invalidate_cache(*namespaces):
+    """
+    باطل کردن کش namespaceها با افزایش اتمیک شماره‌ی نسل
+
+    هزینه‌ی آن مستقل از تعداد کلیدهاست (یک pipeline از INCR)؛ کلیدهای
+    نسل قبلی دیگر خوانده نمی‌شوند و با TTL خود از Redis حذف می‌شوند.
+
+    Args:
+        *namespaces (str): tagها یا نام کامل توابع کش شده
+            (مثلاً 'exercises' یا 'app.routes.exercise_routes.list_exercises')
+
+    Returns:
+        dict: شماره‌ی نسل جدید هر namespace
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for ns in namespaces:
+        pipe.incr(f"gen:{ns}")
+    generations = pipe.execute()
+
+    expires = time.time() + GENERATION_TTL
+    with _generations_lock:
+        for ns, generation in zip(namespaces, generations):
+            _generations[ns] = (int(generation), expires)
+    return dict(zip(namespaces, generations))
+
+def purge_cache(pattern='cache:*', batch_size=PURGE_BATCH_SIZE):
+    """
+    حذف فیزیکی کلیدهای منطبق با الگو برای پاک‌سازی صریح
+
+    کلیدها با SCAN پیدا شده و در دسته‌های batch_size با یک UNLINK در
+    pipeline حذف می‌شوند. برای باطل کردن کش از invalidate_cache استفاده کنید.
+
     Args:
         pattern (str): الگوی کلید‌های کش برای حذف
+        batch_size (int): تعداد کلید در هر دسته
+
+    Returns:
+        int: تعداد کلیدهای حذف شده
     """
-    for key in redis_client.scan_iter(pattern):
-        redis_client.delete(key)
+    _local.clear()
+    deleted = 0
+    batch = []
+    pipe = redis_client.pipeline(transaction=False)
+    for key in redis_client.scan_iter(match=pattern, count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            pipe.unlink(*batch)
+            deleted += sum(pipe.execute())
+            batch = []
+    if batch:
+        pipe.unlink(*batch)
+        deleted += sum(pipe.execute())
+    return deleted
 
-def cache_set(key, value, expire_time=3600):
+def cache_set(key, value, expire_time=3600, raw=False):
     """
     ذخیره مستقیم مقدار در کش
-    
+
     Args:
         key (str): کلید کش
         value (any): مقدار برای ذخیره
         expire_time (int): زمان انقضا به ثانیه
+        raw (bool): value از قبل bytes است و بدون JSON ذخیره شود
     """
     redis_client.setex(
         name=key,
         time=expire_time,
-        value=json.dumps(value)
+        value=value if raw else json.dumps(value)
     )
 
-def cache_get(key):
+def cache_get(key, raw=False):
     """
     دریافت مقدار از کش
-    
+
     Args:
         key (str): کلید کش
-    
+        raw (bool): بایت‌های ذخیره شده بدون json.loads برگردانده شوند
+
     Returns:
         any: مقدار ذخیره شده یا None
     """
     value = redis_client.get(key)
-    return json.loads(value) if value else None 
\ No newline at end of file
+    if raw:
+        return value
+    return json.loads(value) if value else None
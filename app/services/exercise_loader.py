@@ -0,0 +1,290 @@
+import json
+import logging
+import os
+import time
+import click
+from flask.cli import with_appcontext
+from app import db
+from app.models.models import init_db
+from exercise_data.manifest import content_hash
+
+logger = logging.getLogger(__name__)
+
+DATASET_PATH = os.path.join('dist', 'exercises.nd.json')
+
+# ستون‌های جدول exercises به ترتیب COPY و کلید متناظر در فایل داده
+COLUMNS = (
+    ('id', 'id', 'varchar(100)'),
+    ('name', 'name', 'varchar(200)'),
+    ('force', 'force', 'varchar(50)'),
+    ('level', 'level', 'varchar(50)'),
+    ('mechanic', 'mechanic', 'varchar(50)'),
+    ('equipment', 'equipment', 'varchar(50)'),
+    ('category', 'category', 'varchar(50)'),
+    ('primary_muscles', 'primaryMuscles', 'json'),
+    ('secondary_muscles', 'secondaryMuscles', 'json'),
+    ('instructions', 'instructions', 'json'),
+    ('images', 'images', 'json'),
+)
+
+# ایندکس‌های __table_args__؛ db.create_all آن‌ها را روی جدول‌های موجود نمی‌سازد
+SCHEMA_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_exercises_name_id ON exercises (name, id)",
+    "CREATE INDEX IF NOT EXISTS ix_exercises_equipment_level ON exercises (equipment, level)",
+    "CREATE INDEX IF NOT EXISTS ix_exercises_category_level ON exercises (category, level)",
+    "CREATE INDEX IF NOT EXISTS ix_exercise_muscles_muscle_role_exercise "
+    "ON exercise_muscles (muscle_id, role, exercise_id)",
+)
+
+STAGING_TABLE = 'exercises_staging'
+CHANGED_TABLE = 'exercises_changed'
+
+# بازسازی جداول نرمال شده (muscles، exercise_muscles، exercise_instructions و
+# exercise_images) فقط برای تمرین‌های موجود در CHANGED_TABLE
+LINK_STATEMENTS = (
+    f"DELETE FROM exercise_muscles WHERE exercise_id IN (SELECT id FROM {CHANGED_TABLE})",
+    f"DELETE FROM exercise_instructions WHERE exercise_id IN (SELECT id FROM {CHANGED_TABLE})",
+    f"DELETE FROM exercise_images WHERE exercise_id IN (SELECT id FROM {CHANGED_TABLE})",
+    f"""
+        INSERT INTO muscles (name)
+        SELECT DISTINCT m.name
+        FROM {STAGING_TABLE} s
+        JOIN {CHANGED_TABLE} c ON c.id = s.id
+        CROSS JOIN LATERAL (
+            SELECT json_array_elements_text(s.primary_muscles)
+            UNION SELECT json_array_elements_text(s.secondary_muscles)
+        ) AS m(name)
+        ON CONFLICT (name) DO NOTHING
+    """,
+    f"""
+        INSERT INTO exercise_muscles (exercise_id, muscle_id, role)
+        SELECT s.id, m.id, l.role
+        FROM {STAGING_TABLE} s
+        JOIN {CHANGED_TABLE} c ON c.id = s.id
+        CROSS JOIN LATERAL (
+            SELECT json_array_elements_text(s.primary_muscles), 'primary'
+            UNION ALL SELECT json_array_elements_text(s.secondary_muscles), 'secondary'
+        ) AS l(name, role)
+        JOIN muscles m ON m.name = l.name
+        ON CONFLICT DO NOTHING
+    """,
+    f"""
+        INSERT INTO exercise_instructions (exercise_id, order_index, instruction)
+        SELECT s.id, t.ord - 1, t.value
+        FROM {STAGING_TABLE} s
+        JOIN {CHANGED_TABLE} c ON c.id = s.id
+        CROSS JOIN LATERAL json_array_elements_text(s.instructions) WITH ORDINALITY AS t(value, ord)
+    """,
+    f"""
+        INSERT INTO exercise_images (exercise_id, order_index, image_url)
+        SELECT s.id, t.ord - 1, t.value
+        FROM {STAGING_TABLE} s
+        JOIN {CHANGED_TABLE} c ON c.id = s.id
+        CROSS JOIN LATERAL json_array_elements_text(s.images) WITH ORDINALITY AS t(value, ord)
+    """,
+)
+
+def iter_records(path=DATASET_PATH):
+    """
+    خواندن تمرین‌ها از dist/exercises.nd.json (یا آرایه‌ی dist/exercises.json)
+
+    Args:
+        path (str): مسیر فایل داده
+
+    Returns:
+        iterator: دیکشنری هر تمرین
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    if text.lstrip().startswith('['):
+        yield from json.loads(text)
+        return
+
+    # خروجی nd همانند `jq '.[]'` اشیای چندخطی پشت سر هم است نه یک شیء در هر خط
+    decoder = json.JSONDecoder()
+    index = 0
+    while True:
+        while index < len(text) and text[index].isspace():
+            index += 1
+        if index >= len(text):
+            break
+        record, index = decoder.raw_decode(text, index)
+        yield record
+
+def record_hash(record):
+    """هش محتوای یک تمرین (مستقل از ترتیب کلیدها)"""
+    canonical = json.dumps(record, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return content_hash(canonical.encode('utf-8'))
+
+def _copy_value(value):
+    # قالب text دستور COPY: NULL با \N و کاراکترهای کنترلی escape شده
+    if value is None:
+        return '\\N'
+    return (value.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+def _copy_line(record):
+    values = []
+    for _, key, sql_type in COLUMNS:
+        value = record.get(key)
+        if sql_type == 'json':
+            value = json.dumps(value if value is not None else [], ensure_ascii=False)
+        values.append(_copy_value(value))
+    values.append(record_hash(record))
+    return '\t'.join(values) + '\n'
+
+class CopyStream:
+    """فایل خواندنی روی یک iterator از خطوط، تا داده بدون ساختن کل آن در حافظه به COPY برسد"""
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = ''
+        self.rows = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._lines)
+                self.rows += 1
+            except StopIteration:
+                break
+        if size < 0:
+            data, self._buffer = self._buffer, ''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+def _upsert_sql(delete_missing):
+    names = [name for name, _, _ in COLUMNS] + ['content_hash']
+    columns = ', '.join(names)
+    updates = ', '.join(f"{name} = EXCLUDED.{name}" for name in names if name != 'id')
+    deleted = (
+        f"DELETE FROM exercises e WHERE NOT EXISTS "
+        f"(SELECT 1 FROM {STAGING_TABLE} s WHERE s.id = e.id) RETURNING 1"
+        if delete_missing else "SELECT 1 WHERE false"
+    )
+    # یک دستور: درج سطرهای جدید، به‌روزرسانی فقط سطرهایی که هش آن‌ها تغییر کرده و حذف سطرهای حذف شده
+    return f"""
+        WITH upserted AS (
+            INSERT INTO exercises ({columns}, created_at, updated_at)
+            SELECT {columns}, timezone('utc', now()), timezone('utc', now())
+            FROM {STAGING_TABLE}
+            ON CONFLICT (id) DO UPDATE
+            SET {updates}, updated_at = timezone('utc', now())
+            WHERE exercises.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+            RETURNING id, (xmax = 0) AS inserted
+        ), deleted AS (
+            {deleted}
+        ), changed AS (
+            INSERT INTO {CHANGED_TABLE} (id) SELECT id FROM upserted
+        )
+        SELECT count(*) FILTER (WHERE inserted),
+               count(*) FILTER (WHERE NOT inserted),
+               (SELECT count(*) FROM deleted)
+        FROM upserted
+    """
+
+def ensure_schema():
+    """ساخت جدول‌ها، ستون content_hash و ایندکس‌ها در پایگاه داده‌های قدیمی‌تر"""
+    init_db()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(
+            "ALTER TABLE exercises ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)"
+        )
+        for statement in SCHEMA_INDEXES:
+            conn.exec_driver_sql(statement)
+
+def sync_exercises(path=DATASET_PATH, delete_missing=True, rebuild_links=False):
+    """
+    همگام‌سازی جدول exercises با فایل داده با COPY به جدول موقت و یک upsert
+
+    فقط سطرهایی که هش محتوای آن‌ها تغییر کرده بازنویسی می‌شوند، بنابراین
+    updated_at زمان آخرین تغییر واقعی تمرین را نشان می‌دهد. جداول نرمال شده‌ی
+    عضلات، دستورالعمل‌ها و تصاویر هم فقط برای همین سطرها بازسازی می‌شوند.
+
+    Args:
+        path (str): dist/exercises.nd.json یا dist/exercises.json
+        delete_missing (bool): حذف تمرین‌هایی که در فایل داده نیستند
+        rebuild_links (bool): بازسازی جداول نرمال شده برای همه‌ی تمرین‌ها
+            (در صورت خالی بودن exercise_muscles خودکار انجام می‌شود)
+
+    Returns:
+        dict: تعداد سطرهای inserted/updated/deleted/unchanged و زمان هر مرحله
+    """
+    timings = {}
+    start = time.perf_counter()
+    stream = CopyStream(_copy_line(record) for record in iter_records(path))
+
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        column_defs = ', '.join(f"{name} {sql_type}" for name, _, sql_type in COLUMNS)
+        cursor.execute(
+            f"CREATE TEMP TABLE {STAGING_TABLE} ({column_defs}, content_hash varchar(64)) "
+            f"ON COMMIT DROP"
+        )
+        cursor.execute(f"CREATE TEMP TABLE {CHANGED_TABLE} (id varchar(100) PRIMARY KEY) ON COMMIT DROP")
+        cursor.copy_expert(f"COPY {STAGING_TABLE} FROM STDIN", stream)
+        timings['copy'] = time.perf_counter() - start
+
+        step = time.perf_counter()
+        cursor.execute(_upsert_sql(delete_missing))
+        inserted, updated, deleted = cursor.fetchone()
+        timings['upsert'] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        if not rebuild_links:
+            cursor.execute("SELECT NOT EXISTS (SELECT 1 FROM exercise_muscles)")
+            rebuild_links = cursor.fetchone()[0]
+        if rebuild_links:
+            cursor.execute(f"INSERT INTO {CHANGED_TABLE} (id) SELECT id FROM {STAGING_TABLE} ON CONFLICT DO NOTHING")
+        for statement in LINK_STATEMENTS:
+            cursor.execute(statement)
+        timings['links'] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        connection.commit()
+        timings['commit'] = time.perf_counter() - step
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    timings['total'] = time.perf_counter() - start
+    result = {
+        'rows': stream.rows,
+        'inserted': inserted,
+        'updated': updated,
+        'deleted': deleted,
+        'unchanged': stream.rows - inserted - updated,
+        'timings': {k: round(v, 4) for k, v in timings.items()}
+    }
+
+    if inserted or updated or deleted:
+        try:
+            from app.services.cache_service import invalidate_cache
+            invalidate_cache('exercises')
+        except Exception as e:
+            logger.error(f"Could not invalidate exercise cache: {str(e)}")
+
+    logger.info(f"Exercise sync: {result}")
+    return result
+
+@click.command('sync-exercises')
+@click.option('--path', default=DATASET_PATH, show_default=True, help='فایل داده (NDJSON یا JSON)')
+@click.option('--keep-missing', is_flag=True, help='حذف نکردن تمرین‌هایی که در فایل داده نیستند')
+@click.option('--rebuild-links', is_flag=True, help='بازسازی جداول عضلات، دستورالعمل‌ها و تصاویر برای همه‌ی تمرین‌ها')
+@with_appcontext
+def sync_exercises_command(path, keep_missing, rebuild_links):
+    """همگام‌سازی جدول exercises با dist/exercises.nd.json"""
+    ensure_schema()
+    result = sync_exercises(path, delete_missing=not keep_missing, rebuild_links=rebuild_links)
+    timings = result['timings']
+    click.echo(
+        f"{result['rows']} rows: {result['inserted']} inserted, {result['updated']} updated, "
+        f"{result['deleted']} deleted, {result['unchanged']} unchanged "
+        f"(copy {timings['copy']}s, upsert {timings['upsert']}s, links {timings['links']}s, "
+        f"total {timings['total']}s)"
+    )
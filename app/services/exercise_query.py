@@ -0,0 +1,194 @@
+import json
+import threading
+from sqlalchemy import Text, and_, cast, exists, or_, select, tuple_
+from app import db
+from app.models.models import Exercise, ExerciseMuscle, Muscle
+
+# فیلترهای ستونی و ستون متناظر در جدول exercises
+COLUMN_FILTERS = {
+    'level': Exercise.level,
+    'force': Exercise.force,
+    'mechanic': Exercise.mechanic,
+    'equipment': Exercise.equipment,
+    'category': Exercise.category,
+}
+
+# نام فیلدها در API و ستون متناظر، برای SELECT فقط ستون‌های لازم
+FIELD_COLUMNS = {
+    'id': Exercise.id,
+    'name': Exercise.name,
+    'force': Exercise.force,
+    'level': Exercise.level,
+    'mechanic': Exercise.mechanic,
+    'equipment': Exercise.equipment,
+    'category': Exercise.category,
+    'primaryMuscles': Exercise.primary_muscles,
+    'secondaryMuscles': Exercise.secondary_muscles,
+    'instructions': Exercise.instructions,
+    'images': Exercise.images,
+    'created_at': Exercise.created_at,
+    'updated_at': Exercise.updated_at,
+}
+
+# ستون‌های JSON که می‌توان آن‌ها را به صورت متن خواند و بدون decode در پاسخ قرار داد
+JSON_FIELDS = ('primaryMuscles', 'secondaryMuscles', 'instructions', 'images')
+
+# فیلترهای عضله و نقش عضله در exercise_muscles (None یعنی هر دو نقش)
+MUSCLE_FILTERS = {
+    'primary_muscles': 'primary',
+    'secondary_muscles': 'secondary',
+    'muscles': None,
+}
+
+# نسل namespace exercises هنگام خواندن جدول muscles و نقشه‌ی نام به id؛ نقشه
+# هیچ‌وقت در جا تغییر نمی‌کند و فقط کل تاپل جایگزین می‌شود
+_muscles = (None, {})
+_muscle_lock = threading.Lock()
+
+def _values(value):
+    if value is None or isinstance(value, str):
+        return [value]
+    return list(value)
+
+def muscle_ids(names):
+    """
+    تبدیل نام عضلات به id با کش درون‌پردازشی (جدول muscles کوچک و تقریباً ثابت است)
+
+    عضله‌ی جدید فقط با همگام‌سازی‌ای اضافه می‌شود که نسل exercises را بالا
+    می‌برد، پس نام ناشناخته فقط وقتی نسل عوض شده باشد جدول را دوباره می‌خواند.
+
+    Raises:
+        ValueError: اگر عضله‌ای در جدول muscles وجود نداشته باشد
+
+    Returns:
+        list: id عضلات
+    """
+    global _muscles
+    names = list(names)
+    generation, ids = _muscles
+    if any(name not in ids for name in names):
+        from app.services.cache_service import get_generations
+        # نسل پیش از خواندن جدول گرفته می‌شود تا همگام‌سازی هم‌زمان از دست نرود
+        current = get_generations(['exercises'])[0]
+        if current != generation:
+            with _muscle_lock:
+                generation, ids = _muscles
+                if current != generation:
+                    ids = dict(db.session.execute(select(Muscle.name, Muscle.id)).all())
+                    _muscles = (current, ids)
+    try:
+        return [ids[name] for name in names]
+    except KeyError as e:
+        raise ValueError(f"Unknown muscle {e.args[0]!r}") from None
+
+def _muscle_clause(names, role):
+    # semi-join روی ایندکس (muscle_id, role, exercise_id) به جای اسکن ستون JSON
+    conditions = [
+        ExerciseMuscle.exercise_id == Exercise.id,
+        ExerciseMuscle.muscle_id.in_(muscle_ids(names)),
+    ]
+    if role is not None:
+        conditions.append(ExerciseMuscle.role == role)
+    return exists().where(and_(*conditions))
+
+def exercise_filters(level=None, force=None, mechanic=None, equipment=None, category=None,
+                     primary_muscles=None, secondary_muscles=None, muscles=None, exclude_muscles=None):
+    """
+    تبدیل فیلترها به شرط‌های SQL قابل استفاده با ایندکس‌ها
+
+    هر فیلتر یک مقدار یا لیستی از مقادیر (هر کدام کافی است) می‌گیرد؛ مقدار
+    None در لیست برای ستون‌های nullable یعنی NULL. فیلترهای عضله با
+    exercise_muscles و exclude_muscles تمرین‌های دارای هر یک از عضلات را
+    (در هر دو نقش) حذف می‌کند.
+
+    Returns:
+        list: شرط‌ها برای استفاده در where()/filter()
+    """
+    clauses = []
+    values = {'level': level, 'force': force, 'mechanic': mechanic,
+              'equipment': equipment, 'category': category}
+    for field, value in values.items():
+        if value is None:
+            continue
+        column = COLUMN_FILTERS[field]
+        items = _values(value)
+        present = [v for v in items if v is not None]
+        condition = column.in_(present) if len(present) > 1 else column == present[0] if present else None
+        if None in items:
+            condition = column.is_(None) if condition is None else or_(condition, column.is_(None))
+        clauses.append(condition)
+
+    muscle_values = {'primary_muscles': primary_muscles, 'secondary_muscles': secondary_muscles,
+                     'muscles': muscles}
+    for field, value in muscle_values.items():
+        if value is not None:
+            clauses.append(_muscle_clause(_values(value), MUSCLE_FILTERS[field]))
+    if exclude_muscles is not None:
+        clauses.append(~_muscle_clause(_values(exclude_muscles), None))
+
+    return clauses
+
+def query_exercises(**filters):
+    """
+    Query تمرین‌های منطبق با فیلترها به ترتیب (name, id)
+
+    Args:
+        **filters: فیلترهای exercise_filters()
+
+    Returns:
+        Query: قابل ادامه با limit/offset یا paginate
+    """
+    return Exercise.query.filter(*exercise_filters(**filters)).order_by(Exercise.name, Exercise.id)
+
+def select_page(fields=None, after=None, limit=50, raw_json=False, **filters):
+    """
+    یک صفحه از تمرین‌ها با صفحه‌بندی keyset روی (name, id)
+
+    به جای OFFSET، سطرهای بعد از آخرین (name, id) صفحه‌ی قبل با ایندکس
+    ix_exercises_name_id خوانده می‌شوند و فقط ستون‌های درخواست شده SELECT
+    می‌شوند (بدون ساختن شیء ORM).
+
+    Args:
+        fields (list): نام فیلدها از FIELD_COLUMNS (پیش‌فرض: همه)
+        after (tuple): (name, id) آخرین سطر صفحه‌ی قبل
+        limit (int): تعداد سطرهای صفحه
+        raw_json (bool): خواندن ستون‌های JSON به صورت متن (برای RowSerializer)
+        **filters: فیلترهای exercise_filters()
+
+    Returns:
+        tuple: (نام ستون‌ها، لیست سطرها، (name, id) آخرین سطر یا None اگر صفحه‌ی بعدی وجود ندارد)
+    """
+    names = list(fields or FIELD_COLUMNS)
+    # name و id همیشه برای ساختن cursor خوانده می‌شوند
+    selected = ['name', 'id'] + [name for name in names if name not in ('name', 'id')]
+    columns = [
+        cast(FIELD_COLUMNS[name], Text) if raw_json and name in JSON_FIELDS else FIELD_COLUMNS[name]
+        for name in selected
+    ]
+    stmt = select(*columns).where(*exercise_filters(**filters))
+    if after is not None:
+        stmt = stmt.where(tuple_(Exercise.name, Exercise.id) > tuple_(*after))
+    stmt = stmt.order_by(Exercise.name, Exercise.id).limit(limit + 1)
+
+    rows = db.session.execute(stmt).all()
+    last = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = (rows[-1][0], rows[-1][1])
+    return selected, rows, last
+
+def estimate_count(**filters):
+    """
+    تخمین تعداد تمرین‌های منطبق از برنامه‌ی اجرای PostgreSQL بدون اجرای COUNT(*)
+
+    Returns:
+        int: تعداد تخمینی سطرها
+    """
+    stmt = select(Exercise.id).where(*exercise_filters(**filters))
+    compiled = stmt.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    plan = db.session.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -0,0 +1,127 @@
+import json
+import os
+import time
+from collections import namedtuple
+import logging
+
+from exercise_data.images import INDEX_NAME, OUTPUT_DIR, SOURCE_DIR
+
+logger = logging.getLogger(__name__)
+
+# فرمت‌های قابل انتخاب بر اساس هدر Accept به ترتیب اولویت؛ jpeg همیشه در دسترس است
+NEGOTIATED_FORMATS = (('avif', 'image/avif'), ('webp', 'image/webp'))
+FALLBACK_FORMAT = 'jpeg'
+
+# حداقل فاصله‌ی بررسی تغییر فایل index.json (ثانیه)
+RELOAD_INTERVAL = 5
+
+ImageFile = namedtuple('ImageFile', ['path', 'mimetype', 'width', 'etag', 'size'])
+
+class ImageIndex:
+    """
+    ایندکس درون‌پردازشی تصاویر و نسخه‌های تغییر اندازه داده شده
+
+    از dist/images/index.json (خروجی `make images`) ساخته می‌شود؛ ETag هر
+    فایل همان sha256 ثبت شده در ایندکس است و هنگام درخواست هش نمی‌شود.
+    """
+
+    def __init__(self, index_path, source_dir, output_dir):
+        # send_file مسیرهای نسبی را نسبت به پوشه‌ی app می‌خواند
+        self.index_path = os.path.abspath(index_path)
+        self.source_dir = os.path.abspath(source_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.images = {}
+        self._mtime = None
+        self._missing = False
+        self._checked_at = 0
+
+    def refresh(self):
+        """بارگذاری دوباره‌ی ایندکس در صورت تغییر فایل (حداکثر هر RELOAD_INTERVAL ثانیه)"""
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            if not self._missing:
+                logger.warning(f"Image index {self.index_path} not found; run `make images`")
+            self.images, self._mtime, self._missing = {}, None, True
+            return
+        self._missing = False
+        if mtime != self._mtime:
+            self.load()
+            self._mtime = mtime
+
+    def load(self):
+        """خواندن index.json و ساختن جدول جستجوی هر تصویر"""
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        images = {}
+        for image, record in data.items():
+            original = ImageFile(os.path.join(self.source_dir, image), record['format'],
+                                 record['width'], record['sha256'], record['bytes'])
+            variants = {}
+            for variant in record['variants']:
+                variants.setdefault(variant['format'], []).append(ImageFile(
+                    os.path.join(self.output_dir, variant['path']), f"image/{variant['format']}",
+                    variant['width'], variant['sha256'], variant['bytes']
+                ))
+            # خود تصویر اصلی بزرگ‌ترین نسخه‌ی jpeg است
+            variants.setdefault(FALLBACK_FORMAT, []).append(original)
+            for files in variants.values():
+                files.sort(key=lambda f: f.width)
+            images[image] = variants
+
+        self.images = images
+        logger.info(f"Loaded image index with {len(images)} images")
+
+    def select(self, image, accepted, width=None):
+        """
+        انتخاب فایل مناسب یک تصویر
+
+        Args:
+            image (str): مسیر تصویر نسبت به exercises/ (مثل Ab_Roller/0.jpg)
+            accepted (set): نوع‌های MIME که کلاینت صریحاً پذیرفته است
+            width (int): عرض مورد نیاز؛ کوچک‌ترین نسخه‌ی هم‌عرض یا پهن‌تر
+                انتخاب می‌شود (پیش‌فرض: اندازه‌ی اصلی)
+
+        Returns:
+            ImageFile: فایل انتخاب شده یا None اگر تصویر وجود نداشته باشد
+        """
+        self.refresh()
+        variants = self.images.get(image)
+        if variants is None:
+            return None
+
+        files = variants[FALLBACK_FORMAT]
+        for name, mimetype in NEGOTIATED_FORMATS:
+            if mimetype in accepted and name in variants:
+                files = variants[name]
+                break
+
+        if width is None:
+            return files[-1]
+        for candidate in files:
+            if candidate.width >= width:
+                return candidate
+        return files[-1]
+
+_index = None
+
+def get_image_index():
+    """
+    دریافت ایندکس تصاویر
+
+    ایندکس در هر پردازش یک بار ساخته می‌شود و بین درخواست‌ها مشترک است.
+
+    Returns:
+        ImageIndex: ایندکس تصاویر
+    """
+    global _index
+    if _index is None:
+        output_dir = os.getenv('IMAGES_DIR', OUTPUT_DIR)
+        _index = ImageIndex(os.path.join(output_dir, INDEX_NAME),
+                            os.getenv('IMAGES_SOURCE_DIR', SOURCE_DIR), output_dir)
+    return _index
@@ -0,0 +1,371 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # بدون fcntl (ویندوز) فایل spool قفل نمی‌شود؛ gunicorn فقط روی یونیکس اجرا می‌شود
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+
+# وضعیت‌هایی از bulk که ارسال دوباره‌ی سند را معنادار می‌کنند
+RETRYABLE_STATUSES = (429, 502, 503, 504)
+
+class LogShipper:
+    """
+    ارسال ناهمگام و دسته‌ای اسناد لاگ به Elasticsearch
+
+    اسناد در یک صف محدود در حافظه قرار می‌گیرند و یک thread پس‌زمینه آن‌ها
+    را در دسته‌هایی با حداکثر اندازه‌ی batch_size یا هر flush_interval ثانیه
+    با bulk API ارسال می‌کند. اگر Elasticsearch در دسترس نباشد اسناد در
+    یک فایل spool محلی (NDJSON) نوشته شده و پس از برقراری دوباره‌ی اتصال
+    ارسال می‌شوند.
+    """
+
+    def __init__(self, es, max_queue=10000, batch_size=500, flush_interval=1.0,
+                 drop_policy=DROP_OLDEST, block_timeout=0.05,
+                 spool_path='logs/es-spool.ndjson', spool_max_bytes=100 * 1024 * 1024):
+        """
+        Args:
+            es: کلاینت Elasticsearch
+            max_queue (int): حداکثر تعداد اسناد در صف
+            batch_size (int): حداکثر تعداد اسناد در هر درخواست bulk
+            flush_interval (float): حداکثر زمان ماندن سند در صف به ثانیه
+            drop_policy (str): رفتار هنگام پر بودن صف: 'drop_oldest'،
+                'drop_newest' یا 'block' (حداکثر block_timeout ثانیه انتظار)
+            block_timeout (float): حداکثر انتظار در سیاست block
+            spool_path (str): فایل spool برای زمان در دسترس نبودن ES (None برای غیرفعال)
+            spool_max_bytes (int): حداکثر اندازه‌ی فایل spool
+        """
+        if drop_policy not in (DROP_OLDEST, DROP_NEWEST, BLOCK):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+
+        self.es = es
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+        self.spool_path = spool_path
+        self.spool_max_bytes = spool_max_bytes
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._adopt_orphans = True
+        self._stopping = threading.Event()
+        self._flush_requested = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._stats = dict.fromkeys(('queued', 'sent', 'dropped', 'failed', 'spooled', 'replayed'), 0)
+
+    def start(self):
+        """راه‌اندازی thread ارسال (پس از fork در هر worker دوباره ساخته می‌شود)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._adopt_orphans = True
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='es-log-shipper', daemon=True)
+            self._thread.start()
+
+    def ship(self, index, document):
+        """
+        قرار دادن یک سند در صف ارسال؛ هرگز منتظر Elasticsearch نمی‌ماند
+
+        Args:
+            index (str): نام ایندکس
+            document (dict): سند لاگ
+
+        Returns:
+            bool: False اگر سند طبق سیاست صف حذف شد
+        """
+        if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+            self.start()
+
+        item = (index, document)
+        try:
+            if self.drop_policy == BLOCK:
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            if self.drop_policy != DROP_OLDEST:
+                self._incr('dropped')
+                return False
+            try:
+                self._queue.get_nowait()
+                self._incr('dropped')
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self._incr('dropped')
+                return False
+
+        self._idle.clear()
+        self._incr('queued')
+        return True
+
+    def flush(self, timeout=5.0):
+        """
+        ارسال فوری اسناد صف و انتظار تا خالی شدن آن
+
+        Returns:
+            bool: True اگر صف در زمان مشخص شده خالی شد
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        self._flush_requested.set()
+        return self._idle.wait(timeout)
+
+    def stop(self, timeout=5.0):
+        """ارسال اسناد باقی‌مانده و توقف thread (برای زمان خاموش شدن)"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._flush_requested.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # آنچه در زمان مقرر ارسال نشد در spool ذخیره می‌شود
+            self._spool(self._drain())
+
+    def stats(self):
+        """شمارنده‌های صف: queued، sent، dropped، failed، spooled، replayed و اندازه‌ی فعلی صف"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['pending'] = self._queue.qsize()
+        return stats
+
+    def _incr(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _drain(self, limit=None):
+        items = []
+        while limit is None or len(items) < limit:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if self._flush_requested.is_set() and self._queue.empty():
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.1)))
+                except queue.Empty:
+                    continue
+                batch.extend(self._drain(self.batch_size - len(batch)))
+
+            if batch:
+                if self._send(batch):
+                    self._replay_spool()
+                else:
+                    self._spool(batch)
+
+            if self._queue.empty():
+                self._flush_requested.clear()
+                self._idle.set()
+                if self._stopping.is_set():
+                    return
+
+    def _send(self, batch):
+        """
+        ارسال یک دسته با bulk API
+
+        Returns:
+            bool: False اگر Elasticsearch در دسترس نبود
+        """
+        operations = []
+        for index, document in batch:
+            operations.append({'index': {'_index': index}})
+            operations.append(document)
+
+        try:
+            response = self.es.bulk(operations=operations)
+        except Exception as e:
+            logger.warning(f"Elasticsearch bulk request failed: {str(e)}")
+            return False
+
+        retry = []
+        failed = 0
+        if response.get('errors'):
+            for item, (index, document) in zip(response['items'], batch):
+                result = item.get('index', {})
+                if result.get('status', 200) in RETRYABLE_STATUSES:
+                    retry.append((index, document))
+                elif 'error' in result:
+                    failed += 1
+        self._incr('failed', failed)
+        self._incr('sent', len(batch) - len(retry) - failed)
+        if retry:
+            self._spool(retry)
+        return True
+
+    def _spool(self, batch):
+        if not batch:
+            return
+        if not self.spool_path:
+            self._incr('dropped', len(batch))
+            return
+        try:
+            directory = os.path.dirname(self.spool_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            lines = [json.dumps({'index': index, 'document': document}, default=str) + '\n'
+                     for index, document in batch]
+            with self._spool_lock():
+                size = os.path.getsize(self.spool_path) if os.path.exists(self.spool_path) else 0
+                if size + sum(len(line) for line in lines) > self.spool_max_bytes:
+                    self._incr('dropped', len(batch))
+                    return
+                with open(self.spool_path, 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+            self._incr('spooled', len(batch))
+        except OSError as e:
+            self._incr('dropped', len(batch))
+            logger.error(f"Could not write log spool {self.spool_path}: {str(e)}")
+
+    @contextmanager
+    def _spool_lock(self):
+        """
+        قفل انحصاری بین پردازش‌ها برای نوشتن در فایل spool و جابه‌جا کردن آن
+
+        قفل روی فایل جداگانه‌ی .lock گرفته می‌شود تا بعد از جابه‌جایی spool
+        هیچ workerی در فایل replay دیگری ننویسد و خطوط workerها در هم نروند.
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.spool_path}.lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _orphaned_replays(self):
+        """فایل‌های replay پردازش‌هایی که دیگر اجرا نمی‌شوند (مثلاً worker از کار افتاده)"""
+        orphans = []
+        for path in glob.glob(f"{glob.escape(self.spool_path)}.*.replay"):
+            try:
+                pid = int(path[len(self.spool_path) + 1:-len('.replay')])
+            except ValueError:
+                continue
+            if pid == os.getpid():
+                # از پردازش قبلی با همین pid باقی مانده است
+                orphans.append(path)
+                continue
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                orphans.append(path)
+            except PermissionError:
+                pass
+        return orphans
+
+    def _replay_spool(self):
+        """ارسال اسناد spool شده پس از در دسترس قرار گرفتن دوباره‌ی Elasticsearch"""
+        if not self.spool_path:
+            return
+        # هر worker فایل replay جداگانه دارد تا workerها فایل یکدیگر را جایگزین نکنند
+        replay_path = f"{self.spool_path}.{os.getpid()}.replay"
+
+        if self._adopt_orphans:
+            # فایل replay یک worker از کار افتاده را هیچ پردازش دیگری نمی‌خواند
+            self._adopt_orphans = False
+            for orphan in self._orphaned_replays():
+                try:
+                    os.replace(orphan, replay_path)
+                except OSError:
+                    # worker دیگری زودتر آن را برداشت
+                    continue
+                logger.info(f"Replaying log spool {orphan} left by a stopped worker")
+                self._replay_file(replay_path)
+
+        if not os.path.exists(self.spool_path):
+            return
+        try:
+            with self._spool_lock():
+                os.replace(self.spool_path, replay_path)
+        except OSError:
+            return
+        self._replay_file(replay_path)
+
+    def _replay_file(self, replay_path):
+        """ارسال اسناد یک فایل replay و حذف آن؛ آنچه ارسال نشد دوباره spool می‌شود"""
+        batch = []
+        with open(replay_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                    batch.append((data['index'], data['document']))
+                except (ValueError, KeyError):
+                    continue
+                if len(batch) < self.batch_size:
+                    continue
+                if not self._send(batch):
+                    # باقی فایل برای تلاش بعدی دوباره spool می‌شود
+                    self._spool(batch)
+                    batch = []
+                    for rest in f:
+                        try:
+                            data = json.loads(rest)
+                            batch.append((data['index'], data['document']))
+                        except (ValueError, KeyError):
+                            continue
+                    self._spool(batch)
+                    batch = []
+                    break
+                self._incr('replayed', len(batch))
+                batch = []
+        if batch:
+            if self._send(batch):
+                self._incr('replayed', len(batch))
+            else:
+                self._spool(batch)
+        try:
+            os.remove(replay_path)
+        except FileNotFoundError:
+            pass
+
+def create_shipper(es):
+    """
+    ساخت LogShipper بر اساس متغیرهای محیطی و ثبت flush هنگام خاموش شدن
+
+    متغیرها: LOG_SHIPPER_QUEUE_SIZE، LOG_SHIPPER_BATCH_SIZE،
+    LOG_SHIPPER_FLUSH_INTERVAL، LOG_SHIPPER_DROP_POLICY و LOG_SHIPPER_SPOOL_PATH
+    """
+    shipper = LogShipper(
+        es,
+        max_queue=int(os.getenv('LOG_SHIPPER_QUEUE_SIZE', 10000)),
+        batch_size=int(os.getenv('LOG_SHIPPER_BATCH_SIZE', 500)),
+        flush_interval=float(os.getenv('LOG_SHIPPER_FLUSH_INTERVAL', 1.0)),
+        drop_policy=os.getenv('LOG_SHIPPER_DROP_POLICY', DROP_OLDEST),
+        spool_path=os.getenv('LOG_SHIPPER_SPOOL_PATH', 'logs/es-spool.ndjson') or None
+    )
+    atexit.register(shipper.stop)
+    return shipper
@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+from flask import g, request
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, make_wsgi_app, multiprocess
+)
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+# در حالت multiprocess (چند worker در gunicorn) مقادیر در فایل‌های این پوشه نوشته
+# و هنگام خواندن /metrics تجمیع می‌شوند؛ پوشه باید پیش از شروع workerها خالی شود
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+METRICS_PATH = '/metrics'
+
+# بازه‌های هیستوگرام تأخیر به ثانیه
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'Total HTTP requests',
+    ['method', 'route', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'HTTP requests currently being served',
+    multiprocess_mode='livesum'
+)
+ERROR_COUNT = Counter('http_errors_total', 'Total HTTP 5xx responses')
+APP_ERRORS = Counter('app_errors_total', 'Errors reported through monitoring.log_error')
+
+CACHE_EVENTS = Counter(
+    'cache_events_total', 'Cache hits, misses and other cache events',
+    ['event']
+)
+CACHE_LOCAL_ENTRIES = Gauge(
+    'cache_local_entries', 'Entries in the in-process cache',
+    multiprocess_mode='livesum'
+)
+DB_POOL_CONNECTIONS = Gauge(
+    'db_pool_connections', 'SQLAlchemy connection pool connections by state',
+    ['state'], multiprocess_mode='livesum'
+)
+
+def get_registry():
+    """
+    رجیستری مورد استفاده برای خروجی /metrics
+
+    Returns:
+        CollectorRegistry: در حالت multiprocess رجیستری تجمیع کننده‌ی همه‌ی
+        پردازش‌ها و در غیر این صورت رجیستری پیش‌فرض
+    """
+    if not MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+def _route():
+    # الگوی route به جای مسیر واقعی تا تعداد برچسب‌ها محدود بماند
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+def _update_gauges(db):
+    try:
+        pool = db.engine.pool
+        if hasattr(pool, 'checkedout'):
+            DB_POOL_CONNECTIONS.labels('checked_out').set(pool.checkedout())
+            DB_POOL_CONNECTIONS.labels('checked_in').set(pool.checkedin())
+            DB_POOL_CONNECTIONS.labels('overflow').set(max(pool.overflow(), 0))
+    except Exception:
+        pass
+
+    # فقط اگر سرویس کش در این پردازش بارگذاری شده باشد
+    cache_service = sys.modules.get('app.services.cache_service')
+    if cache_service is not None:
+        CACHE_LOCAL_ENTRIES.set(len(cache_service._local))
+
+def init_metrics(app, db=None):
+    """
+    ثبت اندازه‌گیری درخواست‌ها و سرو /metrics
+
+    /metrics مستقیماً توسط WSGI middleware پاسخ داده می‌شود و از routing،
+    rate limiter و hookهای Flask عبور نمی‌کند.
+
+    Args:
+        app (Flask): اپلیکیشن
+        db (SQLAlchemy): برای گزارش وضعیت connection pool (اختیاری)
+    """
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        REQUESTS_IN_PROGRESS.inc()
+
+    @app.after_request
+    def _record_request(response):
+        labels = (request.method, _route(), str(response.status_code))
+        REQUEST_COUNT.labels(*labels).inc()
+        # درخواست‌هایی که پیش از این hook رد شده‌اند (مثلاً rate limit) زمان‌سنجی نمی‌شوند
+        start = g.get('_metrics_start')
+        if start is not None:
+            REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - start)
+        if response.status_code >= 500:
+            ERROR_COUNT.inc()
+        if db is not None:
+            _update_gauges(db)
+        return response
+
+    @app.teardown_request
+    def _finish_request(exc):
+        if g.pop('_metrics_start', None) is not None:
+            REQUESTS_IN_PROGRESS.dec()
+
+    app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {
+        METRICS_PATH: make_wsgi_app(get_registry())
+    })
+
+def summary():
+    """
+    خلاصه‌ی متریک‌ها (تجمیع شده در همه‌ی پردازش‌ها در حالت multiprocess)
+
+    Returns:
+        dict: total_requests، total_errors و average_latency به ثانیه
+    """
+    totals = {}
+    for metric in get_registry().collect():
+        if metric.name not in ('http_requests', 'http_errors', 'http_request_duration_seconds'):
+            continue
+        for sample in metric.samples:
+            totals[sample.name] = totals.get(sample.name, 0) + sample.value
+
+    count = totals.get('http_request_duration_seconds_count', 0)
+    return {
+        'total_requests': int(totals.get('http_requests_total', 0)),
+        'total_errors': int(totals.get('http_errors_total', 0)),
+        'average_latency': totals.get('http_request_duration_seconds_sum', 0) / count if count else 0.0
+    }
@@ -1,10 +1,11 @@
 import logging
+import os
 from datetime import datetime
 from elasticsearch import Elasticsearch
-from prometheus_client import Counter, Histogram
 import time
 from functools import wraps
-from app import es
+from app.services.log_shipper import create_shipper
+from app.services.metrics import APP_ERRORS, summary
 
 # تنظیمات لاگینگ
 logging.basicConfig(
@@ -13,41 +14,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# متریک‌های Prometheus
-request_count = Counter('http_requests_total', 'Total HTTP requests')
-request_latency = Histogram('http_request_duration_seconds', 'HTTP request latency')
-error_count = Counter('http_errors_total', 'Total HTTP errors')
+# Elasticsearch فقط مقصد لاگ‌هاست؛ جستجوی تمرین‌ها با ایندکس درون‌پردازشی
+# (app.services.search_service) انجام می‌شود
+es = Elasticsearch([os.getenv('ELASTICSEARCH_URL', 'http://es:9200')])
+
+# ارسال ناهمگام و دسته‌ای لاگ‌ها تا تأخیر درخواست به Elasticsearch وابسته نباشد
+log_shipper = create_shipper(es)
 
 def log_request(func):
     """دکوراتور برای ثبت درخواست‌ها"""
     @wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
-        request_count.inc()
         
         try:
             result = func(*args, **kwargs)
             status_code = result[1] if isinstance(result, tuple) else 200
         except Exception as e:
-            error_count.inc()
             logger.error(f"Error in {func.__name__}: {str(e)}")
             raise
         finally:
             duration = time.time() - start_time
-            request_latency.observe(duration)
             
-            # ثبت لاگ در Elasticsearch
+            # ثبت لاگ در صف ارسال به Elasticsearch
             log_data = {
                 'timestamp': datetime.now().isoformat(),
                 'function': func.__name__,
                 'duration': duration,
                 'status_code': status_code if 'status_code' in locals() else 500
             }
-            
-            try:
-                es.index(index='api-logs', document=log_data)
-            except Exception as e:
-                logger.error(f"Error logging to Elasticsearch: {str(e)}")
+            log_shipper.ship('api-logs', log_data)
         
         return result
     return wrapper
@@ -80,17 +76,15 @@ def setup_monitoring():
     except Exception as e:
         logger.error(f"Error creating Elasticsearch index: {str(e)}")
 
+    log_shipper.start()
+
 def get_metrics():
-    """دریافت متریک‌های سیستم"""
-    return {
-        'total_requests': request_count._value.get(),
-        'total_errors': error_count._value.get(),
-        'average_latency': request_latency.observe(0)  # مقدار فعلی هیستوگرام
-    }
+    """دریافت متریک‌های سیستم (بدون ثبت نمونه‌ی جدید در هیستوگرام)"""
+    return summary()
 
 def log_error(error, context=None):
     """ثبت خطا در سیستم لاگینگ"""
-    error_count.inc()
+    APP_ERRORS.inc()
     error_data = {
         'timestamp': datetime.now().isoformat(),
         'error': str(error),
@@ -98,11 +92,7 @@ def log_error(error, context=None):
     }
     
     logger.error(f"Error: {str(error)}, Context: {context}")
-    
-    try:
-        es.index(index='api-errors', document=error_data)
-    except Exception as e:
-        logger.error(f"Error logging to Elasticsearch: {str(e)}")
+    log_shipper.ship('api-errors', error_data)
 
 # راه‌اندازی اولیه سیستم مانیتورینگ
 setup_monitoring() 
\ No newline at end of file
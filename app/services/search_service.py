@@ -0,0 +1,47 @@
+import os
+from exercise_data.search import INDEX_PATH, SearchIndex
+
+_index = None
+
+def get_search_index():
+    """
+    دریافت ایندکس جستجوی درون‌پردازشی
+
+    فایل ایندکس (خروجی `make dist/exercises.idx`) فقط یک بار در هر
+    پردازش به صورت mmap باز می‌شود و بین درخواست‌ها مشترک است.
+
+    Returns:
+        SearchIndex: ایندکس جستجو
+    """
+    global _index
+    if _index is None:
+        _index = SearchIndex.open(os.getenv('SEARCH_INDEX_PATH', INDEX_PATH))
+    return _index
+
+def search_exercises(query, limit=10, prefix=False, **filters):
+    """
+    جستجوی تمرین‌ها بر اساس نام و دستورالعمل‌ها با رتبه‌بندی BM25
+
+    Args:
+        query (str): متن جستجو
+        limit (int): حداکثر تعداد نتایج
+        prefix (bool): آخرین کلمه به عنوان پیشوند در نظر گرفته شود
+        **filters: فیلترهای level، force، mechanic، equipment، category و عضلات
+
+    Returns:
+        list: نتایج به ترتیب امتیاز
+    """
+    return get_search_index().search(query, limit=limit, prefix=prefix, **filters)
+
+def autocomplete(prefix, limit=10, **filters):
+    """
+    پیشنهاد نام تمرین‌ها برای تکمیل خودکار
+
+    Args:
+        prefix (str): متن وارد شده تا این لحظه
+        limit (int): حداکثر تعداد پیشنهادها
+
+    Returns:
+        list: پیشنهادها شامل id و name
+    """
+    return get_search_index().complete(prefix, limit=limit, **filters)
@@ -0,0 +1,87 @@
+"""
+Benchmark RowSerializer against Exercise.to_dict() + json.dumps
+
+Rows are built from dist/exercises.json the way a core select() returns
+them: one tuple per exercise in to_dict() field order, with JSON columns
+either decoded to lists or selected as text.
+
+Usage:
+    python -m benchmarks.exercise_serialization [--repeat 50]
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+
+from exercise_data.serialize import FIELDS, RowSerializer
+from exercise_data.store import DATASET_PATH
+
+
+def to_dict(self):
+    # Body of app.models.models.Exercise.to_dict(), which needs the Flask app to import
+    return {
+        'id': self.id,
+        'name': self.name,
+        'force': self.force,
+        'level': self.level,
+        'mechanic': self.mechanic,
+        'equipment': self.equipment,
+        'category': self.category,
+        'primaryMuscles': self.primary_muscles,
+        'secondaryMuscles': self.secondary_muscles,
+        'instructions': self.instructions,
+        'images': self.images,
+        'created_at': self.created_at.isoformat(),
+        'updated_at': self.updated_at.isoformat()
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with open(args.dataset, 'r', encoding='utf-8') as f:
+        exercises = json.load(f)
+
+    loaded = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    rows = [
+        (e['id'], e['name'], e['force'], e['level'], e['mechanic'], e['equipment'], e['category'],
+         e['primaryMuscles'], e['secondaryMuscles'], e['instructions'], e['images'], loaded, loaded)
+        for e in exercises
+    ]
+    text_rows = [
+        row[:7] + tuple(json.dumps(v) for v in row[7:11]) + row[11:]
+        for row in rows
+    ]
+    instances = [
+        SimpleNamespace(id=r[0], name=r[1], force=r[2], level=r[3], mechanic=r[4], equipment=r[5],
+                        category=r[6], primary_muscles=r[7], secondary_muscles=r[8], instructions=r[9],
+                        images=r[10], created_at=r[11], updated_at=r[12])
+        for r in rows
+    ]
+
+    serializer = RowSerializer(FIELDS)
+    cases = [
+        ('to_dict + json.dumps', lambda: json.dumps([to_dict(i) for i in instances]).encode('utf-8')),
+        ('RowSerializer, JSON columns decoded', lambda: serializer.dumps(rows)),
+        ('RowSerializer, JSON columns as text', lambda: serializer.dumps(text_rows)),
+    ]
+
+    expected = json.loads(cases[0][1]())
+    for description, run in cases[1:]:
+        assert json.loads(run()) == expected, description
+
+    print(f"{len(rows)} exercises, {args.repeat} iterations per case\n")
+    print(f"{'case':<40} {'ms':>8} {'speedup':>8}")
+    baseline = None
+    for description, run in cases:
+        ms = timeit.timeit(run, number=args.repeat) / args.repeat * 1e3
+        baseline = baseline or ms
+        print(f"{description:<40} {ms:>8.2f} {baseline / ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""
+Benchmark the crawler page parsers over a fixed HTML corpus
+
+Runs ExerciseParser.extract_categories, extract_exercises and
+extract_exercise_details (crawler_module) with every installed backend,
+and exercise_data.bodybuilding.parse_exercise_page, the bodybuilding.com
+parser behind crawler.py. Reports pages/sec (of the fastest pass over
+all --runs runs), and the median over the runs of the p50/p99 time per
+page and of the peak traced memory per page, for each case. The runs
+are interleaved across the cases, so a burst of machine load hits one
+run of every case rather than every run of one case.
+
+The corpus in benchmarks/parser_corpus is synthetic. The pages were
+written to match the selectors the parsers use, with the bulk of real
+pages around them (head scripts, navigation, footer). Files are named
+<kind>-<anything>.html, where kind is main, category, exercise or
+bodybuilding (crawler.py). Saved real pages can be added the same way.
+
+--compare fails (exit status 1) when a case's pages/sec drops, or its
+peak memory grows, by more than --threshold against the baseline.
+--compare and --save-baseline use at least MIN_GATED_RUNS runs of
+MIN_GATED_REPEAT passes: on shared machines the speed drifts by more
+than the threshold within a minute, and a single short run (or the
+median of runs taken during a slow spell) flags unchanged code. Timings depend on the machine, so record
+the baseline on the machine that compares against it.
+
+Usage:
+    python -m benchmarks.page_parsing [--repeat 20] [--runs 1] [--backend lxml]
+    python -m benchmarks.page_parsing --save-baseline
+    python -m benchmarks.page_parsing --compare [--threshold 0.25]
+"""
+import argparse
+import glob
+import importlib.util
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+CORPUS_DIR = os.path.join(BENCHMARK_DIR, 'parser_corpus')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'page_parsing_baseline.json')
+PARSER_MODULE_PATH = os.path.join(REPO_DIR, 'crawler_module', 'crawler', 'parser-module.py')
+
+# Corpus kind each ExerciseParser extractor runs on
+EXTRACTORS = (
+    ('main', 'extract_categories'),
+    ('category', 'extract_exercises'),
+    ('exercise', 'extract_exercise_details'),
+)
+
+# Metrics compared against the baseline, and whether higher is better. Percentiles
+# are reported only, they move too much with machine load to gate on
+GATED_METRICS = (('pages_per_sec', True), ('peak_kib', False))
+
+# Least runs and passes per run behind a baseline or a comparison
+MIN_GATED_RUNS = 5
+MIN_GATED_REPEAT = 20
+
+
+def load_corpus(directory: str) -> Dict[str, List[str]]:
+    """Pages of the corpus grouped by kind (the file name prefix)"""
+    corpus: Dict[str, List[str]] = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+        kind = os.path.basename(path).split('-', 1)[0]
+        with open(path, 'r', encoding='utf-8') as f:
+            corpus.setdefault(kind, []).append(f.read())
+    return corpus
+
+
+def load_parser_module():
+    # The file name has a hyphen, so it cannot be imported by name
+    spec = importlib.util.spec_from_file_location('crawler_parser', PARSER_MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # The fallback paths log on every page
+    logging.getLogger(module.__name__).setLevel(logging.ERROR)
+    return module
+
+
+def build_cases(module, corpus: Dict[str, List[str]], backends: List[str]) -> List[Tuple[str, Callable, List[str]]]:
+    """(name, function, pages) for every extractor and backend with pages in the corpus"""
+    cases = []
+    for backend in backends:
+        parser = module.ExerciseParser(backend)
+        for kind, method in EXTRACTORS:
+            if corpus.get(kind):
+                cases.append((f'{method}[{backend}]', getattr(parser, method), corpus[kind]))
+
+    if corpus.get('bodybuilding'):
+        # Imported here so the benchmark still runs the other cases without bs4
+        from exercise_data.bodybuilding import parse_exercise_page
+        cases.append(('parse_exercise_page[bodybuilding]', parse_exercise_page, corpus['bodybuilding']))
+    return cases
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(function: Callable, pages: List[str], repeat: int) -> Dict[str, float]:
+    """
+    Time a parser over the pages
+
+    Args:
+        function: Parser taking the page HTML
+        pages: Page HTML
+        repeat: Passes over the pages
+
+    Returns:
+        Dictionary with pages_per_sec (fastest pass), p50_ms and p99_ms
+        (all pages of all passes) and peak_kib
+    """
+    for html in pages:
+        function(html)
+
+    timings = []
+    passes = []
+    clock = time.perf_counter
+    for _ in range(repeat):
+        for html in pages:
+            start = clock()
+            function(html)
+            timings.append(clock() - start)
+        passes.append(sum(timings[-len(pages):]))
+
+    # Memory is traced in a separate pass, tracing slows the parser down
+    peak = 0
+    tracemalloc.start()
+    try:
+        for html in pages:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            function(html)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        # Throughput of the fastest pass, the least disturbed by other load
+        'pages_per_sec': round(len(pages) / min(passes), 1),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def combine_runs(samples: List[Dict[str, float]]) -> Dict[str, float]:
+    """Results of several measure() runs: the fastest pass of any run, the median of the rest"""
+    combined = {metric: round(statistics.median(sample[metric] for sample in samples), 3)
+                for metric in samples[0]}
+    combined['pages_per_sec'] = max(sample['pages_per_sec'] for sample in samples)
+    return combined
+
+
+def find_regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                     threshold: float) -> List[str]:
+    """Descriptions of gated metrics worse than the baseline by more than threshold"""
+    regressions = []
+    for name, metrics in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric, higher_is_better in GATED_METRICS:
+            old, new = expected.get(metric), metrics[metric]
+            if not old:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > threshold:
+                regressions.append(f'{name}: {metric} {old} -> {new} ({change:+.0%} worse)')
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    module = load_parser_module()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', default=CORPUS_DIR)
+    parser.add_argument('--repeat', type=int, default=20, help='Passes over the pages per run')
+    parser.add_argument('--runs', type=int, default=1, help='Runs per case, interleaved across the cases')
+    parser.add_argument('--backend', action='append', choices=['selectolax', 'lxml', 'html.parser'],
+                        help='ExerciseParser backend (repeatable; default: every installed one)')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results to --baseline')
+    parser.add_argument('--compare', action='store_true', help='Fail on regressions against --baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed slowdown (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        parser.error(f'No pages in {args.corpus}')
+    backends = args.backend or module.available_backends()
+    missing = [b for b in backends if b not in module.available_backends()]
+    if missing:
+        parser.error(f"Backend not installed: {', '.join(missing)}")
+
+    runs, repeat = args.runs, args.repeat
+    if args.compare or args.save_baseline:
+        runs, repeat = max(runs, MIN_GATED_RUNS), max(repeat, MIN_GATED_REPEAT)
+
+    cases = build_cases(module, corpus, backends)
+    samples: Dict[str, List[Dict[str, float]]] = {name: [] for name, _, _ in cases}
+    for _ in range(runs):
+        for name, function, pages in cases:
+            samples[name].append(measure(function, pages, repeat))
+
+    results = {}
+    print(f"{'case':<44} {'pages':>5} {'pages/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'peak KiB':>9}")
+    for name, _, pages in cases:
+        metrics = results[name] = combine_runs(samples[name])
+        print(f"{name:<44} {len(pages):>5} {metrics['pages_per_sec']:>9} {metrics['p50_ms']:>8} "
+              f"{metrics['p99_ms']:>8} {metrics['peak_kib']:>9}")
+    print(f'{runs} run(s) of {repeat} passes per case')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baseline written to {args.baseline}')
+
+    if args.compare:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+        print(f'No regressions beyond {args.threshold:.0%} against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Benchmark ExerciseStore filtering against the list-of-dicts scan
+
+Usage:
+    python -m benchmarks.store_filtering [--repeat 2000]
+"""
+import argparse
+import json
+import timeit
+
+from exercise_data.store import DATASET_PATH, SCHEMA_PATH, ExerciseStore
+
+# (description, store filter, equivalent list-of-dicts predicate)
+CASES = [
+    (
+        'compound dumbbell, chest but not shoulders',
+        dict(mechanic='compound', equipment='dumbbell', muscles='chest', exclude_muscles='shoulders'),
+        lambda e: (e['mechanic'] == 'compound' and e['equipment'] == 'dumbbell'
+                   and 'chest' in e['primaryMuscles'] + e['secondaryMuscles']
+                   and 'shoulders' not in e['primaryMuscles'] + e['secondaryMuscles'])
+    ),
+    (
+        'beginner strength',
+        dict(level='beginner', category='strength'),
+        lambda e: e['level'] == 'beginner' and e['category'] == 'strength'
+    ),
+    (
+        'primary quadriceps or glutes, barbell or machine',
+        dict(primary_muscles=['quadriceps', 'glutes'], equipment=['barbell', 'machine']),
+        lambda e: (e['equipment'] in ('barbell', 'machine')
+                   and any(m in ('quadriceps', 'glutes') for m in e['primaryMuscles']))
+    ),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--schema', default=SCHEMA_PATH)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(args.dataset, 'r', encoding='utf-8') as f:
+        exercises = json.load(f)
+    store = ExerciseStore.from_file(args.dataset, args.schema)
+
+    print(f"{len(exercises)} exercises, {args.repeat} iterations per case\n")
+    print(f"{'case':<50} {'matches':>7} {'list (us)':>10} {'store (us)':>11} {'speedup':>8}")
+    for description, filters, predicate in CASES:
+        expected = [e for e in exercises if predicate(e)]
+        assert store.query(**filters) == expected, description
+
+        list_time = timeit.timeit(lambda: [e for e in exercises if predicate(e)], number=args.repeat)
+        store_time = timeit.timeit(lambda: store.query(**filters), number=args.repeat)
+        list_us = list_time / args.repeat * 1e6
+        store_us = store_time / args.repeat * 1e6
+        print(f"{description:<50} {len(expected):>7} {list_us:>10.1f} {store_us:>11.1f} {list_us / store_us:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,61 +1,482 @@
 from crawl4ai import AsyncCrawler
 from bs4 import BeautifulSoup
+import asyncio
+import base64
+import functools
+import hashlib
+import heapq
 import json
 import os
+import random
+import textwrap
+import threading
+import time
+from array import array
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlsplit
 from tqdm import tqdm
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional
 import uvicorn
+import logging
+
+from exercise_data.bodybuilding import parse_exercise_page
+from exercise_data.manifest import atomic_write
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Exercise Crawler API")
 
+DATASET_PATH = 'dist/exercises.json'
+# تمرین‌های خزش شده در حین خزش به این فایل اضافه می‌شوند
+STREAM_PATH = 'dist/exercises.ndjson'
+STREAM_BUFFER_BYTES = 1024 * 1024
+STREAM_FSYNC_INTERVAL = float(os.getenv('CRAWL_FSYNC_INTERVAL', 5))
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# تنظیمات زمان‌بندی خزش
+CRAWL_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', 8))
+CRAWL_RATE_PER_HOST = float(os.getenv('CRAWL_RATE_PER_HOST', 4))
+CRAWL_BURST = int(os.getenv('CRAWL_BURST', 4))
+CRAWL_MAX_RETRIES = int(os.getenv('CRAWL_MAX_RETRIES', 5))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class RetryableError(Exception):
+    """پاسخی که باید دوباره درخواست شود (429 یا 5xx)"""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+def parse_retry_after(value):
+    """
+    تبدیل هدر Retry-After (ثانیه یا تاریخ HTTP) به تعداد ثانیه
+
+    Returns:
+        float: ثانیه‌های انتظار یا None اگر هدر نامعتبر یا خالی باشد
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+class TokenBucket:
+    """محدودیت نرخ درخواست برای یک host"""
+
+    def __init__(self, rate, capacity):
+        """
+        Args:
+            rate (float): تعداد درخواست مجاز در هر ثانیه
+            capacity (int): حداکثر درخواست‌های پشت سر هم (burst)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def block(self, seconds):
+        """توقف همه‌ی درخواست‌های این host (مثلاً طبق Retry-After)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class FetchScheduler:
+    """
+    اجرای همزمان درخواست‌ها با سقف همزمانی سراسری و محدودیت نرخ هر host
+
+    درخواست‌ها از یک صف اولویت‌دار (عدد کمتر زودتر) برداشته می‌شوند. پاسخ‌های
+    429 و 5xx و خطاهای شبکه با backoff نمایی و jitter دوباره در صف قرار
+    می‌گیرند و Retry-After برای کل host رعایت می‌شود.
+    """
+
+    def __init__(self, fetch, concurrency=CRAWL_CONCURRENCY, rate=CRAWL_RATE_PER_HOST,
+                 burst=CRAWL_BURST, max_retries=CRAWL_MAX_RETRIES, progress=None):
+        """
+        Args:
+            fetch: coroutine که برای یک URL پاسخ را برمی‌گرداند
+            concurrency (int): حداکثر درخواست‌های همزمان
+            rate (float): حداکثر درخواست در ثانیه برای هر host
+            burst (int): ظرفیت token bucket هر host
+            max_retries (int): حداکثر تعداد تلاش دوباره برای هر URL
+            progress (tqdm): نوار پیشرفت؛ فقط با پایان قطعی هر URL جلو می‌رود
+        """
+        self.fetch = fetch
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.progress = progress
+        self.stats = {'succeeded': 0, 'failed': 0, 'retries': 0}
+        self._heap = []
+        self._seq = 0
+        self._buckets = {}
+        self._pending = 0
+        self._retrying = set()
+        self._ready = None
+        self._done = None
+
+    def add(self, url, priority=0, callback=None):
+        """
+        افزودن URL به صف
+
+        Args:
+            url (str): آدرس
+            priority (int): اولویت (عدد کمتر زودتر)
+            callback: coroutine اختیاری که پاسخ را پردازش می‌کند؛ مقدار آن نتیجه‌ی URL است
+        """
+        self._pending += 1
+        self._push((priority, url, 0, callback))
+
+    def _push(self, item):
+        self._seq += 1
+        heapq.heappush(self._heap, (item[0], self._seq, item))
+        if self._ready is not None:
+            self._ready.set()
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    def _backoff(self, attempt):
+        # backoff نمایی با jitter برابر: نیمی ثابت و نیمی تصادفی
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _finish(self, ok):
+        self.stats['succeeded' if ok else 'failed'] += 1
+        self._pending -= 1
+        if self.progress is not None:
+            self.progress.update(1)
+            self.progress.set_postfix(retries=self.stats['retries'], failed=self.stats['failed'])
+        if self._pending == 0:
+            self._done.set()
+
+    async def _requeue(self, item, delay):
+        await asyncio.sleep(delay)
+        self._push(item)
+
+    async def _process(self, item, results, errors):
+        priority, url, attempt, callback = item
+        bucket = self._bucket(url)
+        await bucket.acquire()
+        try:
+            response = await self.fetch(url)
+            status = getattr(response, 'status_code', None) or getattr(response, 'status', None) or 200
+            if status in RETRY_STATUSES:
+                headers = getattr(response, 'headers', None) or {}
+                retry_after = headers.get('Retry-After') or headers.get('retry-after')
+                raise RetryableError(status, parse_retry_after(retry_after))
+        except Exception as e:
+            if attempt >= self.max_retries:
+                errors[url] = e
+                self._finish(False)
+                return
+            delay = self._backoff(attempt)
+            retry_after = getattr(e, 'retry_after', None)
+            if retry_after is not None:
+                bucket.block(retry_after)
+                delay = max(delay, retry_after)
+            self.stats['retries'] += 1
+            task = asyncio.ensure_future(self._requeue((priority, url, attempt + 1, callback), delay))
+            self._retrying.add(task)
+            task.add_done_callback(self._retrying.discard)
+            return
+
+        # خطای پردازش پاسخ با درخواست دوباره برطرف نمی‌شود
+        try:
+            results[url] = await callback(response) if callback else response
+        except Exception as e:
+            errors[url] = e
+            self._finish(False)
+            return
+        self._finish(True)
+
+    async def run(self):
+        """
+        اجرای همه‌ی درخواست‌های صف تا پایان قطعی هر کدام
+
+        Returns:
+            tuple: (نتایج به صورت {url: result}، خطاها به صورت {url: exception})
+        """
+        results, errors = {}, {}
+        if self._pending == 0:
+            return results, errors
+
+        self._ready = asyncio.Event()
+        self._done = asyncio.Event()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+
+        async def run_one(item):
+            try:
+                await self._process(item, results, errors)
+            finally:
+                semaphore.release()
+
+        while not self._done.is_set():
+            if not self._heap:
+                self._ready.clear()
+                waiter = asyncio.ensure_future(self._ready.wait())
+                done_waiter = asyncio.ensure_future(self._done.wait())
+                await asyncio.wait({waiter, done_waiter}, return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                done_waiter.cancel()
+                continue
+            await semaphore.acquire()
+            if not self._heap:
+                semaphore.release()
+                continue
+            _, _, item = heapq.heappop(self._heap)
+            task = asyncio.ensure_future(run_one(item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        return results, errors
+
+class ExerciseStreamWriter:
+    """
+    نوشتن تمرین‌ها در فایل NDJSON به محض پردازش
+
+    حداکثر buffer_bytes داده در حافظه می‌ماند و فایل هر fsync_interval ثانیه
+    روی دیسک fsync می‌شود، پس با قطع خزش فقط چند ثانیه‌ی آخر از دست می‌رود.
+    برای هر جایگاه فقط offset و طول سطر نگه داشته می‌شود تا exercises.json
+    نهایی بدون بارگذاری همه‌ی تمرین‌ها و به ترتیب صفحه‌ی اصلی ساخته شود.
+    """
+
+    def __init__(self, count, path=STREAM_PATH, buffer_bytes=STREAM_BUFFER_BYTES,
+                 fsync_interval=STREAM_FSYNC_INTERVAL):
+        """
+        Args:
+            count (int): تعداد جایگاه‌ها (تعداد URLهای تمرین)
+            path (str): فایل NDJSON
+            buffer_bytes (int): حداکثر داده‌ی نوشته نشده در حافظه
+            fsync_interval (float): فاصله‌ی fsync بر حسب ثانیه
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.buffer_bytes = buffer_bytes
+        self.fsync_interval = fsync_interval
+        self.file = open(path, 'wb')
+        self.offsets = array('q', [-1]) * count
+        self.lengths = array('q', [0]) * count
+        self.written = 0
+        self._buffer = []
+        self._buffered = 0
+        self._position = 0
+        self._synced = time.monotonic()
+
+    def write(self, slot, record):
+        """
+        افزودن یک تمرین
+
+        Args:
+            slot (int): جایگاه تمرین در خروجی نهایی
+            record (dict): تمرین پردازش شده
+        """
+        line = json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+        self.offsets[slot] = self._position
+        self.lengths[slot] = len(line) - 1
+        self._position += len(line)
+        self._buffer.append(line)
+        self._buffered += len(line)
+        self.written += 1
+        if self._buffered >= self.buffer_bytes:
+            self.flush()
+        if time.monotonic() - self._synced >= self.fsync_interval:
+            self.sync()
+
+    def flush(self):
+        if self._buffer:
+            self.file.write(b''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def sync(self):
+        """نوشتن buffer و fsync فایل"""
+        self.flush()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self._synced = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    def records(self):
+        """تمرین‌های نوشته شده به ترتیب جایگاه، یکی یکی از روی فایل"""
+        with open(self.path, 'rb') as f:
+            for offset, length in zip(self.offsets, self.lengths):
+                if offset >= 0:
+                    f.seek(offset)
+                    yield json.loads(f.read(length))
+
+    def _json_chunks(self):
+        # همان خروجی json.dump(..., indent=2) برای کل لیست، تمرین به تمرین
+        separator = '[\n'
+        for record in self.records():
+            yield separator + textwrap.indent(json.dumps(record, ensure_ascii=False, indent=2), '  ')
+            separator = ',\n'
+        yield '[]' if separator == '[\n' else '\n]'
+
+    def assemble(self, path=DATASET_PATH):
+        """ساخت فایل JSON نهایی؛ با فایل موقت و rename، پس خواننده‌ها هرگز فایل نیمه‌کاره نمی‌بینند"""
+        self.close()
+        atomic_write(path, self._json_chunks())
+
 class ExerciseCrawler(AsyncCrawler):
     def __init__(self):
         super().__init__()
         self.base_url = "https://www.bodybuilding.com/exercises"
-        self.exercises = []
+        self.writer = None
 
     async def parse_exercise(self, response):
         """پردازش صفحه هر تمرین"""
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        exercise = {
-            'name': soup.select_one('h1.ExerciseTitle').text.strip(),
-            'category': soup.select_one('div.BBCategoryBadge').text.strip(),
-            'muscles': [m.text.strip() for m in soup.select('div.ExerciseMuscles span')],
-            'equipment': soup.select_one('div.ExerciseEquipment').text.strip(),
-            'level': soup.select_one('div.ExerciseLevel').text.strip(),
-            'instructions': [i.text.strip() for i in soup.select('ol.ExerciseInstructions li')],
-            'images': [img['src'] for img in soup.select('div.ExerciseMedia img')]
-        }
-        
-        self.exercises.append(exercise)
-        return exercise
+        return parse_exercise_page(response.text)
+
+    async def save_exercise(self, slot, response):
+        """پردازش صفحه‌ی تمرین و نوشتن فوری آن؛ فقط جایگاه در حافظه می‌ماند"""
+        self.writer.write(slot, await self.parse_exercise(response))
+        return slot
 
     async def crawl(self):
         """شروع خزش از صفحه اصلی"""
         # دریافت لیست تمرین‌ها
         response = await self.get(self.base_url)
         soup = BeautifulSoup(response.text, 'html.parser')
-        exercise_links = soup.select('a.ExerciseCard')
+        exercise_urls = list(dict.fromkeys(urljoin(self.base_url, link['href'])
+                                           for link in soup.select('a.ExerciseCard')))
 
-        # خزش هر تمرین
-        for link in tqdm(exercise_links, desc="Crawling exercises"):
-            exercise_url = link['href']
-            await self.get(exercise_url, callback=self.parse_exercise)
+        # خزش همزمان تمرین‌ها به ترتیب صفحه‌ی اصلی
+        # تمرین‌ها در حین خزش در STREAM_PATH نوشته می‌شوند
+        self.writer = ExerciseStreamWriter(len(exercise_urls))
+        try:
+            with tqdm(total=len(exercise_urls), desc="Crawling exercises") as progress:
+                scheduler = FetchScheduler(self.get, progress=progress)
+                for priority, exercise_url in enumerate(exercise_urls):
+                    scheduler.add(exercise_url, priority=priority,
+                                  callback=functools.partial(self.save_exercise, priority))
+                results, errors = await scheduler.run()
+        finally:
+            self.writer.close()
+
+        for exercise_url, error in errors.items():
+            logger.warning(f"Failed to crawl {exercise_url}: {str(error)}")
+        if errors:
+            logger.warning(f"Crawl finished with {len(errors)} failed of {len(exercise_urls)} exercises "
+                           f"after {scheduler.stats['retries']} retries")
 
         # ذخیره نتایج
         await self.save_results()
 
     async def save_results(self):
-        """ذخیره نتایج در فایل JSON"""
-        if not os.path.exists('dist'):
-            os.makedirs('dist')
-            
-        with open('dist/exercises.json', 'w', encoding='utf-8') as f:
-            json.dump(self.exercises, f, ensure_ascii=False, indent=2)
+        """ذخیره نتایج در فایل JSON به ترتیب صفحه‌ی اصلی"""
+        self.writer.assemble(DATASET_PATH)
+
+class DatasetSnapshot:
+    """نسخه‌ی پردازش شده‌ی فایل داده در یک لحظه"""
+
+    def __init__(self, raw, stat):
+        # ترتیب فایل (ترتیب صفحه‌ی اصلی) حفظ می‌شود؛ رکوردهای خزشگر شناسه ندارند
+        records = json.loads(raw)
+        self.stat_key = (stat.st_mtime_ns, stat.st_size)
+        self.etag = hashlib.sha256(raw).hexdigest()[:32]
+        self.records = records
+        self.fields = {key for e in records for key in e}
+        # هر تمرین یک بار سریال می‌شود و برای صفحه‌بندی و NDJSON دوباره استفاده می‌شود
+        self.encoded = [json.dumps(e, ensure_ascii=False).encode('utf-8') for e in records]
+
+class DatasetCache:
+    """نگهداری داده‌ها در حافظه و بارگذاری مجدد فقط با تغییر mtime یا اندازه‌ی فایل"""
+
+    def __init__(self, path=DATASET_PATH):
+        self.path = path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        دریافت آخرین نسخه‌ی داده‌ها
+
+        Returns:
+            DatasetSnapshot: نسخه‌ی فعلی داده‌ها
+
+        Raises:
+            FileNotFoundError: اگر فایل داده وجود نداشته باشد
+        """
+        stat = os.stat(self.path)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.stat_key == (stat.st_mtime_ns, stat.st_size):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.stat_key != (stat.st_mtime_ns, stat.st_size):
+                with open(self.path, 'rb') as f:
+                    # stat و محتوا از همان فایل باز شده خوانده می‌شوند
+                    stat = os.fstat(f.fileno())
+                    raw = f.read()
+                snapshot = DatasetSnapshot(raw, stat)
+                self._snapshot = snapshot
+            return snapshot
+
+def encode_cursor(version, position):
+    raw = f"{version}:{position}".encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, snapshot):
+    """
+    موقعیت شروع صفحه از روی cursor
+
+    cursor شامل نسخه‌ی داده است؛ بعد از جایگزینی فایل داده موقعیت‌ها دیگر
+    معتبر نیستند و کلاینت باید از صفحه‌ی اول شروع کند.
+
+    Raises:
+        HTTPException: 400 برای cursor نامعتبر و 410 برای cursor نسخه‌ی قبلی
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        version, _, position = base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii').partition(':')
+        position = int(position)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if position < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if version != snapshot.etag:
+        raise HTTPException(status_code=410, detail="Cursor expired; the dataset changed, restart from the first page")
+    return position
 
 crawler = ExerciseCrawler()
+dataset = DatasetCache()
 
 @app.get("/")
 async def read_root():
@@ -67,15 +488,78 @@ async def start_crawl(background_tasks: BackgroundTasks):
     background_tasks.add_task(crawler.crawl)
     return {"message": "Crawling started in background"}
 
+# تابع همگام: FastAPI آن را در threadpool اجرا می‌کند تا خواندن و پردازش دوباره‌ی
+# فایل داده، قفل DatasetCache و ساختن بدنه حلقه‌ی رویداد را مسدود نکنند
 @app.get("/exercises")
-async def get_exercises():
-    """دریافت لیست تمرین‌های ذخیره شده"""
+def get_exercises(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: str = Query('json', pattern='^(json|ndjson)$')
+):
+    """
+    دریافت لیست تمرین‌های ذخیره شده
+
+    بدون limit و cursor مثل قبل کل لیست (آرایه‌ی JSON) برگردانده می‌شود.
+
+    Args:
+        limit: تعداد تمرین‌ها در هر صفحه (پیش‌فرض DEFAULT_PAGE_SIZE همراه با cursor)
+        cursor: مقدار next_cursor از صفحه‌ی قبل
+        fields: فیلدهای مورد نیاز، جدا شده با کاما (مثلاً id,name)
+        format: json برای یک صفحه یا ndjson برای دریافت جریانی کل داده‌ها
+    """
     try:
-        with open('dist/exercises.json', 'r', encoding='utf-8') as f:
-            exercises = json.load(f)
-        return exercises
+        snapshot = dataset.get()
     except FileNotFoundError:
         return {"message": "No exercises found. Start crawling first."}
 
+    projection = None
+    if fields:
+        projection = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in projection if f not in snapshot.fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    # ETag به نسخه‌ی داده و پارامترهای درخواست بستگی دارد
+    variant = hashlib.sha256(str(request.url.query).encode('utf-8')).hexdigest()[:16]
+    etag = f'"{snapshot.etag}-{variant}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]):
+        return Response(status_code=304, headers=headers)
+
+    def encode(index):
+        if projection is None:
+            return snapshot.encoded[index]
+        record = snapshot.records[index]
+        return json.dumps({f: record.get(f) for f in projection}, ensure_ascii=False).encode('utf-8')
+
+    if format == 'ndjson':
+        def stream():
+            for index in range(len(snapshot.records)):
+                yield encode(index) + b'\n'
+        return StreamingResponse(stream(), media_type='application/x-ndjson', headers=headers)
+
+    if limit is None and cursor is None:
+        # پاسخ قدیمی: کل لیست بدون صفحه‌بندی
+        body = b'[' + b','.join(encode(index) for index in range(len(snapshot.records))) + b']'
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    start = decode_cursor(cursor, snapshot) if cursor else 0
+    end = min(start + (limit or DEFAULT_PAGE_SIZE), len(snapshot.records))
+    start = min(start, end)
+    next_cursor = encode_cursor(snapshot.etag, end) if end < len(snapshot.records) else None
+
+    body = b''.join([
+        b'{"exercises":[',
+        b','.join(encode(index) for index in range(start, end)),
+        b'],"count":', str(end - start).encode('ascii'),
+        b',"total":', str(len(snapshot.records)).encode('ascii'),
+        b',"next_cursor":', json.dumps(next_cursor).encode('ascii'),
+        b'}'
+    ])
+    return Response(content=body, media_type='application/json', headers=headers)
+
 if __name__ == "__main__":
     uvicorn.run("crawler:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
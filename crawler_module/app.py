@@ -4,6 +4,7 @@ from flask import Flask, render_template, request, jsonify
 import logging
 
 from crawler.exercise_crawler import ExerciseCrawler
+from crawler.jobs import DONE, CrawlJobQueue
 from utils.cache import CacheManager
 from utils.logger import setup_logger
 
@@ -14,25 +15,47 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 cache = CacheManager(ttl=3600)  # 1 hour cache
 
+# Tasks that exist to refresh the data; their results are never cached or served from cache
+UNCACHED_TASKS = frozenset(('all', 'reparse'))
+
 @app.route('/')
 def index():
     """Render main page"""
     return render_template('index.html')
 
+def cache_key(task, url=None):
+    """Cache key of a crawl result"""
+    return f"{task}:{url}" if url else task
+
+def cache_job_result(job):
+    """Cache the result of a successful job (runs in the crawl worker)"""
+    if job.use_cache and job.state == DONE and job.task not in UNCACHED_TASKS:
+        cache.set(cache_key(job.task, job.url), job.result)
+
+# Long-lived crawl workers, each reusing one crawler (and its browser) across jobs
+jobs = CrawlJobQueue(
+    lambda: ExerciseCrawler(headless=True, js_render=True),
+    workers=int(os.environ.get('CRAWL_WORKERS', 2)),
+    on_done=cache_job_result
+)
+
 @app.route('/api/crawl', methods=['POST'])
 def crawl():
-    """API endpoint for crawling"""
+    """
+    API endpoint for crawling
+
+    Returns the cached result right away when there is one; otherwise queues
+    a crawl job (or joins an identical one in progress) and returns 202 with
+    its id. Poll /api/jobs/<job_id> and fetch /api/jobs/<job_id>/result.
+    """
     data = request.json
     task = data.get('task', 'main')
-    url = data.get('url')
+    url = data.get('url') or None
     use_cache = data.get('use_cache', True)
     
-    # Generate cache key
-    cache_key = f"{task}:{url}" if url else task
-    
     # Try to get from cache
-    if use_cache:
-        cached_result = cache.get(cache_key)
+    if use_cache and task not in UNCACHED_TASKS:
+        cached_result = cache.get(cache_key(task, url))
         if cached_result:
             return jsonify({
                 'success': True,
@@ -40,26 +63,43 @@ def crawl():
                 'result': cached_result
             })
     
-    # Initialize crawler
-    crawler = ExerciseCrawler(
-        headless=True,
-        js_render=True,
-        bypass_cache=not use_cache
-    )
-    
-    # Run crawler
-    result = crawler.run_crawler(task, url)
-    
-    # Cache result if successful
-    if result.get('success', False) and use_cache:
-        cache.set(cache_key, result)
-    
+    job, created = jobs.submit(task, url, use_cache)
+    response = job.status()
+    response.update({
+        'success': True,
+        'deduplicated': not created,
+        'status_url': f"/api/jobs/{job.id}",
+        'result_url': f"/api/jobs/{job.id}/result"
+    })
+    return jsonify(response), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Crawl job state and progress"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify(job.status())
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Result of a finished crawl job, in the same shape as /api/crawl"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    if not job.finished:
+        return jsonify(job.status()), 202
     return jsonify({
         'success': True,
         'from_cache': False,
-        'result': result
+        'result': job.result if job.result is not None else {'success': False, 'error': job.error}
     })
 
+@app.route('/api/jobs', methods=['GET'])
+def job_stats():
+    """Number of crawl jobs per state"""
+    return jsonify(jobs.stats())
+
 @app.route('/api/clear-cache', methods=['POST'])
 def clear_cache():
     """Clear cache"""
@@ -72,6 +112,11 @@ def clear_cache():
         'success': success
     })
 
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Cache hit/miss/eviction statistics"""
+    return jsonify(cache.stats())
+
 @app.route('/results')
 def results():
     """Render results page"""
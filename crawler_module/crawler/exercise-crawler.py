@@ -1,11 +1,19 @@
 import json
 import asyncio
-from typing import Dict, List, Optional, Union
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Dict, List, Optional, Tuple, Union
 from crawl4ai import AsyncWebCrawler, arun
 from bs4 import BeautifulSoup
 import logging
 
-from .parser import ExerciseParser
+from .frontier import CrawlFrontier, normalize_url
+from .page_archive import PageArchive, reparse_entries
+from .page_store import PageStore, content_hash
+from .parser import ExerciseParser, parse_page
 
 logger = logging.getLogger(__name__)
 
@@ -13,32 +21,110 @@ class ExerciseCrawler:
     """Crawler for exercise data from Virtuagym"""
     
     BASE_URL = "https://exercises.virtuagym.com"
+    FRONTIER_PATH = os.path.join('cache', 'frontier.sqlite3')
+    PAGE_STORE_PATH = os.path.join('cache', 'pages.sqlite3')
+    ARCHIVE_PATH = os.path.join('cache', 'archive')
+
+    # Frontier priorities: finish exercise pages before opening more categories,
+    # so the set of discovered-but-unvisited URLs stays small
+    PRIORITIES = {'exercise': 0, 'category': 1, 'main': 2}
     
-    def __init__(self, headless: bool = True, js_render: bool = True, bypass_cache: bool = False):
+    def __init__(self, headless: bool = True, js_render: bool = True, bypass_cache: bool = False,
+                 page_store_path: Optional[str] = None, parser_backend: str = 'auto',
+                 archive_path: Optional[str] = None):
         """
         Initialize the crawler
         
         Args:
             headless: Run browser in headless mode
             js_render: Enable JavaScript rendering
-            bypass_cache: Bypass cache when crawling
+            bypass_cache: Bypass cache when crawling; pages are refetched
+                unconditionally and always reparsed
+            page_store_path: Validators and parsed pages of previous runs
+                (default: cache/pages.sqlite3)
+            parser_backend: 'selectolax', 'lxml', 'html.parser' or 'auto'
+                for the fastest installed
+            archive_path: Directory of the raw page archive (default: cache/archive)
         """
         self.crawler = AsyncWebCrawler(
             headless=headless,
             js_render=js_render
         )
         self.bypass_cache = bypass_cache
-        self.parser = ExerciseParser()
+        self.parser = ExerciseParser(parser_backend)
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
+        self.pages = PageStore(page_store_path or self.PAGE_STORE_PATH)
+        self.archive = PageArchive(archive_path or self.ARCHIVE_PATH)
+        self.page_stats = {'new': 0, 'changed': 0, 'unchanged': 0}
+
+    def reset_page_stats(self) -> None:
+        """Zero the new/changed/unchanged counts in place, so readers holding the dict see the reset"""
+        for key in self.page_stats:
+            self.page_stats[key] = 0
+
+    async def _parse(self, kind: str, html: str) -> Any:
+        """
+        Parse a page off the event loop so fetching continues meanwhile
+
+        Runs in the process pool during crawl_all_categories, otherwise in
+        the loop's default thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._parse_pool, parse_page, kind, html, self.parser.backend.name)
+
+    async def _fetch_parsed(self, url: str, kind: str) -> Tuple[Any, str]:
+        """
+        Fetch a page conditionally and parse it only if its body changed
+
+        If-None-Match/If-Modified-Since are sent from the validators of the
+        previous fetch. On a 304, or a body whose hash matches the stored
+        one, the stored parse result is returned and the parser is skipped.
+        Bodies not archived yet are appended to the page archive.
+
+        Args:
+            url: Absolute URL
+            kind: Page type ('main', 'category' or 'exercise')
+
+        Returns:
+            Tuple of (parsed data, 'new' | 'changed' | 'unchanged')
+        """
+        stored = self.pages.get(url)
+        conditional = stored is not None and not self.bypass_cache
+        result = await self.crawler.run(
+            url=url,
+            bypass_cache=self.bypass_cache,
+            headers=self.pages.conditional_headers(stored) if conditional else {}
+        )
+        headers = {k.lower(): v for k, v in (result.get('response_headers') or {}).items()}
+        etag = headers.get('etag')
+        last_modified = headers.get('last-modified')
+
+        if conditional and result.get('status_code') == 304:
+            self.pages.touch(url, etag, last_modified)
+            status, data = 'unchanged', stored.data
+        else:
+            html = result.get('html', '')
+            digest = content_hash(html)
+            if stored is None or stored.content_hash != digest or url not in self.archive:
+                self.archive.append(url, kind, html, result.get('status_code'), result.get('response_headers'))
+            if conditional and stored.content_hash == digest:
+                self.pages.touch(url, etag, last_modified)
+                status, data = 'unchanged', stored.data
+            else:
+                data = await self._parse(kind, html)
+                self.pages.put(url, digest, data, etag, last_modified)
+                if stored is None:
+                    status = 'new'
+                else:
+                    status = 'unchanged' if stored.content_hash == digest else 'changed'
+
+        self.page_stats[status] += 1
+        return data, status
         
     async def crawl_main_page(self) -> Dict:
         """Crawl the main page to get exercise categories"""
         try:
-            result = await self.crawler.run(
-                url=self.BASE_URL,
-                bypass_cache=self.bypass_cache
-            )
-            
-            categories = self.parser.extract_categories(result.get('html', ''))
+            categories, _ = await self._fetch_parsed(self.BASE_URL, 'main')
             return {
                 'success': True,
                 'categories': categories,
@@ -64,12 +150,7 @@ class ExerciseCrawler:
         full_url = f"{self.BASE_URL}{category_url}" if not category_url.startswith("http") else category_url
         
         try:
-            result = await self.crawler.run(
-                url=full_url,
-                bypass_cache=self.bypass_cache
-            )
-            
-            exercises = self.parser.extract_exercises(result.get('html', ''))
+            exercises, _ = await self._fetch_parsed(full_url, 'category')
             return {
                 'success': True,
                 'category_url': category_url,
@@ -97,16 +178,12 @@ class ExerciseCrawler:
         full_url = f"{self.BASE_URL}{exercise_url}" if not exercise_url.startswith("http") else exercise_url
         
         try:
-            result = await self.crawler.run(
-                url=full_url,
-                bypass_cache=self.bypass_cache
-            )
-            
-            exercise_details = self.parser.extract_exercise_details(result.get('html', ''))
+            exercise_details, status = await self._fetch_parsed(full_url, 'exercise')
             return {
                 'success': True,
                 'exercise_url': exercise_url,
-                'details': exercise_details
+                'details': exercise_details,
+                'status': status
             }
         except Exception as e:
             logger.error(f"Error crawling exercise {exercise_url}: {str(e)}")
@@ -116,50 +193,203 @@ class ExerciseCrawler:
                 'error': str(e)
             }
     
-    async def crawl_all_categories(self) -> Dict:
-        """Crawl all exercise categories"""
-        main_page_result = await self.crawl_main_page()
-        
-        if not main_page_result['success']:
-            return main_page_result
-        
-        categories = main_page_result['categories']
-        category_results = []
-        
-        # Process categories in parallel (with a limit to avoid overwhelming the server)
-        tasks = []
-        for category in categories[:5]:  # Limit to 5 categories for demo purposes
-            tasks.append(self.crawl_category(category['url']))
-        
-        category_results = await asyncio.gather(*tasks)
-        
+    @staticmethod
+    def _page_result(url: str, kind: str, data: Any, status: str) -> Dict:
+        """Checkpointed frontier result of a parsed page"""
+        if kind == 'main':
+            return {'categories': data}
+        if kind == 'category':
+            return {'exercises': data, 'count': len(data)}
+        return {'exercise_url': url, 'details': data, 'status': status}
+
+    async def _crawl_page(self, frontier: CrawlFrontier, url: str, kind: str) -> None:
+        """Fetch and parse one frontier URL, queue the links it contains and checkpoint the result"""
+        data, status = await self._fetch_parsed(url, kind)
+        if kind == 'main':
+            frontier.add((normalize_url(c['url'], url) for c in data), 'category',
+                         self.PRIORITIES['category'], parent=url)
+        elif kind == 'category':
+            frontier.add((normalize_url(e['url'], url) for e in data), 'exercise',
+                         self.PRIORITIES['exercise'], parent=url)
+        frontier.complete(url, kind, self._page_result(url, kind, data, status))
+
+    async def crawl_all_categories(self, frontier_path: Optional[str] = None, concurrency: int = 5,
+                                   resume: bool = True, parse_workers: Optional[int] = None) -> Dict:
+        """
+        Crawl the main page, every category and every exercise detail page
+
+        URLs are kept in a SQLite frontier and parsed results are
+        checkpointed there as each page completes, so an interrupted crawl
+        resumes where it stopped and memory use does not grow with the
+        crawl. Read the results back with CrawlFrontier.iter_results().
+
+        Args:
+            frontier_path: Frontier database (default: cache/frontier.sqlite3)
+            concurrency: Pages fetched at the same time
+            resume: Continue the previous crawl if it was interrupted; a
+                finished crawl is always started over
+            parse_workers: Processes parsing pages while others are fetched
+                (default: one per CPU; 0 parses in a thread)
+
+        Returns:
+            Dictionary with URL counts per state, the failed URLs and how
+            many pages were new, changed or unchanged since the last run
+        """
+        frontier = CrawlFrontier(frontier_path or self.FRONTIER_PATH)
+        self.reset_page_stats()
+        if parse_workers is None:
+            parse_workers = os.cpu_count() or 1
+        if parse_workers > 0:
+            self._parse_pool = ProcessPoolExecutor(max_workers=parse_workers)
+        try:
+            if resume and frontier.pending():
+                frontier.resume()
+            else:
+                # A finished crawl leaves every URL done, and add() never requeues
+                # known URLs: start a new pass. The page store keeps the validators,
+                # so unchanged pages are still fetched conditionally and not reparsed
+                frontier.reset()
+            frontier.add([normalize_url(self.BASE_URL)], 'main', self.PRIORITIES['main'])
+
+            wakeup = asyncio.Event()
+            active = 0
+
+            async def worker():
+                nonlocal active
+                while True:
+                    claimed = frontier.claim()
+                    if claimed is None:
+                        if active == 0:
+                            # Nothing queued and nothing running that could queue more
+                            wakeup.set()
+                            return
+                        wakeup.clear()
+                        await wakeup.wait()
+                        continue
+
+                    url, kind = claimed
+                    active += 1
+                    try:
+                        await self._crawl_page(frontier, url, kind)
+                    except Exception as e:
+                        logger.error(f"Error crawling {kind} {url}: {str(e)}")
+                        frontier.fail(url, str(e))
+                    finally:
+                        active -= 1
+                        wakeup.set()
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+            categories = next((data['categories'] for _, data in frontier.iter_results('main')), [])
+            logger.info("Crawl finished: {new} new, {changed} changed, {unchanged} unchanged pages".format(**self.page_stats))
+            return {
+                'success': True,
+                'categories': categories,
+                'counts': frontier.counts(),
+                'pages': dict(self.page_stats),
+                'failed': frontier.failures(),
+                'frontier': frontier.path
+            }
+        finally:
+            if self._parse_pool is not None:
+                self._parse_pool.shutdown()
+                self._parse_pool = None
+            frontier.close()
+    
+    def reparse_archive(self, frontier_path: Optional[str] = None, workers: Optional[int] = None,
+                        batch_size: int = 200) -> Dict:
+        """
+        Rerun the parser over every archived page, without touching the network
+
+        Pages are parsed in parallel worker processes that read the archive
+        segments themselves. The results replace the frontier checkpoints
+        and the page store entries, so the next incremental crawl does not
+        serve parse results from before a parser change.
+
+        Args:
+            frontier_path: Frontier database (default: cache/frontier.sqlite3)
+            workers: Parser processes (default: one per CPU; 0 parses inline)
+            batch_size: Pages handed to a worker at a time
+
+        Returns:
+            Dictionary with the number of pages reparsed per kind and the elapsed time
+        """
+        started = time.perf_counter()
+        entries = self.archive.entries()
+        batches = [entries[i:i + batch_size] for i in range(0, len(entries), batch_size)]
+        backend = self.parser.backend.name
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        frontier = CrawlFrontier(frontier_path or self.FRONTIER_PATH)
+        counts = Counter()
+        try:
+            if workers > 0:
+                pool = ProcessPoolExecutor(max_workers=workers)
+                results = pool.map(reparse_entries, repeat(self.archive.directory), batches, repeat(backend))
+            else:
+                pool = None
+                results = (reparse_entries(self.archive.directory, batch, backend) for batch in batches)
+
+            try:
+                for batch in results:
+                    for url, kind, data, digest, etag, last_modified in batch:
+                        self.pages.put(url, digest, data, etag, last_modified)
+                        frontier.complete(url, kind, self._page_result(url, kind, data, 'reparsed'))
+                        counts[kind] += 1
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+        finally:
+            frontier.close()
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"Reparsed {len(entries)} archived pages in {elapsed:.1f}s")
         return {
             'success': True,
-            'categories': categories,
-            'category_results': category_results
+            'reparsed': dict(counts),
+            'seconds': round(elapsed, 2)
         }
-    
-    def run_crawler(self, task: str = 'main', url: Optional[str] = None) -> Dict:
+
+    async def run_task(self, task: str = 'main', url: Optional[str] = None) -> Dict:
         """
-        Run the crawler for different tasks
-        
+        Run a crawl task on the current event loop
+
         Args:
-            task: Type of crawl ('main', 'category', 'exercise', 'all')
+            task: Type of crawl ('main', 'category', 'exercise', 'all', or
+                'reparse' to re-extract the archived pages without fetching)
             url: URL for category or exercise if needed
-            
+
         Returns:
             Crawling results
         """
         if task == 'main':
-            return arun(self.crawl_main_page(), magic=False)
+            return await self.crawl_main_page()
         elif task == 'category' and url:
-            return arun(self.crawl_category(url), magic=False)
+            return await self.crawl_category(url)
         elif task == 'exercise' and url:
-            return arun(self.crawl_exercise(url), magic=False)
+            return await self.crawl_exercise(url)
         elif task == 'all':
-            return arun(self.crawl_all_categories(), magic=False)
+            return await self.crawl_all_categories()
+        elif task == 'reparse':
+            # Runs on this thread: the page store and archive connections belong to it.
+            # It blocks the loop until done, which CrawlJobQueue workers (one loop each) allow
+            return self.reparse_archive()
         else:
             return {
                 'success': False,
                 'error': 'Invalid task or missing URL parameter'
             }
+
+    def run_crawler(self, task: str = 'main', url: Optional[str] = None) -> Dict:
+        """
+        Run the crawler for different tasks
+        
+        Args:
+            task: Type of crawl ('main', 'category', 'exercise', 'all', 'reparse')
+            url: URL for category or exercise if needed
+            
+        Returns:
+            Crawling results
+        """
+        return arun(self.run_task(task, url), magic=False)
@@ -0,0 +1,237 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+import logging
+
+logger = logging.getLogger(__name__)
+
+# URL states
+DISCOVERED = 'discovered'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+FAILED = 'failed'
+
+# Query parameters that never change the page content
+IGNORED_PARAMS = ('utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'fbclid', 'gclid')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    state TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    parent TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS urls_state_priority ON urls (state, priority);
+CREATE TABLE IF NOT EXISTS results (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> str:
+    """
+    Canonical form of a URL, used as the dedupe key
+
+    Resolves it against base, lowercases scheme and host, drops default
+    ports, fragments, tracking parameters and trailing slashes, and sorts
+    the query string.
+
+    Args:
+        url: Absolute or relative URL
+        base: URL the link was found on
+
+    Returns:
+        Normalized absolute URL
+    """
+    if base:
+        url = urljoin(base, url)
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or '/'
+    while '//' in path:
+        path = path.replace('//', '/')
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in IGNORED_PARAMS)
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+class CrawlFrontier:
+    """SQLite-backed crawl frontier and result checkpoint"""
+
+    def __init__(self, path: str = os.path.join('cache', 'frontier.sqlite3'), max_attempts: int = 3):
+        """
+        Open (or create) the frontier database
+
+        Args:
+            path: SQLite database file
+            max_attempts: Attempts before a URL is marked failed
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def reset(self) -> None:
+        """Forget every URL and result, starting the next crawl from scratch"""
+        with self.db:
+            self.db.execute('DELETE FROM urls')
+            self.db.execute('DELETE FROM results')
+
+    def resume(self) -> int:
+        """
+        Return URLs left in flight by an interrupted run to the queue
+
+        Returns:
+            Number of URLs requeued
+        """
+        with self.db:
+            cursor = self.db.execute(
+                'UPDATE urls SET state = ?, updated_at = ? WHERE state = ?',
+                (DISCOVERED, time.time(), IN_FLIGHT)
+            )
+        if cursor.rowcount:
+            logger.info(f"Resuming crawl, requeued {cursor.rowcount} in-flight URLs")
+        return cursor.rowcount
+
+    def pending(self) -> int:
+        """Number of URLs discovered or in flight, i.e. left to crawl"""
+        return self.db.execute(
+            'SELECT COUNT(*) FROM urls WHERE state IN (?, ?)', (DISCOVERED, IN_FLIGHT)
+        ).fetchone()[0]
+
+    def add(self, urls: Iterable[str], kind: str, priority: int = 0,
+            parent: Optional[str] = None) -> int:
+        """
+        Record discovered URLs, ignoring ones already known in any state
+
+        Args:
+            urls: Normalized URLs
+            kind: Page type ('main', 'category' or 'exercise')
+            priority: Lower values are claimed first
+            parent: URL the links were found on
+
+        Returns:
+            Number of new URLs
+        """
+        now = time.time()
+        with self.db:
+            cursor = self.db.executemany(
+                'INSERT OR IGNORE INTO urls (url, kind, state, priority, parent, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                ((url, kind, DISCOVERED, priority, parent, now) for url in urls)
+            )
+        return cursor.rowcount
+
+    def claim(self) -> Optional[Tuple[str, str]]:
+        """
+        Move the highest-priority discovered URL to in flight
+
+        Returns:
+            Tuple of (url, kind), or None if nothing is waiting
+        """
+        with self.db:
+            row = self.db.execute(
+                'SELECT url, kind FROM urls WHERE state = ? ORDER BY priority, rowid LIMIT 1',
+                (DISCOVERED,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute(
+                'UPDATE urls SET state = ?, attempts = attempts + 1, updated_at = ? WHERE url = ?',
+                (IN_FLIGHT, time.time(), row[0])
+            )
+        return row
+
+    def complete(self, url: str, kind: str, result: Optional[Dict] = None) -> None:
+        """
+        Mark a URL done, checkpointing its parsed result in the same transaction
+
+        Args:
+            url: Claimed URL
+            kind: Page type
+            result: Parsed data to keep (None to keep nothing)
+        """
+        now = time.time()
+        with self.db:
+            if result is not None:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO results (url, kind, data, updated_at) VALUES (?, ?, ?, ?)',
+                    (url, kind, json.dumps(result, ensure_ascii=False), now)
+                )
+            self.db.execute(
+                'UPDATE urls SET state = ?, error = NULL, updated_at = ? WHERE url = ?',
+                (DONE, now, url)
+            )
+
+    def fail(self, url: str, error: str) -> bool:
+        """
+        Record a failed attempt; the URL is requeued until max_attempts is reached
+
+        Returns:
+            True if the URL will be retried
+        """
+        with self.db:
+            attempts = self.db.execute('SELECT attempts FROM urls WHERE url = ?', (url,)).fetchone()[0]
+            retry = attempts < self.max_attempts
+            self.db.execute(
+                'UPDATE urls SET state = ?, error = ?, updated_at = ? WHERE url = ?',
+                (DISCOVERED if retry else FAILED, error, time.time(), url)
+            )
+        return retry
+
+    def counts(self) -> Dict[str, int]:
+        """Number of URLs per state"""
+        counts = dict.fromkeys((DISCOVERED, IN_FLIGHT, DONE, FAILED), 0)
+        counts.update(self.db.execute('SELECT state, COUNT(*) FROM urls GROUP BY state'))
+        return counts
+
+    def failures(self) -> List[Dict]:
+        """URLs that exhausted their attempts, with the last error"""
+        rows = self.db.execute('SELECT url, kind, error FROM urls WHERE state = ?', (FAILED,))
+        return [{'url': url, 'kind': kind, 'error': error} for url, kind, error in rows]
+
+    def iter_results(self, kind: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        Stream checkpointed results without loading them all into memory
+
+        Args:
+            kind: Only results of this page type
+
+        Yields:
+            Tuple of (url, parsed data)
+        """
+        query = 'SELECT url, data FROM results'
+        params: Tuple = ()
+        if kind:
+            query += ' WHERE kind = ?'
+            params = (kind,)
+        for url, data in self.db.execute(query + ' ORDER BY rowid', params):
+            yield url, json.loads(data)
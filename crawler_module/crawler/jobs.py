@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
+from queue import Queue
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Tasks that rewrite the whole frontier; they never run at the same time
+EXCLUSIVE_TASKS = frozenset(('all', 'reparse'))
+
+class CrawlJob:
+    """A submitted crawl and, once finished, its result"""
+
+    def __init__(self, task: str, url: Optional[str], use_cache: bool):
+        self.id = uuid.uuid4().hex
+        self.task = task
+        self.url = url
+        self.use_cache = use_cache
+        self.state = QUEUED
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Live page counts of the crawler running the job (new/changed/unchanged)
+        self.progress: Dict[str, int] = {}
+
+    @property
+    def key(self) -> Tuple[str, Optional[str], bool]:
+        """Identical jobs share a key; only one of them runs at a time"""
+        return (self.task, self.url, self.use_cache)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (DONE, FAILED)
+
+    def status(self) -> Dict[str, Any]:
+        """JSON-serializable state of the job, without the result"""
+        return {
+            'job_id': self.id,
+            'task': self.task,
+            'url': self.url,
+            'state': self.state,
+            'progress': dict(self.progress),
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+class CrawlJobQueue:
+    """
+    Runs crawl jobs on long-lived worker threads
+
+    Each worker owns an event loop and a crawler created in its thread
+    with its first job (and again after a failed attempt), so the crawler's browser and its SQLite stores are reused
+    across jobs instead of being set up per request. Jobs live in memory:
+    serve the crawler app from a single process (threads are fine) so
+    status requests reach the process that holds the job.
+    """
+
+    def __init__(self, crawler_factory: Callable[[], Any], workers: int = 2, max_finished: int = 1000,
+                 on_done: Optional[Callable[[CrawlJob], None]] = None):
+        """
+        Initialize the queue; workers start with the first submitted job
+
+        Args:
+            crawler_factory: Creates the crawler of a worker (an ExerciseCrawler)
+            workers: Crawls running at the same time
+            max_finished: Finished jobs kept for status and result requests
+            on_done: Called in the worker thread after each job finishes
+        """
+        self.crawler_factory = crawler_factory
+        self.workers = workers
+        self.max_finished = max_finished
+        self.on_done = on_done
+
+        self._queue: Queue = Queue()
+        self._lock = threading.Lock()
+        self._jobs: 'OrderedDict[str, CrawlJob]' = OrderedDict()
+        self._active: Dict[Tuple, CrawlJob] = {}
+        self._threads: List[threading.Thread] = []
+        self._exclusive = threading.Lock()
+
+    def _start(self) -> None:
+        # Started lazily so importing the app (or the debug reloader's parent) spawns no threads
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'crawl-worker-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, task: str, url: Optional[str] = None, use_cache: bool = True) -> Tuple[CrawlJob, bool]:
+        """
+        Queue a crawl, or join an identical one that is queued or running
+
+        Args:
+            task: Crawl task ('main', 'category', 'exercise', 'all', 'reparse')
+            url: URL for category or exercise tasks
+            use_cache: False to bypass the crawler's cache
+
+        Returns:
+            Tuple of (job, whether a new job was created)
+        """
+        job = CrawlJob(task, url, use_cache)
+        with self._lock:
+            existing = self._active.get(job.key)
+            if existing is not None:
+                return existing, False
+            if not self._threads:
+                self._start()
+            self._active[job.key] = job
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[CrawlJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Number of known jobs per state"""
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.state] += 1
+        return counts
+
+    def _worker(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        crawler = None
+
+        while True:
+            job = self._queue.get()
+            if crawler is None:
+                # Created with the first job, and again with the next one if it fails to open
+                try:
+                    crawler = self.crawler_factory()
+                except Exception as e:
+                    logger.error(f"Could not create crawler for job {job.id} ({job.task}): {str(e)}")
+                    job.state = FAILED
+                    job.error = f"Could not create crawler: {str(e)}"
+                    self._finish(job)
+                    continue
+
+            with self._exclusive if job.task in EXCLUSIVE_TASKS else nullcontext():
+                job.state = RUNNING
+                job.started_at = time.time()
+                crawler.bypass_cache = not job.use_cache
+                crawler.reset_page_stats()
+                job.progress = crawler.page_stats
+                try:
+                    job.result = loop.run_until_complete(crawler.run_task(job.task, job.url))
+                    job.state = DONE if job.result.get('success', False) else FAILED
+                    job.error = job.result.get('error')
+                except Exception as e:
+                    logger.error(f"Crawl job {job.id} ({job.task}) failed: {str(e)}")
+                    job.state = FAILED
+                    job.error = str(e)
+            job.progress = dict(job.progress)
+            self._finish(job)
+
+    def _finish(self, job: CrawlJob) -> None:
+        """Release a finished job's key so identical jobs can be submitted again"""
+        job.finished_at = time.time()
+        with self._lock:
+            self._active.pop(job.key, None)
+            self._prune()
+        if self.on_done is not None:
+            try:
+                self.on_done(job)
+            except Exception as e:
+                logger.error(f"Error in crawl job callback: {str(e)}")
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
@@ -0,0 +1,337 @@
+import gzip
+import json
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+import logging
+
+from .page_store import content_hash
+from .parser import parse_page
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = 'segment-{:05d}.gz'
+
+# Compressed bytes fed to the decompressor at a time when scanning a segment
+SCAN_CHUNK_BYTES = 64 * 1024
+
+# One append lock per archive directory, shared by every PageArchive of the process
+_append_locks: Dict[str, threading.Lock] = {}
+_append_locks_guard = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_location ON pages (segment, offset);
+"""
+
+class ArchivedPage(NamedTuple):
+    """A fetched response as recorded in the archive"""
+    url: str
+    kind: str
+    fetched_at: float
+    status: Optional[int]
+    headers: Dict[str, str]
+    html: str
+
+class IndexEntry(NamedTuple):
+    """Where the latest record of a URL lives"""
+    url: str
+    kind: str
+    segment: int
+    offset: int
+    length: int
+
+def encode_record(url: str, kind: str, html: str, status: Optional[int] = None,
+                  headers: Optional[Dict[str, str]] = None, fetched_at: Optional[float] = None) -> bytes:
+    """
+    Encode a response as one gzip member
+
+    The member holds a JSON header line followed by the body. Segments are
+    plain concatenations of members, so zcat reads a whole segment and any
+    record can be decompressed on its own from its offset and length.
+    """
+    header = {
+        'url': url,
+        'kind': kind,
+        'fetched_at': fetched_at if fetched_at is not None else time.time(),
+        'status': status,
+        'headers': headers or {},
+    }
+    payload = json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n' + html.encode('utf-8')
+    return gzip.compress(payload, mtime=0)
+
+def decode_record(data: bytes) -> ArchivedPage:
+    """Decode one gzip member written by encode_record"""
+    header, _, body = gzip.decompress(data).partition(b'\n')
+    meta = json.loads(header)
+    return ArchivedPage(meta['url'], meta['kind'], meta['fetched_at'], meta['status'],
+                        meta['headers'], body.decode('utf-8'))
+
+def member_length(data: memoryview, offset: int) -> Optional[int]:
+    """
+    Compressed length of the gzip member starting at offset
+
+    The member is fed to the decompressor in SCAN_CHUNK_BYTES slices, so
+    finding each record's end costs the record, not the rest of the segment.
+
+    Returns:
+        Length in bytes, or None if the member is truncated
+
+    Raises:
+        zlib.error: If the data at offset is not a valid gzip member
+    """
+    decompressor = zlib.decompressobj(wbits=31)
+    position = offset
+    while not decompressor.eof and position < len(data):
+        end = min(position + SCAN_CHUNK_BYTES, len(data))
+        decompressor.decompress(data[position:end])
+        position = end
+    if not decompressor.eof:
+        return None
+    return position - len(decompressor.unused_data) - offset
+
+class SegmentReader:
+    """Random reads of archive records through memory-mapped segments"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._maps: Dict[int, Tuple[object, mmap.mmap]] = {}
+
+    def read(self, segment: int, offset: int, length: int) -> ArchivedPage:
+        """
+        Decode the record at a segment offset
+
+        Args:
+            segment: Segment number
+            offset: Byte offset of the record's gzip member
+            length: Compressed length
+
+        Returns:
+            The archived page
+        """
+        return decode_record(self.mapping(segment, offset + length)[offset:offset + length])
+
+    def mapping(self, segment: int, size: int) -> mmap.mmap:
+        """
+        The memory map of a segment, covering at least size bytes
+
+        Args:
+            segment: Segment number
+            size: Bytes the map has to cover (must be > 0)
+        """
+        mapped = self._maps.get(segment)
+        if mapped is None or size > len(mapped[1]):
+            # First read of the segment, or it grew since it was mapped
+            self._unmap(segment)
+            f = open(os.path.join(self.directory, SEGMENT_PATTERN.format(segment)), 'rb')
+            mapped = self._maps[segment] = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return mapped[1]
+
+    def _unmap(self, segment: int) -> None:
+        mapped = self._maps.pop(segment, None)
+        if mapped is not None:
+            mapped[1].close()
+            mapped[0].close()
+
+    def close(self) -> None:
+        for segment in list(self._maps):
+            self._unmap(segment)
+
+class PageArchive:
+    """Append-only archive of fetched pages in compressed segment files"""
+
+    def __init__(self, directory: str = os.path.join('cache', 'archive'),
+                 segment_max_bytes: int = 64 * 1024 * 1024):
+        """
+        Open (or create) the archive
+
+        Args:
+            directory: Directory of the segment files and index.sqlite3
+            segment_max_bytes: Size at which a new segment is started
+        """
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite3'))
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+        self.reader = SegmentReader(directory)
+        self._segment = 0
+        self._writer = None
+        with _append_locks_guard:
+            self._append_lock = _append_locks.setdefault(os.path.abspath(directory), threading.Lock())
+
+    def segments(self) -> List[int]:
+        """Numbers of the segment files on disk, in order"""
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith('segment-') and name.endswith('.gz'):
+                numbers.append(int(name[len('segment-'):-len('.gz')]))
+        return sorted(numbers)
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, SEGMENT_PATTERN.format(segment))
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self.reader.close()
+        self.db.close()
+
+    def append(self, url: str, kind: str, html: str, status: Optional[int] = None,
+               headers: Optional[Dict[str, str]] = None) -> IndexEntry:
+        """
+        Record a fetched response and point the index at it
+
+        Earlier records of the URL stay in their segments; the index always
+        points at the latest one.
+
+        Args:
+            url: Fetched URL
+            kind: Page type ('main', 'category' or 'exercise')
+            html: Response body
+            status: HTTP status
+            headers: Response headers
+
+        Returns:
+            Index entry of the new record
+        """
+        record = encode_record(url, kind, html, status, headers)
+        with self._append_lock:
+            # Other crawlers in the process may have appended or started a segment
+            latest = max(self.segments(), default=0)
+            if self._writer is None or latest != self._segment:
+                self._open_segment(latest)
+            size = os.fstat(self._writer.fileno()).st_size
+            if size and size + len(record) > self.segment_max_bytes:
+                self._open_segment(self._segment + 1)
+                size = 0
+
+            self._writer.write(record)
+            # Readers map the file, so the record must reach it before it is indexed
+            self._writer.flush()
+
+        entry = IndexEntry(url, kind, self._segment, size, len(record))
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO pages (url, kind, segment, offset, length, fetched_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                entry + (time.time(),)
+            )
+        return entry
+
+    def _open_segment(self, segment: int) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._segment = segment
+        self._writer = open(self.segment_path(segment), 'ab')
+
+    def __contains__(self, url: str) -> bool:
+        return self.db.execute('SELECT 1 FROM pages WHERE url = ?', (url,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.db.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def get(self, url: str) -> Optional[ArchivedPage]:
+        """Latest archived response of a URL, or None"""
+        row = self.db.execute(
+            'SELECT segment, offset, length FROM pages WHERE url = ?', (url,)
+        ).fetchone()
+        return self.reader.read(*row) if row else None
+
+    def entries(self, kind: Optional[str] = None) -> List[IndexEntry]:
+        """
+        Index entries in segment order, so reading them back is sequential
+
+        Args:
+            kind: Only pages of this type
+        """
+        query = 'SELECT url, kind, segment, offset, length FROM pages'
+        params: Tuple = ()
+        if kind:
+            query += ' WHERE kind = ?'
+            params = (kind,)
+        return [IndexEntry(*row) for row in self.db.execute(query + ' ORDER BY segment, offset', params)]
+
+    def iter_pages(self, kind: Optional[str] = None) -> Iterator[ArchivedPage]:
+        """Latest archived response of every URL"""
+        for entry in self.entries(kind):
+            yield self.reader.read(entry.segment, entry.offset, entry.length)
+
+    def rebuild_index(self) -> int:
+        """
+        Recreate the index by scanning every segment
+
+        Recovers records written after the index was lost or damaged; later
+        records of a URL win, as they do when appending.
+
+        Returns:
+            Number of URLs indexed
+        """
+        with self.db:
+            self.db.execute('DELETE FROM pages')
+            for segment in self.segments():
+                size = os.path.getsize(self.segment_path(segment))
+                if not size:
+                    continue
+                # Slices of the view are zero-copy; only each record is copied, to decode it
+                data = memoryview(self.reader.mapping(segment, size))[:size]
+                try:
+                    offset = 0
+                    while offset < size:
+                        # Decompress one member to learn where the next one starts
+                        try:
+                            length = member_length(data, offset)
+                        except zlib.error:
+                            length = None
+                        if length is None:
+                            logger.warning(f"Truncated record in segment {segment} at offset {offset}")
+                            break
+                        page = decode_record(bytes(data[offset:offset + length]))
+                        self.db.execute(
+                            'INSERT OR REPLACE INTO pages (url, kind, segment, offset, length, fetched_at) '
+                            'VALUES (?, ?, ?, ?, ?, ?)',
+                            (page.url, page.kind, segment, offset, length, page.fetched_at)
+                        )
+                        offset += length
+                finally:
+                    # The map cannot be closed or replaced while a view exports it
+                    data.release()
+        return len(self)
+
+def reparse_entries(directory: str, entries: List[IndexEntry], backend: str = 'auto') -> List[Tuple]:
+    """
+    Parse a batch of archived pages (runs in a worker process)
+
+    Each worker maps the segments itself, so only index entries and parse
+    results cross the process boundary, never page bodies.
+
+    Returns:
+        List of (url, kind, parsed data, content hash, etag, last modified)
+    """
+    reader = SegmentReader(directory)
+    results = []
+    try:
+        for entry in entries:
+            page = reader.read(entry.segment, entry.offset, entry.length)
+            headers = {k.lower(): v for k, v in page.headers.items()}
+            results.append((page.url, page.kind, parse_page(page.kind, page.html, backend),
+                            content_hash(page.html), headers.get('etag'), headers.get('last-modified')))
+    finally:
+        reader.close()
+    return results
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, NamedTuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    changed_at REAL NOT NULL
+);
+"""
+
+
+class StoredPage(NamedTuple):
+    """Validators and parsed data of the last successful fetch of a URL"""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: str
+    data: Dict
+
+
+def content_hash(html: str) -> str:
+    """SHA-256 of a page body"""
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+class PageStore:
+    """Per-URL HTTP validators, body hashes and parsed results for incremental recrawls"""
+
+    def __init__(self, path: str = os.path.join('cache', 'pages.sqlite3')):
+        """
+        Open (or create) the page store
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def get(self, url: str) -> Optional[StoredPage]:
+        row = self.db.execute(
+            'SELECT etag, last_modified, content_hash, data FROM pages WHERE url = ?', (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, digest, data = row
+        return StoredPage(etag, last_modified, digest, json.loads(data))
+
+    def conditional_headers(self, page: Optional[StoredPage]) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers for a stored page"""
+        headers = {}
+        if page is not None:
+            if page.etag:
+                headers['If-None-Match'] = page.etag
+            if page.last_modified:
+                headers['If-Modified-Since'] = page.last_modified
+        return headers
+
+    def touch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Record an unchanged fetch, refreshing validators the server sent again"""
+        with self.db:
+            self.db.execute(
+                'UPDATE pages SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), '
+                'fetched_at = ? WHERE url = ?',
+                (etag, last_modified, time.time(), url)
+            )
+
+    def put(self, url: str, digest: str, data: Dict, etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> None:
+        """Store the validators, body hash and parsed data of a changed or new page"""
+        now = time.time()
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO pages '
+                '(url, etag, last_modified, content_hash, data, fetched_at, changed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, digest, json.dumps(data, ensure_ascii=False), now, now)
+            )
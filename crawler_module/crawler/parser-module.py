@@ -1,180 +1,395 @@
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 from bs4 import BeautifulSoup
 import logging
 import re
 
+import soupsieve
+
+try:
+    import lxml  # noqa: F401 (BeautifulSoup tree builder)
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
 logger = logging.getLogger(__name__)
 
+# Every selector the extractors use, compiled once per backend
+SELECTORS = {
+    'category_section': '.category-list',
+    'category_links': '.category-list a',
+    'exercise_items': '.exercise-item, .exercise-block',
+    'link': 'a',
+    'image': 'img',
+    'links_and_images': 'a, img',
+    'item_description': '.exercise-description',
+    'name': 'h1, .exercise-name',
+    'detail_images': '.exercise-image img, .exercise-photos img',
+    'description': '.exercise-description, .description',
+    'instructions': '.exercise-instructions, .instructions',
+    'muscles': '.muscle-worked, .muscles-worked',
+    'difficulty': '.difficulty-level',
+    'equipment': '.equipment-needed',
+}
+
+# Extractor for each frontier page type
+PAGE_EXTRACTORS = {
+    'main': 'extract_categories',
+    'category': 'extract_exercises',
+    'exercise': 'extract_exercise_details',
+}
+
+class SoupBackend:
+    """BeautifulSoup trees queried with precompiled soupsieve selectors"""
+
+    def __init__(self, features: str):
+        self.name = features
+        self.features = features
+
+    def parse(self, html: str) -> Any:
+        return BeautifulSoup(html, self.features)
+
+    def compile(self, selector: str) -> Any:
+        return soupsieve.compile(selector)
+
+    def select(self, node: Any, compiled: Any) -> List[Any]:
+        return compiled.select(node)
+
+    def select_one(self, node: Any, compiled: Any) -> Optional[Any]:
+        return compiled.select_one(node)
+
+    def text(self, node: Any) -> str:
+        return node.get_text(strip=True)
+
+    def attr(self, node: Any, name: str) -> Optional[str]:
+        return node.get(name)
+
+    def tag(self, node: Any) -> str:
+        return node.name
+
+class SelectolaxBackend:
+    """selectolax (lexbor) trees, several times faster than BeautifulSoup"""
+
+    name = 'selectolax'
+
+    def parse(self, html: str) -> Any:
+        return HTMLParser(html)
+
+    def compile(self, selector: str) -> str:
+        # lexbor caches compiled selectors itself
+        return selector
+
+    def select(self, node: Any, compiled: str) -> List[Any]:
+        return node.css(compiled)
+
+    def select_one(self, node: Any, compiled: str) -> Optional[Any]:
+        return node.css_first(compiled)
+
+    def text(self, node: Any) -> str:
+        return node.text(strip=True)
+
+    def attr(self, node: Any, name: str) -> Optional[str]:
+        return node.attributes.get(name)
+
+    def tag(self, node: Any) -> str:
+        return node.tag
+
+def available_backends() -> List[str]:
+    """Installed parser backends, fastest first"""
+    backends = []
+    if HTMLParser is not None:
+        backends.append('selectolax')
+    if lxml is not None:
+        backends.append('lxml')
+    backends.append('html.parser')
+    return backends
+
+def create_backend(name: str = 'auto') -> Union[SoupBackend, SelectolaxBackend]:
+    """
+    Create a parser backend
+
+    Args:
+        name: 'selectolax', 'lxml', 'html.parser' or 'auto' for the fastest installed
+
+    Returns:
+        Backend instance
+
+    Raises:
+        ValueError: If the backend is unknown or not installed
+    """
+    if name == 'auto':
+        name = available_backends()[0]
+    if name not in ('selectolax', 'lxml', 'html.parser'):
+        raise ValueError(f"Unknown parser backend: {name}")
+    if name not in available_backends():
+        raise ValueError(f"Parser backend not installed: {name}")
+    return SelectolaxBackend() if name == 'selectolax' else SoupBackend(name)
+
+class ParsedPage:
+    """A page parsed once, shared by every extractor"""
+
+    __slots__ = ('backend', 'root')
+
+    def __init__(self, backend: Union[SoupBackend, SelectolaxBackend], root: Any):
+        self.backend = backend
+        self.root = root
+
 class ExerciseParser:
     """Parser for exercise data from Virtuagym"""
-    
-    def extract_categories(self, html: str) -> List[Dict]:
+
+    def __init__(self, backend: str = 'auto'):
+        """
+        Initialize the parser
+
+        Args:
+            backend: 'selectolax', 'lxml', 'html.parser' or 'auto' for the fastest installed
+        """
+        self.backend = create_backend(backend)
+        self.selectors = {key: self.backend.compile(selector) for key, selector in SELECTORS.items()}
+
+    def parse(self, html: str) -> ParsedPage:
+        """Parse HTML once so several extractors can run over the same tree"""
+        return ParsedPage(self.backend, self.backend.parse(html))
+
+    def _page(self, page: Union[str, ParsedPage]) -> ParsedPage:
+        return page if isinstance(page, ParsedPage) else self.parse(page)
+
+    def _select(self, node: Any, key: str) -> List[Any]:
+        return self.backend.select(node, self.selectors[key])
+
+    def _select_one(self, node: Any, key: str) -> Optional[Any]:
+        return self.backend.select_one(node, self.selectors[key])
+
+    def _text(self, node: Any, key: str) -> Optional[str]:
+        elem = self._select_one(node, key)
+        return self.backend.text(elem) if elem is not None else None
+
+    def extract(self, kind: str, html: Union[str, ParsedPage]) -> Any:
+        """
+        Run the extractor for a page type
+
+        Args:
+            kind: Page type ('main', 'category' or 'exercise')
+            html: HTML content or an already parsed page
+
+        Returns:
+            The extractor's result
+        """
+        return getattr(self, PAGE_EXTRACTORS[kind])(html)
+
+    def extract_categories(self, html: Union[str, ParsedPage]) -> List[Dict]:
         """
         Extract exercise categories from HTML
-        
+
         Args:
-            html: HTML content of the main page
-            
+            html: HTML content of the main page, or the page parsed with parse()
+
         Returns:
             List of category dictionaries with name and URL
         """
-        soup = BeautifulSoup(html, 'html.parser')
         categories = []
-        
+
         try:
-            category_section = soup.select('.category-list')
-            if not category_section:
+            page = self._page(html)
+            backend = page.backend
+            if self._select_one(page.root, 'category_section') is None:
                 logger.warning("Category list section not found")
                 return categories
-                
-            category_links = soup.select('.category-list a')
-            
-            for link in category_links:
-                name = link.get_text(strip=True)
-                url = link.get('href')
+
+            for link in self._select(page.root, 'category_links'):
+                name = backend.text(link)
+                url = backend.attr(link, 'href')
                 if name and url:
                     categories.append({
                         'name': name,
                         'url': url
                     })
-            
+
             # If not found with the expected class, try a more general approach
             if not categories:
                 logger.info("Trying alternative category extraction method")
-                for link in soup.find_all('a'):
-                    if '/exercises/' in link.get('href', ''):
-                        name = link.get_text(strip=True)
-                        url = link.get('href')
-                        if name and url:
+                for link in self._select(page.root, 'link'):
+                    url = backend.attr(link, 'href') or ''
+                    if '/exercises/' in url:
+                        name = backend.text(link)
+                        if name:
                             categories.append({
                                 'name': name,
                                 'url': url
                             })
-            
+
         except Exception as e:
             logger.error(f"Error extracting categories: {str(e)}")
-        
+
         return categories
-    
-    def extract_exercises(self, html: str) -> List[Dict]:
+
+    def extract_exercises(self, html: Union[str, ParsedPage]) -> List[Dict]:
         """
         Extract exercises from a category page
-        
+
         Args:
-            html: HTML content of the category page
-            
+            html: HTML content of the category page, or the page parsed with parse()
+
         Returns:
             List of exercise dictionaries with name, URL, and image
         """
-        soup = BeautifulSoup(html, 'html.parser')
         exercises = []
-        
+
         try:
-            exercise_items = soup.select('.exercise-item, .exercise-block')
-            
-            for item in exercise_items:
+            page = self._page(html)
+            backend = page.backend
+            for item in self._select(page.root, 'exercise_items'):
                 exercise = {}
-                
+
                 # Try to get name and URL
-                link_elem = item.select_one('a')
-                if link_elem:
-                    exercise['name'] = link_elem.get_text(strip=True)
-                    exercise['url'] = link_elem.get('href')
-                
+                link_elem = self._select_one(item, 'link')
+                if link_elem is not None:
+                    exercise['name'] = backend.text(link_elem)
+                    exercise['url'] = backend.attr(link_elem, 'href')
+
                 # Try to get image
-                img_elem = item.select_one('img')
-                if img_elem:
-                    exercise['image'] = img_elem.get('src')
-                
+                img_elem = self._select_one(item, 'image')
+                if img_elem is not None:
+                    exercise['image'] = backend.attr(img_elem, 'src')
+
                 # Try to get description
-                desc_elem = item.select_one('.exercise-description')
-                if desc_elem:
-                    exercise['description'] = desc_elem.get_text(strip=True)
-                
+                description = self._text(item, 'item_description')
+                if description is not None:
+                    exercise['description'] = description
+
                 if exercise.get('name') and exercise.get('url'):
                     exercises.append(exercise)
-            
+
             # If not found with expected classes, try a more general approach
             if not exercises:
                 logger.info("Trying alternative exercise extraction method")
-                for link in soup.find_all('a'):
-                    if '/exercise/' in link.get('href', ''):
-                        name = link.get_text(strip=True)
-                        url = link.get('href')
-                        
-                        # Find closest image
-                        img = link.find('img') or link.find_previous('img') or link.find_next('img')
-                        image_url = img.get('src') if img else None
-                        
-                        if name and url:
-                            exercises.append({
-                                'name': name,
-                                'url': url,
-                                'image': image_url
-                            })
-                
+                exercises = self._extract_exercise_links(page)
+
         except Exception as e:
             logger.error(f"Error extracting exercises: {str(e)}")
-        
+
         return exercises
-    
-    def extract_exercise_details(self, html: str) -> Dict:
+
+    def _extract_exercise_links(self, page: ParsedPage) -> List[Dict]:
+        """
+        Exercise links anywhere on the page, each with its closest image
+
+        The image is the first one inside the link, else the last one before
+        it, else the first one after it in document order. Links and images
+        are collected in a single document-order pass instead of searching
+        the tree backwards and forwards from every link.
+        """
+        backend = page.backend
+        nodes = self._select(page.root, 'links_and_images')
+
+        # Document-order index of the next image at or after each node
+        next_image: List[Optional[int]] = [None] * (len(nodes) + 1)
+        for i in range(len(nodes) - 1, -1, -1):
+            next_image[i] = i if backend.tag(nodes[i]) == 'img' else next_image[i + 1]
+
+        exercises = []
+        previous_image = None
+        for i, node in enumerate(nodes):
+            if backend.tag(node) == 'img':
+                previous_image = node
+                continue
+            url = backend.attr(node, 'href') or ''
+            if '/exercise/' not in url:
+                continue
+            name = backend.text(node)
+            if not name:
+                continue
+
+            img = self._select_one(node, 'image')
+            if img is None:
+                img = previous_image
+            if img is None and next_image[i + 1] is not None:
+                img = nodes[next_image[i + 1]]
+
+            exercises.append({
+                'name': name,
+                'url': url,
+                'image': backend.attr(img, 'src') if img is not None else None
+            })
+        return exercises
+
+    def extract_exercise_details(self, html: Union[str, ParsedPage]) -> Dict:
         """
         Extract details from an exercise page
-        
+
         Args:
-            html: HTML content of the exercise page
-            
+            html: HTML content of the exercise page, or the page parsed with parse()
+
         Returns:
             Dictionary with exercise details
         """
-        soup = BeautifulSoup(html, 'html.parser')
         details = {}
-        
+
         try:
+            page = self._page(html)
+            backend = page.backend
+            root = page.root
+
             # Extract name
-            name_elem = soup.select_one('h1, .exercise-name')
-            if name_elem:
-                details['name'] = name_elem.get_text(strip=True)
-            
+            name = self._text(root, 'name')
+            if name is not None:
+                details['name'] = name
+
             # Extract images
             images = []
-            for img in soup.select('.exercise-image img, .exercise-photos img'):
-                src = img.get('src')
+            for img in self._select(root, 'detail_images'):
+                src = backend.attr(img, 'src')
                 if src:
                     images.append(src)
             details['images'] = images
-            
-            # Extract description
-            desc_elem = soup.select_one('.exercise-description, .description')
-            if desc_elem:
-                details['description'] = desc_elem.get_text(strip=True)
-            
-            # Extract instructions
-            instructions_elem = soup.select_one('.exercise-instructions, .instructions')
-            if instructions_elem:
-                details['instructions'] = instructions_elem.get_text(strip=True)
-            
+
+            # Extract description and instructions
+            for key in ('description', 'instructions'):
+                value = self._text(root, key)
+                if value is not None:
+                    details[key] = value
+
             # Extract muscles worked
             muscles = []
-            muscles_elem = soup.select('.muscle-worked, .muscles-worked')
-            for muscle in muscles_elem:
-                muscle_name = muscle.get_text(strip=True)
+            for muscle in self._select(root, 'muscles'):
+                muscle_name = backend.text(muscle)
                 if muscle_name:
                     muscles.append(muscle_name)
             details['muscles_worked'] = muscles
-            
-            # Extract difficulty
-            difficulty_elem = soup.select_one('.difficulty-level')
-            if difficulty_elem:
-                details['difficulty'] = difficulty_elem.get_text(strip=True)
-            
-            # Extract equipment
-            equipment_elem = soup.select_one('.equipment-needed')
-            if equipment_elem:
-                details['equipment'] = equipment_elem.get_text(strip=True)
-            
+
+            # Extract difficulty and equipment
+            for key in ('difficulty', 'equipment'):
+                value = self._text(root, key)
+                if value is not None:
+                    details[key] = value
+
         except Exception as e:
             logger.error(f"Error extracting exercise details: {str(e)}")
-        
+
         return details
+
+# One parser per worker process, built on first use
+_worker_parsers: Dict[str, ExerciseParser] = {}
+
+def parse_page(kind: str, html: str, backend: str = 'auto') -> Any:
+    """
+    Parse a page in a worker process (or thread)
+
+    Module-level so it can be sent to a ProcessPoolExecutor; the parser and
+    its compiled selectors are created once per worker.
+
+    Args:
+        kind: Page type ('main', 'category' or 'exercise')
+        html: HTML content
+        backend: Parser backend name
+
+    Returns:
+        The extractor's result
+    """
+    parser = _worker_parsers.get(backend)
+    if parser is None:
+        parser = _worker_parsers[backend] = ExerciseParser(backend)
+    return parser.extract(kind, html)
@@ -1,145 +1,268 @@
 import json
 import os
+import sqlite3
+import threading
 import time
-import hashlib
-from typing import Any, Dict, Optional
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, bytes) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE totals SET bytes = bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE totals SET bytes = bytes - OLD.size WHERE id = 0;
+END;
+"""
+
 class CacheManager:
-    """Manage caching of crawl results"""
-    
-    def __init__(self, cache_dir: str = "cache", ttl: int = 3600):
+    """Manage caching of crawl results in a size-bounded SQLite database"""
+
+    def __init__(self, cache_dir: str = "cache", ttl: int = 3600, max_bytes: int = 256 * 1024 * 1024,
+                 sweep_interval: float = 300):
         """
         Initialize the cache manager
-        
+
+        Entries live in a single WAL-mode database (cache_dir/results.sqlite3),
+        so lookups stay fast however many entries accumulate, and every write
+        is one atomic transaction that other processes see whole or not at
+        all. The byte total is kept by triggers, so processes sharing the
+        file share the budget.
+
         Args:
-            cache_dir: Directory to store cache files
+            cache_dir: Directory of the cache database
             ttl: Time to live in seconds (default 1 hour)
+            max_bytes: Size budget; least recently used entries are evicted
+                beyond it
+            sweep_interval: Seconds between background removals of expired
+                entries (0 to only expire them lazily on lookup)
         """
         self.cache_dir = cache_dir
         self.ttl = ttl
-        
-        # Create cache directory if it doesn't exist
-        if not os.path.exists(self.cache_dir):
-            os.makedirs(self.cache_dir)
-    
-    def _get_cache_key(self, key: str) -> str:
-        """
-        Generate a cache key/filename from a string
-        
-        Args:
-            key: String to hash
-            
-        Returns:
-            Hashed filename
-        """
-        hash_obj = hashlib.md5(key.encode('utf-8'))
-        return hash_obj.hexdigest()
-    
-    def _get_cache_path(self, key: str) -> str:
-        """
-        Get the full path to a cache file
-        
-        Args:
-            key: Cache key
-            
-        Returns:
-            Full path to cache file
-        """
-        return os.path.join(self.cache_dir, f"{self._get_cache_key(key)}.json")
-    
+        self.max_bytes = max_bytes
+        self.path = os.path.join(cache_dir, 'results.sqlite3')
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'sets': 0}
+        self._stop = threading.Event()
+        self._sweeper = None
+        if sweep_interval > 0:
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,),
+                                             name='cache-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def close(self) -> None:
+        """Stop the background sweep and close the database"""
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+        with self._lock:
+            self.db.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        # The connection is in autocommit mode, so transactions are explicit;
+        # IMMEDIATE takes the write lock up front instead of failing to upgrade later
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+
     def get(self, key: str) -> Optional[Dict]:
         """
         Get item from cache
-        
+
         Args:
             key: Cache key
-            
+
         Returns:
             Cached data or None if not found or expired
         """
-        cache_path = self._get_cache_path(key)
-        
-        # Check if cache file exists
-        if not os.path.exists(cache_path):
-            return None
-        
+        now = time.time()
         try:
-            # Read cache file
-            with open(cache_path, 'r') as f:
-                cache_data = json.load(f)
-            
-            # Check if cache is expired
-            if time.time() - cache_data.get('timestamp', 0) > self.ttl:
-                logger.debug(f"Cache expired for {key}")
-                return None
-            
+            with self._lock:
+                row = self.db.execute(
+                    'SELECT data, expires_at FROM entries WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    self._stats['misses'] += 1
+                    return None
+
+                data, expires_at = row
+                if expires_at <= now:
+                    # Lazy expiry; the sweep catches entries nobody asks for again
+                    self.db.execute('DELETE FROM entries WHERE key = ? AND expires_at <= ?', (key, now))
+                    self._stats['expired'] += 1
+                    self._stats['misses'] += 1
+                    logger.debug(f"Cache expired for {key}")
+                    return None
+
+                self.db.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+                self._stats['hits'] += 1
+
             logger.debug(f"Cache hit for {key}")
-            return cache_data.get('data')
-            
+            return json.loads(data)
+
         except Exception as e:
             logger.error(f"Error reading cache: {str(e)}")
             return None
-    
-    def set(self, key: str, data: Any) -> bool:
+
+    def set(self, key: str, data: Any, ttl: Optional[int] = None) -> bool:
         """
         Set item in cache
-        
+
         Args:
             key: Cache key
             data: Data to cache
-            
+            ttl: Time to live in seconds (default: the manager's ttl)
+
         Returns:
             True if successful, False otherwise
         """
-        cache_path = self._get_cache_path(key)
-        
         try:
-            # Prepare cache data
-            cache_data = {
-                'timestamp': time.time(),
-                'data': data
-            }
-            
-            # Write to cache file
-            with open(cache_path, 'w') as f:
-                json.dump(cache_data, f)
-            
+            encoded = json.dumps(data)
+            size = len(encoded.encode('utf-8'))
+            if size > self.max_bytes:
+                logger.warning(f"Not caching {key}: {size} bytes exceeds the cache budget")
+                return False
+
+            now = time.time()
+            with self._lock:
+                with self._transaction():
+                    self.db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                    self.db.execute(
+                        'INSERT INTO entries (key, data, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                        (key, encoded, size, now + (self.ttl if ttl is None else ttl), now)
+                    )
+                    self._evict()
+                self._stats['sets'] += 1
+
             logger.debug(f"Cached data for {key}")
             return True
-            
+
         except Exception as e:
             logger.error(f"Error writing to cache: {str(e)}")
             return False
-    
+
+    def _evict(self) -> None:
+        """Drop expired, then least recently used entries until the cache fits its budget"""
+        total = self.db.execute('SELECT bytes FROM totals WHERE id = 0').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = self.db.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),)).rowcount
+        total = self.db.execute('SELECT bytes FROM totals WHERE id = 0').fetchone()[0]
+
+        while total > self.max_bytes:
+            # Delete the oldest rows whose sizes add up to the overshoot
+            rows = self.db.execute(
+                'SELECT key, size FROM entries ORDER BY accessed_at LIMIT 256'
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for victim, size in rows:
+                victims.append((victim,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+            self.db.executemany('DELETE FROM entries WHERE key = ?', victims)
+            evicted += len(victims)
+
+        self._stats['evictions'] += evicted
+        logger.debug(f"Evicted {evicted} cache entries")
+
+    def sweep(self) -> int:
+        """
+        Remove every expired entry
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            removed = self.db.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),)).rowcount
+            self._stats['expired'] += removed
+        if removed:
+            logger.debug(f"Swept {removed} expired cache entries")
+        return removed
+
+    def _sweep_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping cache: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache statistics
+
+        Returns:
+            Hits, misses, expirations, evictions and sets counted by this
+            process, plus the entry count, size and budget of the shared cache
+        """
+        with self._lock:
+            entries = self.db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            total = self.db.execute('SELECT bytes FROM totals WHERE id = 0').fetchone()[0]
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'hit_ratio': round(stats['hits'] / lookups, 4) if lookups else None,
+            'entries': entries,
+            'bytes': total,
+            'max_bytes': self.max_bytes
+        })
+        return stats
+
     def clear(self, key: Optional[str] = None) -> bool:
         """
         Clear cache
-        
+
         Args:
             key: Specific key to clear, or None to clear all
-            
+
         Returns:
             True if successful, False otherwise
         """
         try:
-            if key:
-                # Clear specific cache item
-                cache_path = self._get_cache_path(key)
-                if os.path.exists(cache_path):
-                    os.remove(cache_path)
+            with self._lock:
+                if key:
+                    # Clear specific cache item
+                    self.db.execute('DELETE FROM entries WHERE key = ?', (key,))
                     logger.debug(f"Cleared cache for {key}")
-            else:
-                # Clear all cache items
-                for filename in os.listdir(self.cache_dir):
-                    if filename.endswith('.json'):
-                        os.remove(os.path.join(self.cache_dir, filename))
-                logger.debug("Cleared all cache")
-            
+                else:
+                    # Clear all cache items
+                    self.db.execute('DELETE FROM entries')
+                    logger.debug("Cleared all cache")
+
             return True
-            
+
         except Exception as e:
             logger.error(f"Error clearing cache: {str(e)}")
             return False
@@ -0,0 +1,34 @@
+"""
+Parser for bodybuilding.com exercise pages
+
+crawler.py's ExerciseCrawler.parse_exercise delegates here. The module only
+needs BeautifulSoup, so the page parsing benchmark can measure the parser
+without the crawler's dependencies installed.
+"""
+from typing import Dict
+
+from bs4 import BeautifulSoup
+
+
+def parse_exercise_page(html: str) -> Dict:
+    """
+    Extract an exercise from its page
+
+    Args:
+        html: Page HTML
+
+    Returns:
+        Exercise with name, category, muscles, equipment, level,
+        instructions and images
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    return {
+        'name': soup.select_one('h1.ExerciseTitle').text.strip(),
+        'category': soup.select_one('div.BBCategoryBadge').text.strip(),
+        'muscles': [m.text.strip() for m in soup.select('div.ExerciseMuscles span')],
+        'equipment': soup.select_one('div.ExerciseEquipment').text.strip(),
+        'level': soup.select_one('div.ExerciseLevel').text.strip(),
+        'instructions': [i.text.strip() for i in soup.select('ol.ExerciseInstructions li')],
+        'images': [img['src'] for img in soup.select('div.ExerciseMedia img')]
+    }
@@ -0,0 +1,284 @@
+"""
+Incremental builder for the dist/ dataset artifacts
+
+Produces dist/exercises.json, dist/exercises.nd.json and dist/exercises.csv
+from exercises/*.json in a single pass. A manifest of per-file content
+hashes (and the rendered fragments of each file) lets a rebuild re-read
+only the files that changed; the outputs are byte-identical to the
+previous `jq -s` / `in2csv` Makefile recipes.
+
+Usage:
+    python -m exercise_data.build [json] [nd] [csv]
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from .manifest import FileManifest, atomic_write, content_hash
+
+logger = logging.getLogger(__name__)
+
+SOURCE_DIR = 'exercises'
+DIST_DIR = 'dist'
+MANIFEST_PATH = os.path.join('.cache', 'build-manifest.json')
+
+OUTPUTS = {
+    'json': 'exercises.json',
+    'nd': 'exercises.nd.json',
+    'csv': 'exercises.csv'
+}
+
+# Values agate (and therefore in2csv) treats as null in text columns
+CSV_NULL_VALUES = ('', 'na', 'n/a', 'none', 'null', '.')
+
+
+class BuildError(Exception):
+    """Raised when a source file cannot be turned into a record"""
+
+
+def render_record(record: Dict) -> str:
+    """
+    Render a record exactly like `jq '.'` does
+
+    Args:
+        record: Parsed exercise
+
+    Returns:
+        Pretty-printed JSON without a trailing newline
+    """
+    # jq additionally escapes DEL, which json.dumps leaves as-is
+    return json.dumps(record, ensure_ascii=False, indent=2).replace('\x7f', '\\u007f')
+
+
+def flatten_record(value, path: str = '') -> List[Tuple[str, str]]:
+    """
+    Flatten a record into CSV columns the way in2csv does
+
+    Nested keys and list indexes are joined with '/', e.g.
+    `primaryMuscles/0`.
+
+    Args:
+        value: Record (or nested value) to flatten
+        path: Column prefix accumulated so far
+
+    Returns:
+        List of (column, cell text) pairs in document order
+    """
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return [(path.strip('/'), _csv_cell(value))]
+
+    pairs = []
+    for key, item in items:
+        pairs.extend(flatten_record(item, f"{path}{key}/"))
+    return pairs
+
+
+def source_files(source_dir: str = SOURCE_DIR) -> List[str]:
+    """Exercise files in the same (byte-wise sorted) order make's wildcard uses"""
+    with os.scandir(source_dir) as it:
+        names = [e.name for e in it if e.name.endswith('.json') and e.is_file()]
+    return [os.path.join(source_dir, name) for name in sorted(names)]
+
+
+def _csv_cell(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return '' if value.strip().lower() in CSV_NULL_VALUES else value
+    return str(value)
+
+
+class DatasetBuilder:
+    """Build the dist/ artifacts from the per-exercise source files"""
+
+    def __init__(self, source_dir: str = SOURCE_DIR, dist_dir: str = DIST_DIR,
+                 manifest_path: str = MANIFEST_PATH):
+        """
+        Initialize the builder
+
+        Args:
+            source_dir: Directory containing one JSON file per exercise
+            dist_dir: Directory the artifacts are written to
+            manifest_path: Location of the incremental build manifest
+        """
+        self.source_dir = source_dir
+        self.dist_dir = dist_dir
+        self.manifest = FileManifest(manifest_path).load()
+
+    def _load(self, path: str) -> Tuple[Dict, bool]:
+        """
+        Get the manifest entry for a source file, re-reading it only if needed
+
+        Returns:
+            Tuple of (entry, changed) where changed means the content differs
+            from the cached version
+        """
+        st = os.stat(path)
+        entry = self.manifest.lookup(path, st)
+        if entry is not None:
+            return entry, False
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = content_hash(data)
+
+        cached = self.manifest.files.get(path)
+        if cached and cached['sha256'] == digest:
+            # Touched but not modified
+            cached.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+            return cached, False
+
+        try:
+            record = json.loads(data.decode('utf-8'))
+        except ValueError as e:
+            raise BuildError(f"{path}: {str(e)}") from e
+
+        entry = self.manifest.update(
+            path, st, digest,
+            json=render_record(record),
+            row=flatten_record(record)
+        )
+        return entry, True
+
+    def _output_current(self, fmt: str, dataset_digest: str) -> bool:
+        """Whether an artifact on disk was written by us from the same inputs"""
+        recorded = self.manifest.extra.get('outputs', {}).get(fmt)
+        try:
+            st = os.stat(os.path.join(self.dist_dir, OUTPUTS[fmt]))
+        except FileNotFoundError:
+            return False
+        return bool(recorded) and (
+            recorded['dataset'] == dataset_digest
+            and recorded['size'] == st.st_size
+            and recorded['mtime_ns'] == st.st_mtime_ns
+        )
+
+    def build(self, formats: Optional[Iterable[str]] = None, force: bool = False) -> Dict:
+        """
+        Build the requested artifacts
+
+        Args:
+            formats: Subset of OUTPUTS keys to produce (default: all)
+            force: Rewrite the outputs even if they are up to date
+
+        Returns:
+            Build statistics
+        """
+        formats = list(formats or OUTPUTS)
+        for fmt in formats:
+            if fmt not in OUTPUTS:
+                raise ValueError(f"Unknown output format: {fmt}")
+
+        start = time.perf_counter()
+        paths = source_files(self.source_dir)
+        entries = []
+        changed = 0
+        dataset = hashlib.sha256()
+
+        for path in paths:
+            entry, was_changed = self._load(path)
+            changed += was_changed
+            entries.append(entry)
+            dataset.update(f"{path}\0{entry['sha256']}\n".encode('utf-8'))
+
+        removed = self.manifest.prune(paths)
+        dataset_digest = dataset.hexdigest()
+
+        written = []
+        outputs = self.manifest.extra.setdefault('outputs', {})
+        for fmt in formats:
+            if force or not self._output_current(fmt, dataset_digest):
+                path = os.path.join(self.dist_dir, OUTPUTS[fmt])
+                writer = getattr(self, f"_write_{fmt}")
+                writer(path, entries)
+                st = os.stat(path)
+                outputs[fmt] = {'dataset': dataset_digest, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+                written.append(path)
+
+        self.manifest.save()
+
+        stats = {
+            'files': len(paths),
+            'changed': changed,
+            'removed': removed,
+            'written': written,
+            'seconds': round(time.perf_counter() - start, 4)
+        }
+        logger.info(f"Built dataset: {stats}")
+        return stats
+
+    def _write_json(self, path: str, entries: List[Dict]) -> None:
+        """Equivalent of `jq -s '.' exercises/*.json`"""
+        if not entries:
+            atomic_write(path, ['[]\n'])
+            return
+
+        def chunks():
+            yield '[\n'
+            for i, entry in enumerate(entries):
+                if i:
+                    yield ',\n'
+                yield '  ' + entry['json'].replace('\n', '\n  ')
+            yield '\n]\n'
+
+        atomic_write(path, chunks())
+
+    def _write_nd(self, path: str, entries: List[Dict]) -> None:
+        """Equivalent of `jq -s '.[]' exercises/*.json`"""
+        atomic_write(path, (entry['json'] + '\n' for entry in entries))
+
+    def _write_csv(self, path: str, entries: List[Dict]) -> None:
+        """Equivalent of `in2csv dist/exercises.json` (cells are written verbatim)"""
+        columns = {}
+        for entry in entries:
+            for column, _ in entry['row']:
+                columns.setdefault(column, len(columns))
+
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator='\n')
+        writer.writerow(columns)
+        for entry in entries:
+            row = [''] * len(columns)
+            for column, cell in entry['row']:
+                row[columns[column]] = cell
+            writer.writerow(row)
+
+        atomic_write(path, [buf.getvalue()])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Build dist/ artifacts from exercises/*.json')
+    parser.add_argument('formats', nargs='*', help=f"Artifacts to build: {', '.join(OUTPUTS)} (default: all)")
+    parser.add_argument('--source', default=SOURCE_DIR, help='Directory with the exercise JSON files')
+    parser.add_argument('--dist', default=DIST_DIR, help='Output directory')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help='Incremental build manifest')
+    parser.add_argument('--force', action='store_true', help='Rewrite outputs even if up to date')
+    args = parser.parse_args(argv)
+    unknown = set(args.formats) - set(OUTPUTS)
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    builder = DatasetBuilder(args.source, args.dist, args.manifest)
+    try:
+        builder.build(args.formats, force=args.force)
+    except BuildError as e:
+        logger.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""
+Incremental image derivative builder
+
+Renders every exercises/<id>/<n>.jpg at a few fixed widths as JPEG, WebP
+and (when the Pillow build has an encoder) AVIF into dist/images, in a
+process pool. A manifest of per-image content hashes lets a rebuild
+re-render only new or changed images, and drops the variants of deleted
+ones. dist/images/index.json records the sha256, width, height and size
+of every original and variant for the API to serve and advertise.
+
+Usage:
+    python -m exercise_data.images [--workers 4] [--force]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+from PIL import Image, ImageOps
+
+try:
+    import pillow_avif  # noqa: F401 (registers the AVIF plugin on Pillow < 11.2)
+except ImportError:
+    pass
+
+from .manifest import FileManifest, atomic_write, content_hash
+
+logger = logging.getLogger(__name__)
+
+SOURCE_DIR = 'exercises'
+OUTPUT_DIR = os.path.join('dist', 'images')
+INDEX_NAME = 'index.json'
+MANIFEST_PATH = os.path.join('.cache', 'images-manifest.json')
+
+WIDTHS = (200, 400, 800)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Pillow format name, file extension and encoder options of each output format
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 75, 'method': 4}),
+    'avif': ('AVIF', 'avif', {'quality': 55, 'speed': 6}),
+}
+
+
+class ImageBuildError(Exception):
+    """Raised when a source image cannot be decoded or encoded"""
+
+
+def available_formats() -> List[str]:
+    """Output formats the installed Pillow can encode"""
+    Image.init()
+    return [name for name, (pil_format, _, _) in FORMATS.items() if pil_format in Image.SAVE]
+
+
+def source_images(source_dir: str = SOURCE_DIR) -> List[str]:
+    """Image paths relative to source_dir ('Ab_Roller/0.jpg'), sorted"""
+    images = []
+    with os.scandir(source_dir) as it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
+            with os.scandir(entry.path) as files:
+                for f in files:
+                    if f.name.lower().endswith(IMAGE_EXTENSIONS) and f.is_file():
+                        images.append(f"{entry.name}/{f.name}")
+    return sorted(images)
+
+
+def variant_path(image: str, width: int, extension: str) -> str:
+    """Path of a variant relative to the output directory ('Ab_Roller/0-200.webp')"""
+    stem = os.path.splitext(image)[0]
+    return f"{stem}-{width}.{extension}"
+
+
+def render_variants(source_dir: str, output_dir: str, image: str, widths: Sequence[int],
+                    formats: Sequence[str]) -> Dict:
+    """
+    Render all variants of one image (runs in a worker process)
+
+    Widths at or above the source width are rendered once at the source
+    width, and not as JPEG, which the original already is.
+
+    Args:
+        source_dir: Directory of the originals
+        output_dir: Directory the variants are written to
+        image: Image path relative to source_dir
+        widths: Target widths in pixels
+        formats: Keys of FORMATS to encode
+
+    Returns:
+        Index record of the image and its variants
+
+    Raises:
+        ImageBuildError: If the image cannot be decoded or encoded
+    """
+    path = os.path.join(source_dir, image)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        with Image.open(io.BytesIO(data)) as opened:
+            mime_type = Image.MIME.get(opened.format, 'application/octet-stream')
+            original_size = opened.size
+            # Let the JPEG decoder downscale by a power of two while reading
+            largest = min(max(widths), opened.width)
+            opened.draft('RGB', (largest, round(opened.height * largest / opened.width)))
+            source = ImageOps.exif_transpose(opened).convert('RGB')
+    except (OSError, ValueError) as e:
+        raise ImageBuildError(f"{path}: {str(e)}") from e
+
+    width, height = original_size
+    targets = sorted({min(w, width) for w in widths})
+    variants = []
+    for target in targets:
+        size = (target, max(1, round(height * target / width)))
+        resized = source if source.size == size else source.resize(size, Image.LANCZOS)
+        for name in formats:
+            if name == 'jpeg' and target >= width:
+                continue
+            pil_format, extension, options = FORMATS[name]
+            buf = io.BytesIO()
+            try:
+                resized.save(buf, pil_format, **options)
+            except (OSError, ValueError) as e:
+                raise ImageBuildError(f"{path}: {name} at {target}px: {str(e)}") from e
+            encoded = buf.getvalue()
+            relative = variant_path(image, target, extension)
+            atomic_write(os.path.join(output_dir, relative), [encoded], 'wb')
+            variants.append({
+                'path': relative,
+                'format': name,
+                'width': size[0],
+                'height': size[1],
+                'bytes': len(encoded),
+                'sha256': content_hash(encoded)
+            })
+
+    return {
+        'format': mime_type,
+        'width': width,
+        'height': height,
+        'bytes': len(data),
+        'sha256': content_hash(data),
+        'variants': variants
+    }
+
+
+class ImageBuilder:
+    """Build the image variants and their index from the source tree"""
+
+    def __init__(self, source_dir: str = SOURCE_DIR, output_dir: str = OUTPUT_DIR,
+                 manifest_path: str = MANIFEST_PATH, widths: Sequence[int] = WIDTHS,
+                 formats: Optional[Sequence[str]] = None):
+        """
+        Initialize the builder
+
+        Args:
+            source_dir: Directory containing one subdirectory of images per exercise
+            output_dir: Directory the variants and index.json are written to
+            manifest_path: Location of the incremental build manifest
+            widths: Target widths in pixels
+            formats: Keys of FORMATS to produce (default: every one Pillow can encode)
+        """
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.widths = tuple(sorted(widths))
+        self.formats = tuple(formats or available_formats())
+        unknown = [f for f in self.formats if f not in FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown image format: {', '.join(unknown)}")
+
+        # Changing the widths, formats or encoder settings invalidates every entry
+        settings = json.dumps([self.widths, [(f, FORMATS[f]) for f in self.formats], Image.__version__],
+                              sort_keys=True)
+        self.manifest = FileManifest(manifest_path, hashlib.sha256(settings.encode('utf-8')).hexdigest()).load()
+
+    def _pending(self, images: List[str], force: bool) -> List[Tuple[str, os.stat_result, Optional[str]]]:
+        """
+        Images whose variants have to be rendered
+
+        Returns:
+            List of (image, stat, content hash or None if not read yet)
+        """
+        pending = []
+        for image in images:
+            path = os.path.join(self.source_dir, image)
+            st = os.stat(path)
+            if not force and self.manifest.lookup(image, st) is not None:
+                continue
+
+            with open(path, 'rb') as f:
+                digest = content_hash(f.read())
+            cached = self.manifest.files.get(image)
+            if not force and cached and cached['sha256'] == digest and self._variants_exist(cached):
+                # Touched but not modified
+                cached.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                continue
+            pending.append((image, st, digest))
+        return pending
+
+    def _variants_exist(self, entry: Dict) -> bool:
+        return all(os.path.exists(os.path.join(self.output_dir, v['path'])) for v in entry['record']['variants'])
+
+    def _remove_variants(self, entry: Dict, keep: Sequence[str] = ()) -> None:
+        for variant in entry['record']['variants']:
+            if variant['path'] not in keep:
+                try:
+                    os.remove(os.path.join(self.output_dir, variant['path']))
+                except FileNotFoundError:
+                    pass
+
+    def build(self, workers: Optional[int] = None, force: bool = False) -> Dict:
+        """
+        Render new and changed images and rewrite the index
+
+        Args:
+            workers: Worker processes (default: one per CPU; 0 renders inline)
+            force: Re-render every image
+
+        Returns:
+            Build statistics
+
+        Raises:
+            ImageBuildError: If any image failed; the images that succeeded
+                are still recorded
+        """
+        start = time.perf_counter()
+        images = source_images(self.source_dir)
+        pending = self._pending(images, force)
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        failures = []
+        args = (self.source_dir, self.output_dir)
+        if workers > 0 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(render_variants, *args, image, self.widths, self.formats): (image, st, digest)
+                    for image, st, digest in pending
+                }
+                for future in as_completed(futures):
+                    self._record(futures[future], future, failures)
+        else:
+            for image, st, digest in pending:
+                try:
+                    record = render_variants(*args, image, self.widths, self.formats)
+                except ImageBuildError as e:
+                    failures.append(str(e))
+                    continue
+                self._store(image, st, digest, record)
+
+        for image in set(self.manifest.files) - set(images):
+            self._remove_variants(self.manifest.files[image])
+        removed = self.manifest.prune(images)
+
+        index = {image: self.manifest.files[image]['record'] for image in images if image in self.manifest.files}
+        atomic_write(os.path.join(self.output_dir, INDEX_NAME),
+                     [json.dumps(index, ensure_ascii=False, separators=(',', ':'), sort_keys=True)])
+        self.manifest.save()
+
+        stats = {
+            'images': len(images),
+            'rendered': len(pending) - len(failures),
+            'failed': len(failures),
+            'removed': removed,
+            'variants': sum(len(record['variants']) for record in index.values()),
+            'bytes_original': sum(record['bytes'] for record in index.values()),
+            'formats': list(self.formats),
+            'seconds': round(time.perf_counter() - start, 2)
+        }
+        logger.info(f"Built image variants: {stats}")
+        if failures:
+            raise ImageBuildError('; '.join(failures))
+        return stats
+
+    def _record(self, pending: Tuple, future, failures: List[str]) -> None:
+        image, st, digest = pending
+        try:
+            record = future.result()
+        except ImageBuildError as e:
+            failures.append(str(e))
+            return
+        self._store(image, st, digest, record)
+
+    def _store(self, image: str, st: os.stat_result, digest: str, record: Dict) -> None:
+        previous = self.manifest.files.get(image)
+        if previous is not None:
+            # Variants the new settings no longer produce
+            self._remove_variants(previous, keep=[v['path'] for v in record['variants']])
+        self.manifest.update(image, st, digest, record=record)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Build resized WebP/AVIF/JPEG variants of exercises/*/*.jpg')
+    parser.add_argument('--source', default=SOURCE_DIR, help='Directory with the exercise image folders')
+    parser.add_argument('--output', default=OUTPUT_DIR, help='Output directory for variants and index.json')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help='Incremental build manifest')
+    parser.add_argument('--width', type=int, action='append', help=f"Target width (repeatable; default: {WIDTHS})")
+    parser.add_argument('--format', action='append', choices=list(FORMATS),
+                        help='Output format (repeatable; default: every one Pillow can encode)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='Re-render every image')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    missing = [f for f in (args.format or ()) if f not in available_formats()]
+    if missing:
+        parser.error(f"this Pillow build cannot encode: {', '.join(missing)}")
+    if 'avif' not in available_formats():
+        logger.warning("Pillow has no AVIF encoder, skipping AVIF variants")
+
+    builder = ImageBuilder(args.source, args.output, args.manifest, args.width or WIDTHS, args.format)
+    try:
+        builder.build(args.workers, force=args.force)
+    except ImageBuildError as e:
+        logger.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data: bytes) -> str:
+    """
+    Hash file contents
+
+    Args:
+        data: Raw file contents
+
+    Returns:
+        Hex digest used as the content hash throughout the manifests
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def atomic_write(path: str, chunks: Iterable, mode: str = 'w') -> None:
+    """
+    Write a file through a temporary sibling and rename it into place
+
+    Readers never observe a half-written file, and a failed write leaves
+    the previous version untouched.
+
+    Args:
+        path: Destination path
+        chunks: Iterable of str (or bytes when mode is 'wb') to write
+        mode: 'w' for text output, 'wb' for binary output
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(path))
+    try:
+        if 'b' in mode:
+            f = os.fdopen(fd, mode)
+        else:
+            f = os.fdopen(fd, mode, encoding='utf-8', newline='')
+        with f:
+            for chunk in chunks:
+                f.write(chunk)
+        # mkstemp creates the file 0600; keep the permissions of the file being replaced
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class FileManifest:
+    """Per-file content hashes persisted between incremental runs"""
+
+    VERSION = 1
+
+    def __init__(self, path: str, fingerprint: Optional[str] = None):
+        """
+        Initialize the manifest
+
+        Args:
+            path: Location of the manifest file
+            fingerprint: Extra value the cached entries depend on (e.g. a
+                schema hash); a mismatch discards every entry on load
+        """
+        self.path = path
+        self.fingerprint = fingerprint
+        self.files: Dict[str, Dict] = {}
+        self.extra: Dict = {}
+
+    def load(self) -> 'FileManifest':
+        """Load the manifest, silently starting empty if it is missing or stale"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return self
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.path}: {str(e)}")
+            return self
+
+        if data.get('version') != self.VERSION or data.get('fingerprint') != self.fingerprint:
+            logger.info(f"Manifest {self.path} is out of date, starting fresh")
+            return self
+
+        self.files = data.get('files', {})
+        self.extra = data.get('extra', {})
+        return self
+
+    def save(self) -> None:
+        """Persist the manifest atomically"""
+        data = {
+            'version': self.VERSION,
+            'fingerprint': self.fingerprint,
+            'files': self.files,
+            'extra': self.extra
+        }
+        atomic_write(self.path, [json.dumps(data, ensure_ascii=False, separators=(',', ':'))])
+
+    def lookup(self, path: str, st: os.stat_result) -> Optional[Dict]:
+        """
+        Return the cached entry for a file if its size and mtime are unchanged
+
+        Args:
+            path: File path as used for the manifest key
+            st: Fresh stat result for the file
+
+        Returns:
+            Cached entry or None if the file has to be re-read
+        """
+        entry = self.files.get(path)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry
+        return None
+
+    def update(self, path: str, st: os.stat_result, digest: str, **fields) -> Dict:
+        """
+        Record a freshly read file
+
+        Args:
+            path: File path as used for the manifest key
+            st: Stat result taken before reading the file
+            digest: Content hash of the file
+            **fields: Derived data to cache alongside the hash
+
+        Returns:
+            The new manifest entry
+        """
+        entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+        entry.update(fields)
+        self.files[path] = entry
+        return entry
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """
+        Drop entries for files that no longer exist
+
+        Args:
+            keep: Paths still present in the source tree
+
+        Returns:
+            Number of entries removed
+        """
+        keep = set(keep)
+        removed = [path for path in self.files if path not in keep]
+        for path in removed:
+            del self.files[path]
+        return len(removed)
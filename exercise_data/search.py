@@ -0,0 +1,356 @@
+"""
+Embedded full-text search over exercise names and instructions
+
+The index is an inverted index with precomputed BM25 impacts (name hits
+are boosted over instruction hits), a name-only postings list for
+prefix/autocomplete lookups, and the encoded attribute columns from
+exercise_data.store so results can be filtered by the enum fields.
+
+It is written to a single file (dist/exercises.idx by default): a JSON
+header followed by 8-byte aligned little-endian arrays. SearchIndex.open()
+maps the file read-only and wraps the arrays without copying, so workers
+start without rebuilding anything.
+
+Usage:
+    python -m exercise_data.search build
+    python -m exercise_data.search query "bench press" --equipment barbell
+    python -m exercise_data.search complete "barbell cu"
+"""
+import argparse
+import bisect
+import json
+import math
+import mmap
+import re
+import struct
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .manifest import atomic_write
+from .store import (DATASET_PATH, ENUM_FIELDS, MUSCLE_FIELDS, SCHEMA_PATH, AttributeColumns,
+                    load_vocabulary)
+
+INDEX_PATH = 'dist/exercises.idx'
+
+MAGIC = b'EXIDX\x00\x01\x00'
+FORMAT_VERSION = 1
+
+# BM25 parameters; name hits count NAME_BOOST times an instruction hit
+K1 = 1.2
+B = 0.75
+NAME_BOOST = 3.0
+
+TOKEN_RE = re.compile(r'[0-9a-z]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens of a text"""
+    return TOKEN_RE.findall(text.lower())
+
+
+def _postings(term_docs: Dict[str, Dict[int, float]], terms: List[str]):
+    """Flatten {term: {doc: value}} into CSR-style offsets/docs/values arrays"""
+    offsets = np.zeros(len(terms) + 1, dtype=np.uint32)
+    docs = []
+    values = []
+    for i, term in enumerate(terms):
+        postings = sorted(term_docs[term].items())
+        docs.extend(doc for doc, _ in postings)
+        values.extend(value for _, value in postings)
+        offsets[i + 1] = len(docs)
+    return offsets, docs, values
+
+
+def build_index(records: Sequence[Dict], schema: Dict) -> bytes:
+    """
+    Build the serialized index
+
+    Args:
+        records: Exercises as found in dist/exercises.json
+        schema: Parsed schema.json providing the enum vocabularies
+
+    Returns:
+        Contents of the index file
+    """
+    vocab, muscles = load_vocabulary(schema)
+    attributes = AttributeColumns.encode(records, vocab, muscles)
+
+    term_freqs = defaultdict(dict)
+    name_docs = defaultdict(dict)
+    lengths = []
+    for doc, record in enumerate(records):
+        name_tokens = tokenize(record.get('name', ''))
+        body_tokens = [t for line in record.get('instructions') or () for t in tokenize(line)]
+
+        weighted = Counter()
+        for token in name_tokens:
+            weighted[token] += NAME_BOOST
+            name_docs[token][doc] = 1
+        for token in body_tokens:
+            weighted[token] += 1.0
+        for token, tf in weighted.items():
+            term_freqs[token][doc] = tf
+        lengths.append(len(name_tokens) * NAME_BOOST + len(body_tokens))
+
+    n_docs = len(records)
+    avg_length = (sum(lengths) / n_docs) if n_docs else 0.0
+
+    # BM25 is additive over query terms, so each posting stores its final impact
+    impacts = {}
+    for term, postings in term_freqs.items():
+        df = len(postings)
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        impacts[term] = {
+            doc: idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[doc] / avg_length))
+            for doc, tf in postings.items()
+        }
+
+    doc_dtype = np.uint16 if n_docs <= 0xFFFF else np.uint32
+    terms = sorted(impacts)
+    name_terms = sorted(name_docs)
+    term_offsets, term_docs, term_impacts = _postings(impacts, terms)
+    name_offsets, name_postings, _ = _postings(name_docs, name_terms)
+
+    arrays = {
+        'term_offsets': term_offsets,
+        'term_docs': np.asarray(term_docs, dtype=doc_dtype),
+        'term_impacts': np.asarray(term_impacts, dtype='<f4'),
+        'name_offsets': name_offsets,
+        'name_docs': np.asarray(name_postings, dtype=doc_dtype),
+    }
+    arrays.update(attributes.columns)
+
+    sections = {}
+    blobs = []
+    offset = 0
+    for key, array in arrays.items():
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+        data = array.tobytes()
+        padding = -len(data) % 8
+        sections[key] = {'offset': offset, 'dtype': array.dtype.str, 'count': int(array.size)}
+        blobs.append(data + b'\x00' * padding)
+        offset += len(data) + padding
+
+    header = json.dumps({
+        'version': FORMAT_VERSION,
+        'docs': n_docs,
+        'ids': [r['id'] for r in records],
+        'names': [r['name'] for r in records],
+        'terms': terms,
+        'name_terms': name_terms,
+        'vocab': {field: list(values) for field, values in vocab.items()},
+        'muscles': list(muscles),
+        'sections': sections
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    return b''.join([MAGIC, struct.pack('<I', len(header)), header, *blobs])
+
+
+class SearchIndex:
+    """Read-only search index backed by a memory-mapped index file"""
+
+    def __init__(self, buffer):
+        """
+        Wrap a serialized index
+
+        Args:
+            buffer: Bytes-like object holding the index (e.g. an mmap);
+                the arrays are views into it and it must outlive the index
+        """
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not an exercise search index")
+        (header_length,) = struct.unpack_from('<I', buffer, len(MAGIC))
+        body = len(MAGIC) + 4 + header_length
+        header = json.loads(bytes(buffer[len(MAGIC) + 4:body]).decode('utf-8'))
+        if header['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index version {header['version']}")
+
+        self._buffer = buffer
+        self.ids: List[str] = header['ids']
+        self.names: List[str] = header['names']
+        self.terms: List[str] = header['terms']
+        self.name_terms: List[str] = header['name_terms']
+        self._term_ids = {term: i for i, term in enumerate(self.terms)}
+        self._name_term_ids = {term: i for i, term in enumerate(self.name_terms)}
+        self._id_rows = {exercise_id: row for row, exercise_id in enumerate(self.ids)}
+        self._names_lower = [name.lower() for name in self.names]
+
+        arrays = {
+            key: np.frombuffer(buffer, dtype=np.dtype(section['dtype']), count=section['count'],
+                               offset=body + section['offset'])
+            for key, section in header['sections'].items()
+        }
+        self._term_offsets = arrays['term_offsets']
+        self._term_docs = arrays['term_docs']
+        self._term_impacts = arrays['term_impacts']
+        self._name_offsets = arrays['name_offsets']
+        self._name_docs = arrays['name_docs']
+        self.attributes = AttributeColumns(
+            {field: arrays[field] for field in ENUM_FIELDS + MUSCLE_FIELDS},
+            {field: tuple(values) for field, values in header['vocab'].items()},
+            tuple(header['muscles'])
+        )
+
+    @classmethod
+    def build(cls, records: Sequence[Dict], schema: Dict) -> 'SearchIndex':
+        """Build an in-memory index without going through a file"""
+        return cls(build_index(records, schema))
+
+    @classmethod
+    def open(cls, path: str = INDEX_PATH) -> 'SearchIndex':
+        """
+        Map an index file
+
+        Args:
+            path: File written by `python -m exercise_data.search build`
+        """
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _prefix_range(self, terms: List[str], prefix: str) -> Tuple[int, int]:
+        return bisect.bisect_left(terms, prefix), bisect.bisect_left(terms, prefix + '\uffff')
+
+    def search(self, query: str, limit: int = 10, prefix: bool = False, **filters) -> List[Dict]:
+        """
+        Rank exercises by BM25 over name and instructions
+
+        Args:
+            query: Free text query
+            limit: Maximum number of results
+            prefix: Treat the last query token as a prefix (search-as-you-type)
+            **filters: Attribute filters, see AttributeColumns.mask()
+
+        Raises:
+            ValueError: If a filter value is not part of the schema vocabulary
+
+        Returns:
+            List of {'id', 'name', 'score'} dictionaries, best match first
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        term_ids = [self._term_ids[t] for t in tokens[:-1] if t in self._term_ids]
+        if prefix:
+            start, end = self._prefix_range(self.terms, tokens[-1])
+            term_ids.extend(range(start, end))
+        elif tokens[-1] in self._term_ids:
+            term_ids.append(self._term_ids[tokens[-1]])
+
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        offsets = self._term_offsets
+        for term_id in term_ids:
+            start, end = offsets[term_id], offsets[term_id + 1]
+            # Postings of a term hold each document at most once
+            scores[self._term_docs[start:end]] += self._term_impacts[start:end]
+
+        if any(value is not None for value in filters.values()):
+            scores[~self.attributes.mask(**filters)] = 0
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > limit:
+            hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')]
+
+        return [
+            {'id': self.ids[row], 'name': self.names[row], 'score': float(scores[row])}
+            for row in hits.tolist()
+        ]
+
+    def complete(self, prefix: str, limit: int = 10, **filters) -> List[Dict]:
+        """
+        Autocomplete exercise names
+
+        Every complete word of the prefix must appear in the name and the
+        last (partial) word must start a word of the name. Names starting
+        with the prefix rank first, then shorter names.
+
+        Args:
+            prefix: What the user typed so far
+            limit: Maximum number of suggestions
+            **filters: Attribute filters, see AttributeColumns.mask()
+
+        Returns:
+            List of {'id', 'name'} dictionaries
+        """
+        tokens = tokenize(prefix)
+        if not tokens:
+            return []
+        partial = None if not prefix[-1:].isalnum() else tokens.pop()
+
+        candidates = None
+        offsets = self._name_offsets
+        for token in tokens:
+            term_id = self._name_term_ids.get(token)
+            if term_id is None:
+                return []
+            docs = self._name_docs[offsets[term_id]:offsets[term_id + 1]]
+            candidates = docs if candidates is None else np.intersect1d(candidates, docs, assume_unique=True)
+
+        if partial is not None:
+            start, end = self._prefix_range(self.name_terms, partial)
+            if start == end:
+                return []
+            docs = np.unique(self._name_docs[offsets[start]:offsets[end]])
+            candidates = docs if candidates is None else np.intersect1d(candidates, docs, assume_unique=True)
+
+        if any(value is not None for value in filters.values()):
+            candidates = candidates[self.attributes.mask(**filters)[candidates]]
+
+        needle = prefix.lower().strip()
+        rows = sorted(candidates.tolist(), key=lambda row: (
+            not self._names_lower[row].startswith(needle), len(self.names[row]), self._names_lower[row]
+        ))
+        return [{'id': self.ids[row], 'name': self.names[row]} for row in rows[:limit]]
+
+    def row(self, exercise_id: str) -> Optional[int]:
+        """Position of an exercise in the index (and in dist/exercises.json)"""
+        return self._id_rows.get(exercise_id)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Build or query the exercise search index')
+    parser.add_argument('--index', default=INDEX_PATH, help='Index file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Build the index from the dataset')
+    build.add_argument('--dataset', default=DATASET_PATH)
+    build.add_argument('--schema', default=SCHEMA_PATH)
+
+    for name in ('query', 'complete'):
+        command = commands.add_parser(name, help=f"Run a {name} against the index")
+        command.add_argument('text')
+        command.add_argument('--limit', type=int, default=10)
+        for field in ENUM_FIELDS:
+            command.add_argument(f"--{field}")
+        command.add_argument('--muscles')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        with open(args.dataset, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        with open(args.schema, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+        atomic_write(args.index, [build_index(records, schema)], mode='wb')
+        return 0
+
+    index = SearchIndex.open(args.index)
+    filters = {field: getattr(args, field) for field in ENUM_FIELDS + ('muscles',)}
+    if args.command == 'query':
+        results = index.search(args.text, limit=args.limit, **filters)
+    else:
+        results = index.complete(args.text, limit=args.limit, **filters)
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Batch JSON serialization of exercise rows
+
+Serializes row tuples (as returned by a core ``select()``) straight into
+the bytes of a JSON array, producing the same camelCase objects as
+``Exercise.to_dict()`` without building an intermediate dict per row.
+Each row is rendered through a single ``%`` template whose key fragments
+are encoded once per field list; enum and timestamp strings are encoded
+once per distinct value; JSON columns selected as text are spliced in
+verbatim.
+
+Example:
+    serializer = RowSerializer(['id', 'name', 'primaryMuscles'])
+    body = serializer.dumps(rows)
+"""
+import json
+from datetime import datetime
+from json.encoder import c_make_encoder, encode_basestring_ascii
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+
+# Field order of Exercise.to_dict()
+FIELDS = (
+    'id', 'name', 'force', 'level', 'mechanic', 'equipment', 'category',
+    'primaryMuscles', 'secondaryMuscles', 'instructions', 'images',
+    'created_at', 'updated_at'
+)
+
+ENUM_FIELDS = frozenset(('force', 'level', 'mechanic', 'equipment', 'category'))
+JSON_FIELDS = frozenset(('primaryMuscles', 'secondaryMuscles', 'instructions', 'images'))
+DATETIME_FIELDS = frozenset(('created_at', 'updated_at'))
+
+# Distinct timestamps are few (rows loaded together share them), but bound the cache anyway
+MAX_CACHED_TIMESTAMPS = 4096
+
+if c_make_encoder is not None:
+    # The C encoder behind json.dumps, built once instead of on every call
+    _iterencode = c_make_encoder(None, json.JSONEncoder().default, encode_basestring_ascii,
+                                 None, ':', ',', False, False, True)
+
+    def _encode_value(value: Any) -> str:
+        return ''.join(_iterencode(value, 0))
+else:
+    _encode_value = json.JSONEncoder(separators=(',', ':')).encode
+
+
+def _encode_string(value: Optional[str]) -> str:
+    return 'null' if value is None else encode_basestring_ascii(value)
+
+
+def _encode_json(value: Any) -> str:
+    if isinstance(value, str):
+        # Column selected as text: already JSON
+        return value
+    return _encode_value(value)
+
+
+def _cached(encode: Callable[[Any], str], limit: Optional[int] = None) -> Callable[[Any], str]:
+    cache: Dict[Any, str] = {}
+
+    def encoder(value: Any) -> str:
+        try:
+            return cache[value]
+        except KeyError:
+            if limit is not None and len(cache) >= limit:
+                cache.clear()
+            result = cache[value] = encode(value)
+            return result
+    return encoder
+
+
+def _encode_datetime(value: Optional[datetime]) -> str:
+    return 'null' if value is None else '"' + value.isoformat() + '"'
+
+
+class RowSerializer:
+    """Serialize row tuples of a fixed field list to a JSON array"""
+
+    def __init__(self, fields: Optional[Sequence[str]] = None, positions: Optional[Sequence[int]] = None):
+        """
+        Precompute the row template and the per-field encoders
+
+        Args:
+            fields: Output keys, any of FIELDS (default: all, in to_dict order)
+            positions: Index of each field in the row tuples (default: the
+                row holds exactly the fields, in order)
+
+        Raises:
+            ValueError: If a field is unknown
+        """
+        self.fields = tuple(fields or FIELDS)
+        unknown = [f for f in self.fields if f not in FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+        self._template = '{' + ','.join(
+            encode_basestring_ascii(field).replace('%', '%%') + ':%s' for field in self.fields
+        ) + '}'
+        self._encoders = tuple(self._encoder(field) for field in self.fields)
+        if positions is None:
+            self._pick = None
+        elif len(positions) == 1:
+            self._pick = lambda row, i=positions[0]: (row[i],)
+        else:
+            self._pick = itemgetter(*positions)
+
+    @staticmethod
+    def _encoder(field: str) -> Callable[[Any], str]:
+        if field in ENUM_FIELDS:
+            return _cached(_encode_string)
+        if field in JSON_FIELDS:
+            return _encode_json
+        if field in DATETIME_FIELDS:
+            return _cached(_encode_datetime, MAX_CACHED_TIMESTAMPS)
+        return _encode_string
+
+    def encode_row(self, row: Sequence[Any]) -> str:
+        """Render a single row as a JSON object"""
+        if self._pick is not None:
+            row = self._pick(row)
+        return self._template % tuple([encode(value) for encode, value in zip(self._encoders, row)])
+
+    def dumps(self, rows: Iterable[Sequence[Any]]) -> bytes:
+        """Render rows as the UTF-8 bytes of a JSON array"""
+        return ('[' + ','.join(map(self.encode_row, rows)) + ']').encode('utf-8')
@@ -0,0 +1,247 @@
+"""
+Read-only columnar exercise store
+
+The enum fields from schema.json (level, force, mechanic, equipment,
+category) are dictionary-encoded into uint8 code arrays and
+primaryMuscles/secondaryMuscles are stored as 17-bit masks, so attribute
+filters run as vectorized NumPy mask operations instead of a Python loop
+over a list of dicts.
+
+Example:
+    store = ExerciseStore.from_file()
+    store.query(mechanic='compound', equipment='dumbbell',
+                muscles='chest', exclude_muscles='shoulders')
+"""
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+ENUM_FIELDS = ('level', 'force', 'mechanic', 'equipment', 'category')
+MUSCLE_FIELDS = ('primaryMuscles', 'secondaryMuscles')
+
+DATASET_PATH = 'dist/exercises.json'
+SCHEMA_PATH = 'schema.json'
+
+FilterValue = Union[None, str, Iterable[Optional[str]]]
+
+
+def load_vocabulary(schema: Dict) -> Tuple[Dict[str, Tuple], Tuple[str, ...]]:
+    """
+    Read the enum vocabularies out of schema.json
+
+    Args:
+        schema: Parsed schema.json
+
+    Returns:
+        Tuple of ({field: values}, muscle names); values keep schema order
+    """
+    properties = schema['properties']
+    vocab = {field: tuple(properties[field]['enum']) for field in ENUM_FIELDS}
+    muscles = tuple(properties['primaryMuscles']['items'][0]['enum'])
+    return vocab, muscles
+
+
+class AttributeColumns:
+    """Encoded attribute columns and the vectorized filter over them"""
+
+    def __init__(self, columns: Dict[str, np.ndarray], vocab: Dict[str, Tuple], muscles: Tuple[str, ...]):
+        """
+        Wrap already encoded columns (e.g. arrays mapped from an index file)
+
+        Args:
+            columns: uint8 code array per ENUM_FIELDS entry and uint32 mask
+                array per MUSCLE_FIELDS entry, all of the same length
+            vocab: Enum values per field; a code is an index into these
+            muscles: Muscle names; bit i of a mask stands for muscles[i]
+        """
+        if len(muscles) > 32:
+            raise ValueError("Muscle masks are limited to 32 distinct muscles")
+
+        self.columns = columns
+        self.vocab = vocab
+        self.muscles = muscles
+        self._codes = {field: {v: i for i, v in enumerate(values)}
+                       for field, values in vocab.items()}
+        self._muscle_bits = {m: 1 << i for i, m in enumerate(muscles)}
+        self._size = len(columns['level'])
+
+        # Either-list mask, precomputed for the muscles/exclude_muscles filters
+        self._any_muscles = columns['primaryMuscles'] | columns['secondaryMuscles']
+        self._any_muscles.setflags(write=False)
+
+    @classmethod
+    def encode(cls, records: Sequence[Dict], vocab: Dict[str, Tuple],
+               muscles: Tuple[str, ...]) -> 'AttributeColumns':
+        """
+        Dictionary-encode the attributes of a list of exercises
+
+        Raises:
+            ValueError: If a record holds a value missing from the vocabulary
+        """
+        columns = {}
+        for field in ENUM_FIELDS:
+            codes = {v: i for i, v in enumerate(vocab[field])}
+            try:
+                column = [codes[r.get(field)] for r in records]
+            except KeyError as e:
+                raise ValueError(f"Value {e.args[0]!r} of {field} is not in schema.json") from None
+            columns[field] = np.fromiter(column, dtype=np.uint8, count=len(records))
+
+        bits = {m: 1 << i for i, m in enumerate(muscles)}
+        for field in MUSCLE_FIELDS:
+            masks = []
+            for r in records:
+                mask = 0
+                for muscle in r.get(field) or ():
+                    if muscle not in bits:
+                        raise ValueError(f"{field}: Unknown muscle {muscle!r}")
+                    mask |= bits[muscle]
+                masks.append(mask)
+            columns[field] = np.fromiter(masks, dtype=np.uint32, count=len(records))
+
+        for column in columns.values():
+            column.setflags(write=False)
+        return cls(columns, vocab, muscles)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _mask_of(self, muscles: Iterable[str]) -> int:
+        mask = 0
+        for muscle in muscles:
+            try:
+                mask |= self._muscle_bits[muscle]
+            except KeyError:
+                raise ValueError(f"Unknown muscle {muscle!r}") from None
+        return mask
+
+    def _values(self, value: FilterValue) -> List[Optional[str]]:
+        if value is None or isinstance(value, str):
+            return [value]
+        return list(value)
+
+    def mask(self, level: FilterValue = None, force: FilterValue = None, mechanic: FilterValue = None,
+             equipment: FilterValue = None, category: FilterValue = None,
+             primary_muscles: FilterValue = None, secondary_muscles: FilterValue = None,
+             muscles: FilterValue = None, exclude_muscles: FilterValue = None) -> np.ndarray:
+        """
+        Compute the boolean row mask for a filter
+
+        Enum filters take a value or an iterable of values (any of them
+        matches); pass None to leave a field unfiltered. Muscle filters
+        match if any of the given muscles is present: primary_muscles and
+        secondary_muscles look at one list, muscles at either, and
+        exclude_muscles drops rows having any of them in either list.
+
+        Raises:
+            ValueError: If a value is not part of the schema vocabulary
+
+        Returns:
+            Boolean array with one entry per exercise
+        """
+        result = np.ones(self._size, dtype=bool)
+
+        enum_filters = {'level': level, 'force': force, 'mechanic': mechanic,
+                        'equipment': equipment, 'category': category}
+        for field, value in enum_filters.items():
+            if value is None:
+                continue
+            codes = self._codes[field]
+            values = self._values(value)
+            for v in values:
+                if v not in codes:
+                    raise ValueError(f"Unknown {field} {v!r}")
+            if len(values) == 1:
+                result &= self.columns[field] == codes[values[0]]
+            else:
+                lookup = np.zeros(len(codes), dtype=bool)
+                lookup[[codes[v] for v in values]] = True
+                result &= lookup[self.columns[field]]
+
+        if primary_muscles is not None:
+            result &= (self.columns['primaryMuscles'] & self._mask_of(self._values(primary_muscles))) != 0
+        if secondary_muscles is not None:
+            result &= (self.columns['secondaryMuscles'] & self._mask_of(self._values(secondary_muscles))) != 0
+        if muscles is not None:
+            result &= (self._any_muscles & self._mask_of(self._values(muscles))) != 0
+        if exclude_muscles is not None:
+            result &= (self._any_muscles & self._mask_of(self._values(exclude_muscles))) == 0
+
+        return result
+
+    def decode(self, field: str, row: int) -> Union[None, str, List[str]]:
+        """Decode a single cell back from its column representation"""
+        value = int(self.columns[field][row])
+        if field in MUSCLE_FIELDS:
+            return [m for m, bit in self._muscle_bits.items() if value & bit]
+        return self.vocab[field][value]
+
+
+class ExerciseStore:
+    """Immutable, column-oriented view of the exercise dataset"""
+
+    def __init__(self, records: Sequence[Dict], schema: Dict):
+        """
+        Build the columns
+
+        Args:
+            records: Exercises as found in dist/exercises.json
+            schema: Parsed schema.json providing the enum vocabularies
+        """
+        self.records = tuple(records)
+        self.ids = tuple(r['id'] for r in self.records)
+        self.names = tuple(r['name'] for r in self.records)
+        self.attributes = AttributeColumns.encode(self.records, *load_vocabulary(schema))
+        self.columns = self.attributes.columns
+
+    @classmethod
+    def from_file(cls, path: str = DATASET_PATH, schema_path: str = SCHEMA_PATH) -> 'ExerciseStore':
+        """
+        Load the store from the built dataset
+
+        Args:
+            path: dist/exercises.json (or any JSON array of exercises)
+            schema_path: schema.json providing the enum vocabularies
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+        return cls(records, schema)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def mask(self, **filters) -> np.ndarray:
+        """Boolean row mask for a filter, see AttributeColumns.mask()"""
+        return self.attributes.mask(**filters)
+
+    def indexes(self, **filters) -> np.ndarray:
+        """Row numbers matching the filter, in dataset order"""
+        return np.flatnonzero(self.mask(**filters))
+
+    def count(self, **filters) -> int:
+        """Number of exercises matching the filter"""
+        return int(np.count_nonzero(self.mask(**filters)))
+
+    def query(self, offset: int = 0, limit: Optional[int] = None, **filters) -> List[Dict]:
+        """
+        Exercises matching the filter
+
+        Args:
+            offset: Number of matches to skip
+            limit: Maximum number of matches to return
+            **filters: See AttributeColumns.mask()
+
+        Returns:
+            Matching exercise records in dataset order
+        """
+        rows = self.indexes(**filters)
+        end = None if limit is None else offset + limit
+        records = self.records
+        return [records[i] for i in rows[offset:end].tolist()]
+
+    def decode(self, field: str, row: int) -> Union[None, str, List[str]]:
+        """Decode a single cell back from its column representation"""
+        return self.attributes.decode(field, row)
@@ -0,0 +1,230 @@
+"""
+Schema validation and duplicate-id check for exercises/*.json
+
+schema.json is compiled once per worker process and files are spread
+across a process pool. Results are cached per file content hash and
+schema hash, so a re-run only validates files that changed since the
+last run; duplicate ids are found in the same pass from the cached ids.
+
+Results are printed as JSON lines (one object per invalid file or
+duplicate id, followed by a summary) and the exit status is non-zero
+if anything failed.
+
+Usage:
+    python -m exercise_data.validate [--duplicates-only] [--format json|text]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from .build import SOURCE_DIR, source_files
+from .manifest import FileManifest, content_hash
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = 'schema.json'
+MANIFEST_PATH = os.path.join('.cache', 'validate-manifest.json')
+
+# Below this many files to validate the pool start-up costs more than it saves
+POOL_THRESHOLD = 64
+
+_validator = None
+
+
+def _compile(schema: Dict):
+    from jsonschema import Draft4Validator
+
+    Draft4Validator.check_schema(schema)
+    return Draft4Validator(schema)
+
+
+def _init_worker(schema: Dict) -> None:
+    global _validator
+    _validator = _compile(schema)
+
+
+def _validate_one(item: Tuple[str, bytes]) -> Tuple[str, Optional[str], List[Dict]]:
+    """
+    Validate a single file in a worker
+
+    Args:
+        item: Tuple of (path, raw file contents)
+
+    Returns:
+        Tuple of (path, exercise id or None, list of errors)
+    """
+    path, data = item
+    try:
+        record = json.loads(data.decode('utf-8'))
+    except ValueError as e:
+        return path, None, [{'path': '', 'message': f"Invalid JSON: {str(e)}"}]
+
+    errors = [
+        {'path': '/' + '/'.join(str(p) for p in error.absolute_path), 'message': error.message}
+        for error in sorted(_validator.iter_errors(record), key=lambda e: list(map(str, e.absolute_path)))
+    ]
+    exercise_id = record.get('id') if isinstance(record, dict) else None
+    return path, exercise_id if isinstance(exercise_id, str) else None, errors
+
+
+class DatasetValidator:
+    """Validate the exercise files against schema.json and check for duplicate ids"""
+
+    def __init__(self, source_dir: str = SOURCE_DIR, schema_path: str = SCHEMA_PATH,
+                 manifest_path: str = MANIFEST_PATH, workers: Optional[int] = None):
+        """
+        Initialize the validator
+
+        Args:
+            source_dir: Directory containing one JSON file per exercise
+            schema_path: JSON schema every file must conform to
+            manifest_path: Location of the validation cache
+            workers: Size of the process pool (default: CPU count)
+        """
+        self.source_dir = source_dir
+        self.workers = workers
+
+        with open(schema_path, 'rb') as f:
+            schema_bytes = f.read()
+        self.schema = json.loads(schema_bytes.decode('utf-8'))
+        self.manifest = FileManifest(manifest_path, fingerprint=content_hash(schema_bytes)).load()
+
+    def _pending(self, paths: List[str]) -> Dict[str, Tuple[bytes, str, os.stat_result]]:
+        """
+        Files whose content has not been validated against the current schema
+
+        Returns:
+            Mapping of path to (raw contents, content hash, stat result)
+        """
+        pending = {}
+        for path in paths:
+            st = os.stat(path)
+            if self.manifest.lookup(path, st) is not None:
+                continue
+
+            with open(path, 'rb') as f:
+                data = f.read()
+            digest = content_hash(data)
+            cached = self.manifest.files.get(path)
+            if cached and cached['sha256'] == digest:
+                cached.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                continue
+
+            pending[path] = (data, digest, st)
+        return pending
+
+    def _run(self, pending: Dict[str, Tuple[bytes, str, os.stat_result]]):
+        items = [(path, data) for path, (data, _, _) in pending.items()]
+        if len(items) < POOL_THRESHOLD or self.workers == 1:
+            _init_worker(self.schema)
+            return map(_validate_one, items)
+
+        workers = self.workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.schema,)) as pool:
+            chunksize = max(1, len(items) // (workers * 4))
+            return list(pool.map(_validate_one, items, chunksize=chunksize))
+
+    def validate(self, schema: bool = True) -> Dict:
+        """
+        Validate every exercise file
+
+        Args:
+            schema: Validate against the schema; with False only the
+                duplicate-id check is performed
+
+        Returns:
+            Dictionary with 'invalid' files, 'duplicates' ids and 'stats'
+        """
+        start = time.perf_counter()
+        paths = source_files(self.source_dir)
+        pending = self._pending(paths)
+        stats = {'files': len(paths), 'validated': len(pending), 'cached': len(paths) - len(pending)}
+
+        ids = {}
+        if schema:
+            for path, exercise_id, errors in self._run(pending):
+                _, digest, st = pending[path]
+                self.manifest.update(path, st, digest, id=exercise_id, errors=errors)
+        else:
+            # Only ids are needed; the files are not recorded as validated
+            for path, (data, _, _) in pending.items():
+                try:
+                    record = json.loads(data.decode('utf-8'))
+                    ids[path] = record.get('id') if isinstance(record, dict) else None
+                except ValueError:
+                    ids[path] = None
+            stats['validated'] = 0
+
+        self.manifest.prune(paths)
+
+        seen = {}
+        duplicates = {}
+        invalid = []
+        for path in paths:
+            entry = self.manifest.files.get(path, {})
+            exercise_id = ids[path] if path in ids else entry.get('id')
+            if exercise_id is not None:
+                if exercise_id in seen:
+                    duplicates.setdefault(exercise_id, [seen[exercise_id]]).append(path)
+                else:
+                    seen[exercise_id] = path
+            if schema and entry.get('errors'):
+                invalid.append({'file': path, 'errors': entry['errors']})
+
+        if schema:
+            self.manifest.save()
+
+        stats['invalid'] = len(invalid)
+        stats['duplicates'] = len(duplicates)
+        stats['seconds'] = round(time.perf_counter() - start, 4)
+        return {
+            'invalid': invalid,
+            'duplicates': [{'id': k, 'files': v} for k, v in duplicates.items()],
+            'stats': stats
+        }
+
+
+def _print_results(results: Dict, fmt: str) -> None:
+    if fmt == 'json':
+        for item in results['invalid']:
+            print(json.dumps({'type': 'invalid', **item}, ensure_ascii=False))
+        for item in results['duplicates']:
+            print(json.dumps({'type': 'duplicate', **item}, ensure_ascii=False))
+        print(json.dumps({'type': 'summary', **results['stats']}))
+        return
+
+    for item in results['invalid']:
+        for error in item['errors']:
+            print(f"{item['file']}: {error['path']}: {error['message']}")
+    for item in results['duplicates']:
+        print(f"duplicate id {item['id']}: {', '.join(item['files'])}")
+    stats = results['stats']
+    print(f"{stats['files']} files, {stats['validated']} validated, {stats['cached']} cached, "
+          f"{stats['invalid']} invalid, {stats['duplicates']} duplicate ids ({stats['seconds']}s)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Validate exercises/*.json against schema.json')
+    parser.add_argument('--source', default=SOURCE_DIR, help='Directory with the exercise JSON files')
+    parser.add_argument('--schema', default=SCHEMA_PATH, help='JSON schema to validate against')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help='Validation cache')
+    parser.add_argument('--workers', type=int, default=None, help='Process pool size')
+    parser.add_argument('--duplicates-only', action='store_true', help='Only check for duplicate ids')
+    parser.add_argument('--format', choices=['json', 'text'], default='json', help='Output format')
+    args = parser.parse_args(argv)
+
+    validator = DatasetValidator(args.source, args.schema, args.manifest, args.workers)
+    results = validator.validate(schema=not args.duplicates_only)
+    _print_results(results, args.format)
+
+    return 1 if results['invalid'] or results['duplicates'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
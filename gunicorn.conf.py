@@ -0,0 +1,22 @@
+import os
+import shutil
+import tempfile
+
+# متریک‌های Prometheus در حالت multiprocess: هر worker مقادیر خود را در این پوشه
+# می‌نویسد و /metrics آن‌ها را تجمیع می‌کند. prometheus_client نوع ذخیره‌ی مقادیر
+# را هنگام import انتخاب می‌کند، پس این متغیر باید پیش از هر import آن تنظیم شود
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'prometheus_multiproc'))
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+
+def on_starting(server):
+    """پاک کردن فایل‌های متریک اجرای قبلی پیش از شروع workerها"""
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+def child_exit(server, worker):
+    """حذف gaugeهای live مربوط به worker خاتمه یافته"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,42 @@
+import importlib.util
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_DIR = os.path.join(ROOT, 'crawler_module', 'crawler')
+
+# Module name -> file; the crawler files have hyphens, so they are loaded by path
+MODULES = (
+    ('frontier', 'frontier.py'),
+    ('page_store', 'page_store.py'),
+    ('parser', 'parser-module.py'),
+    ('page_archive', 'page_archive.py'),
+    ('exercise_crawler', 'exercise-crawler.py'),
+    ('jobs', 'jobs.py'),
+)
+
+@pytest.fixture
+def crawler_package(monkeypatch):
+    """The crawler_module/crawler package, loaded by path as 'crawler_under_test'"""
+    pytest.importorskip('bs4')
+    try:
+        import crawl4ai  # noqa: F401
+    except ImportError:
+        # The tests never start the browser; only the import has to succeed
+        monkeypatch.setitem(sys.modules, 'crawl4ai', types.SimpleNamespace(
+            AsyncWebCrawler=lambda **kwargs: None, arun=None))
+
+    package = types.ModuleType('crawler_under_test')
+    package.__path__ = [PACKAGE_DIR]
+    monkeypatch.setitem(sys.modules, package.__name__, package)
+    for name, filename in MODULES:
+        spec = importlib.util.spec_from_file_location(f'{package.__name__}.{name}',
+                                                      os.path.join(PACKAGE_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        monkeypatch.setitem(sys.modules, spec.name, module)
+        spec.loader.exec_module(module)
+        setattr(package, name, module)
+    return package
@@ -0,0 +1,72 @@
+import functools
+import time
+
+
+def wait(job, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+class StubCrawler:
+    def __init__(self):
+        self.bypass_cache = False
+        self.page_stats = {'new': 0, 'changed': 0, 'unchanged': 0}
+
+    def reset_page_stats(self):
+        pass
+
+    async def run_task(self, task, url=None):
+        return {'success': True, 'task': task}
+
+
+def test_jobs_fail_and_the_crawler_is_recreated_when_it_cannot_be_created(crawler_package):
+    attempts = []
+
+    def crawler_factory():
+        attempts.append(None)
+        if len(attempts) == 1:
+            raise RuntimeError('browser did not start')
+        return StubCrawler()
+
+    queue = crawler_package.jobs.CrawlJobQueue(crawler_factory, workers=1)
+    job, _ = queue.submit('main')
+    wait(job)
+
+    assert job.state == crawler_package.jobs.FAILED
+    assert 'browser did not start' in job.error
+    # The failed job no longer blocks identical submissions
+    retry, created = queue.submit('main')
+    assert created
+    wait(retry)
+    assert retry.state == crawler_package.jobs.DONE
+    assert retry.result == {'success': True, 'task': 'main'}
+    assert len(attempts) == 2
+
+
+def test_reparse_job_runs_on_the_worker_that_owns_the_stores(crawler_package, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    archive_path = str(tmp_path / 'archive')
+    page_store_path = str(tmp_path / 'pages.sqlite3')
+
+    archive = crawler_package.page_archive.PageArchive(archive_path)
+    archive.append('https://exercises.virtuagym.com/exercise/1', 'exercise',
+                   '<html><body><h1>Push-up</h1></body></html>', status=200)
+    archive.close()
+
+    def crawler_factory():
+        # Created on the worker thread, like the app's queue does
+        crawler = crawler_package.exercise_crawler.ExerciseCrawler(
+            page_store_path=page_store_path, parser_backend='html.parser', archive_path=archive_path)
+        # Parse inline rather than in a process pool
+        crawler.reparse_archive = functools.partial(crawler.reparse_archive, workers=0)
+        return crawler
+
+    queue = crawler_package.jobs.CrawlJobQueue(crawler_factory, workers=1)
+    job, created = queue.submit('reparse')
+    assert created
+
+    wait(job)
+
+    assert job.state == crawler_package.jobs.DONE, job.error
+    assert job.result['reparsed'] == {'exercise': 1}
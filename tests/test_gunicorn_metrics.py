@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip('prometheus_client')
+
+
+def test_worker_metrics_are_written_to_the_multiprocess_directory(tmp_path):
+    # A fresh interpreter, since prometheus_client picks its value class on first import
+    script = textwrap.dedent("""
+        import os, runpy, sys
+        config = runpy.run_path(sys.argv[1])
+        config['on_starting'](None)
+
+        pid = os.fork()
+        if pid == 0:
+            from prometheus_client import Counter
+            Counter('worker_requests', 'Requests seen by a worker').inc()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        print(pid)
+    """)
+    # Left unset so gunicorn.conf.py has to provide it; TMPDIR keeps its default inside tmp_path
+    env = {k: v for k, v in os.environ.items() if k != 'PROMETHEUS_MULTIPROC_DIR'}
+    env['TMPDIR'] = str(tmp_path)
+    result = subprocess.run([sys.executable, '-c', script, os.path.join(ROOT, 'gunicorn.conf.py')],
+                            env=env, capture_output=True, text=True, check=True)
+
+    worker_pid = result.stdout.strip()
+    assert (tmp_path / 'prometheus_multiproc' / f'counter_{worker_pid}.db').exists()
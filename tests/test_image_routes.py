@@ -0,0 +1,103 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+for module in ('PIL', 'flask_jwt_extended', 'flask_limiter', 'flask_migrate', 'flask_restx',
+               'flask_sqlalchemy', 'elasticsearch', 'dotenv', 'redis'):
+    pytest.importorskip(module)
+
+from PIL import Image  # noqa: E402
+
+from exercise_data.images import INDEX_NAME, ImageBuilder  # noqa: E402
+
+IMAGE = 'Push_Up/0.jpg'
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    root = tmp_path_factory.mktemp('images')
+    source, output = root / 'exercises', root / 'dist'
+    (source / 'Push_Up').mkdir(parents=True)
+    Image.new('RGB', (640, 480), (200, 80, 40)).save(source / IMAGE, 'JPEG')
+    ImageBuilder(str(source), str(output), str(root / 'manifest.json'),
+                 widths=(200, 400), formats=['jpeg', 'webp']).build(workers=0)
+
+    environ = {
+        'DATABASE_URL': 'sqlite://',
+        'LOG_SHIPPER_SPOOL_PATH': str(root / 'es-spool.ndjson'),
+    }
+    saved = {key: os.environ.get(key) for key in environ}
+    os.environ.update(environ)
+    try:
+        from app import app
+        from app.services import image_service
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    previous = image_service._index
+    image_service._index = image_service.ImageIndex(str(output / INDEX_NAME), str(source), str(output))
+    yield app.test_client()
+    image_service._index = previous
+
+
+def test_serves_the_original_with_its_indexed_etag(client):
+    response = client.get(f'/api/images/{IMAGE}')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert response.headers['Cache-Control'] == 'public, no-cache'
+    assert 'Accept' in response.headers['Vary']
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    # Strong, and the content hash recorded by `make images`
+    assert response.headers['ETag'] == f'"{hashlib.sha256(response.data).hexdigest()}"'
+
+
+def test_if_none_match_returns_not_modified(client):
+    etag = client.get(f'/api/images/{IMAGE}').headers['ETag']
+
+    response = client.get(f'/api/images/{IMAGE}', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+
+
+def test_range_request_returns_partial_content(client):
+    full = client.get(f'/api/images/{IMAGE}').data
+
+    response = client.get(f'/api/images/{IMAGE}', headers={'Range': 'bytes=0-99'})
+
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 0-99/{len(full)}'
+    assert response.data == full[:100]
+
+
+def test_variant_follows_accept_and_width(client):
+    webp = client.get(f'/api/images/{IMAGE}?w=300', headers={'Accept': 'image/webp,*/*'})
+    assert webp.status_code == 200
+    assert webp.mimetype == 'image/webp'
+    assert Image.open(io.BytesIO(webp.data)).width == 400
+
+    jpeg = client.get(f'/api/images/{IMAGE}?w=150', headers={'Accept': '*/*'})
+    assert jpeg.mimetype == 'image/jpeg'
+    assert jpeg.headers['ETag'] != webp.headers['ETag']
+
+
+def test_rejects_unknown_images_and_bad_widths(client):
+    assert client.get('/api/images/Push_Up/9.jpg').status_code == 404
+    assert client.get('/api/images/../../etc/passwd').status_code == 404
+    assert client.get(f'/api/images/{IMAGE}?w=wide').status_code == 400
+
+
+def test_is_exempt_from_the_default_rate_limits(client):
+    etag = client.get(f'/api/images/{IMAGE}').headers['ETag']
+    # The default limits allow 50 requests per hour
+    statuses = {client.get(f'/api/images/{IMAGE}', headers={'If-None-Match': etag}).status_code
+                for _ in range(60)}
+    assert statuses == {304}
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+
+import pytest
+
+BASE = 'https://exercises.virtuagym.com'
+
+PAGES = {
+    f'{BASE}/': '<div class="category-list"><a href="/exercises/legs">Legs</a></div>',
+    f'{BASE}/exercises/legs': (
+        '<div class="exercise-item"><a href="/exercise/squat">Squat</a></div>'
+        '<div class="exercise-item"><a href="/exercise/lunge">Lunge</a></div>'
+    ),
+    f'{BASE}/exercise/squat': '<h1>Squat</h1><div class="difficulty-level">Beginner</div>',
+    f'{BASE}/exercise/lunge': '<h1>Lunge</h1><div class="difficulty-level">Beginner</div>',
+}
+
+
+class StubSite:
+    """Stands in for the browser; answers If-None-Match with 304 like a caching server"""
+
+    def __init__(self, pages):
+        self.pages = dict(pages)
+        self.without_validators = set()
+        self.requests = []
+
+    async def run(self, url, bypass_cache=False, headers=None):
+        headers = headers or {}
+        self.requests.append((url, headers))
+        html = self.pages[url]
+        if url in self.without_validators:
+            return {'status_code': 200, 'html': html, 'response_headers': {}}
+        etag = f'"{hashlib.sha256(html.encode()).hexdigest()[:16]}"'
+        if headers.get('If-None-Match') == etag:
+            return {'status_code': 304, 'response_headers': {'ETag': etag}}
+        return {'status_code': 200, 'html': html, 'response_headers': {'ETag': etag}}
+
+
+@pytest.fixture
+def crawl(crawler_package, tmp_path):
+    site = StubSite(PAGES)
+    crawler = crawler_package.exercise_crawler.ExerciseCrawler(
+        page_store_path=str(tmp_path / 'pages.sqlite3'), parser_backend='html.parser',
+        archive_path=str(tmp_path / 'archive'))
+    crawler.crawler = site
+
+    def run():
+        site.requests.clear()
+        return asyncio.run(crawler.crawl_all_categories(str(tmp_path / 'frontier.sqlite3'), parse_workers=0))
+
+    run.site = site
+
+    def results(kind):
+        frontier = crawler_package.frontier.CrawlFrontier(str(tmp_path / 'frontier.sqlite3'))
+        try:
+            return dict(frontier.iter_results(kind))
+        finally:
+            frontier.close()
+
+    run.results = results
+    return run
+
+
+def test_a_finished_crawl_is_started_over(crawl):
+    first = crawl()
+    assert first['counts']['done'] == len(PAGES)
+    assert len(crawl.site.requests) == len(PAGES)
+
+    second = crawl()
+
+    assert sorted(url for url, _ in crawl.site.requests) == sorted(PAGES)
+    assert second['counts']['done'] == len(PAGES)
+    assert second['categories'] == [{'name': 'Legs', 'url': '/exercises/legs'}]
+
+
+def test_recrawl_revalidates_and_only_reparses_changed_pages(crawl):
+    squat, lunge = f'{BASE}/exercise/squat', f'{BASE}/exercise/lunge'
+    crawl.site.without_validators.add(squat)
+    first = crawl()
+    assert first['pages'] == {'new': 4, 'changed': 0, 'unchanged': 0}
+    assert all(headers == {} for _, headers in crawl.site.requests)
+
+    crawl.site.pages[lunge] = '<h1>Walking Lunge</h1>'
+    second = crawl()
+
+    # 304 for the main and category pages, same body hash for the page without an ETag
+    assert second['pages'] == {'new': 0, 'changed': 1, 'unchanged': 3}
+    sent = dict(crawl.site.requests)
+    assert sent[squat] == {}
+    assert all('If-None-Match' in sent[url] for url in PAGES if url != squat)
+    assert second['counts']['done'] == len(PAGES)
+    exercises = crawl.results('exercise')
+    assert exercises[lunge]['details']['name'] == 'Walking Lunge'
+    assert exercises[squat]['status'] == 'unchanged'
@@ -0,0 +1,65 @@
+import importlib.util
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Loaded by path: importing the app package would create the whole Flask app
+spec = importlib.util.spec_from_file_location('log_shipper', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app', 'services', 'log_shipper.py'))
+log_shipper = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(log_shipper)
+LogShipper = log_shipper.LogShipper
+
+
+class StubElasticsearch:
+    def __init__(self):
+        self.documents = []
+
+    def bulk(self, operations):
+        self.documents.extend(operations[1::2])
+        return {'errors': False, 'items': []}
+
+
+def spool_document(spool_path):
+    LogShipper(None, spool_path=spool_path)._spool([('api-logs', {'n': 1})])
+
+
+@pytest.mark.skipif(log_shipper.fcntl is None, reason='spool locking uses fcntl')
+def test_appends_wait_for_the_spool_lock_held_by_another_process(tmp_path):
+    spool_path = str(tmp_path / 'es-spool.ndjson')
+    shipper = LogShipper(None, spool_path=spool_path)
+    writer = multiprocessing.get_context('fork').Process(target=spool_document, args=(spool_path,))
+
+    with shipper._spool_lock():
+        writer.start()
+        writer.join(0.5)
+        # Still waiting: nothing written while another worker appends or moves the spool
+        assert writer.is_alive()
+        assert not os.path.exists(spool_path)
+    writer.join(10)
+
+    assert writer.exitcode == 0
+    with open(spool_path, encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{'index': 'api-logs', 'document': {'n': 1}}]
+
+
+def test_replays_the_spool_left_by_a_stopped_worker(tmp_path):
+    spool_path = str(tmp_path / 'es-spool.ndjson')
+    stopped = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                             capture_output=True, text=True, check=True)
+    orphan = f"{spool_path}.{int(stopped.stdout)}.replay"
+    with open(orphan, 'w', encoding='utf-8') as f:
+        for n in range(3):
+            f.write(json.dumps({'index': 'api-logs', 'document': {'n': n}}) + '\n')
+
+    es = StubElasticsearch()
+    shipper = LogShipper(es, spool_path=spool_path)
+    shipper._replay_spool()
+
+    assert es.documents == [{'n': 0}, {'n': 1}, {'n': 2}]
+    assert shipper.stats()['replayed'] == 3
+    assert not list(tmp_path.glob('*.replay'))
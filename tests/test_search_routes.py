@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+for module in ('numpy', 'flask_jwt_extended', 'flask_limiter', 'flask_migrate', 'flask_restx',
+               'flask_sqlalchemy', 'elasticsearch', 'dotenv', 'redis'):
+    pytest.importorskip(module)
+
+from exercise_data.search import SearchIndex  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def exercise(exercise_id, name, instructions, equipment='barbell', level='beginner'):
+    return {'id': exercise_id, 'name': name, 'instructions': instructions, 'level': level,
+            'force': 'push', 'mechanic': 'compound', 'equipment': equipment, 'category': 'strength',
+            'primaryMuscles': ['chest'], 'secondaryMuscles': []}
+
+
+RECORDS = [
+    exercise('Barbell_Bench_Press', 'Barbell Bench Press', ['Lie on a flat bench and press the bar.']),
+    exercise('Dumbbell_Bench_Press', 'Dumbbell Bench Press', ['Press the dumbbells from your chest.'],
+             equipment='dumbbell'),
+    exercise('Barbell_Curl', 'Barbell Curl', ['Curl the bar towards your shoulders.']),
+    exercise('Push_Up', 'Push-Up', ['Keep your body straight and press up from the floor.'],
+             equipment='body only'),
+    # "bench" only appears in the instructions
+    exercise('Step_Up', 'Step-Up', ['Step onto a bench, one leg at a time.'], equipment='body only'),
+]
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    root = tmp_path_factory.mktemp('search')
+    environ = {
+        'DATABASE_URL': 'sqlite://',
+        'LOG_SHIPPER_SPOOL_PATH': str(root / 'es-spool.ndjson'),
+    }
+    saved = {key: os.environ.get(key) for key in environ}
+    os.environ.update(environ)
+    try:
+        from app import app
+        from app.services import search_service
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    with open(os.path.join(ROOT, 'schema.json'), encoding='utf-8') as f:
+        schema = json.load(f)
+    previous = search_service._index
+    search_service._index = SearchIndex.build(RECORDS, schema)
+    yield app.test_client()
+    search_service._index = previous
+
+
+def test_search_ranks_name_matches_above_instruction_matches(client):
+    response = client.get('/api/exercises/search?q=bench press')
+
+    assert response.status_code == 200
+    ids = [result['id'] for result in response.json['results']]
+    assert set(ids[:2]) == {'Barbell_Bench_Press', 'Dumbbell_Bench_Press'}
+    assert ids.index('Step_Up') > 1
+    scores = [result['score'] for result in response.json['results']]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_search_combines_text_with_filters(client):
+    response = client.get('/api/exercises/search?q=bench press&equipment=dumbbell')
+
+    assert [result['id'] for result in response.json['results']] == ['Dumbbell_Bench_Press']
+
+
+def test_search_as_you_type_matches_the_last_word_as_a_prefix(client):
+    assert client.get('/api/exercises/search?q=barbell cu').json['count'] == 2
+    prefixed = client.get('/api/exercises/search?q=barbell cu&prefix=true').json['results']
+    assert prefixed[0]['id'] == 'Barbell_Curl'
+
+
+def test_autocomplete_suggests_names_starting_with_the_prefix_first(client):
+    response = client.get('/api/exercises/autocomplete?q=bar')
+
+    assert response.status_code == 200
+    assert [s['id'] for s in response.json['suggestions']] == ['Barbell_Curl', 'Barbell_Bench_Press']
+    assert [s['id'] for s in client.get('/api/exercises/autocomplete?q=bench p').json['suggestions']] == \
+        ['Barbell_Bench_Press', 'Dumbbell_Bench_Press']
+
+
+def test_search_rejects_missing_queries_and_unknown_filter_values(client):
+    assert client.get('/api/exercises/search').status_code == 400
+    assert client.get('/api/exercises/search?q=press&equipment=trampoline').status_code == 400
+    assert client.get('/api/exercises/autocomplete?q=').json == {'suggestions': [], 'count': 0}